@@ -0,0 +1,424 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# API load test: how many range displays the API can serve before ingest
+# or the window fall behind.
+#
+# The real request handler is served on a local port while telemetry is
+# replayed through a pseudo-terminal into the real ingest, and a thread
+# stands in for the window, doing the Telemetry panel's work every
+# `REDRAW_INTERVAL_MS` the way `after` would. Client processes then hit
+# every GET endpoint with N clients each, either over kept open
+# connections or polling with a new connection per request. For each
+# number of clients this reports the request throughput and latency next to
+# the ingest latency and how late the window's ticks ran, starting from no
+# clients at all.
+#
+# Usage: uv run src/bench_api_load.py [--clients 0,1,4,16] [--seconds 5]
+#            [--mode keepalive|poll] [--interval 0] [--log packet_log.txt]
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import tempfile
+from threading import Event, Lock, Thread
+import time
+from typing import Iterator, Optional
+
+## LOCAL IMPORTS ##
+from bench_utils import BENCH_GROUND, summarize, synthetic_flight
+from utils import ConnectionState, frame
+###################
+
+SENT_FIELD = "bench_sent"
+"""Packet field holding when the benchmark wrote it, on the monotonic clock"""
+
+STALL = 0.05
+"""Seconds a window tick can run late before it counts as a stall"""
+
+
+def run_clients(
+    port: int,
+    paths: list[str],
+    clients: int,
+    keepalive: bool,
+    interval: float,
+    seconds: float,
+    results,
+):
+    """Client process: `clients` threads per path, each requesting it over
+    and over for `seconds`. Puts the latencies and errors by path on
+    `results`."""
+    latencies: dict[str, list[float]] = {path: [] for path in paths}
+    errors: dict[str, int] = {path: 0 for path in paths}
+    lock = Lock()
+    deadline = time.monotonic() + seconds
+
+    def client(path: str):
+        connection = None
+        own = []
+        failed = 0
+
+        while time.monotonic() < deadline:
+            sent = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = http.client.HTTPConnection(
+                        "127.0.0.1", port, timeout=5
+                    )
+                connection.request("GET", path)
+                connection.getresponse().read()
+                own.append(time.perf_counter() - sent)
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                if connection is not None:
+                    connection.close()
+                connection = None
+
+            if not keepalive and connection is not None:
+                connection.close()
+                connection = None
+            if interval > 0:
+                time.sleep(interval)
+
+        if connection is not None:
+            connection.close()
+        with lock:
+            latencies[path].extend(own)
+            errors[path] += failed
+
+    threads = [
+        Thread(target=client, args=(path,), daemon=True)
+        for path in paths
+        for _ in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results.put((latencies, errors))
+
+
+def packets(log_path: Optional[str], rate: float) -> Iterator[dict]:
+    """Packets to replay, from a packet log or a synthetic flight, over and
+    over."""
+    from replay import read_packet_log
+
+    while True:
+        if log_path is None:
+            flight = (packet for _timestamp, packet in synthetic_flight(rate=rate))
+        else:
+            flight = (
+                json.loads(packet) for _timestamp, packet in read_packet_log(log_path)
+            )
+        yield from flight
+
+
+class Telemetry:
+    """Replayed telemetry through the real ingest, with the latency from a
+    packet being written until it reached `set_rocket_packet`."""
+
+    def __init__(self, log_path: Optional[str], rate: float, ingest_process: bool):
+        import main
+        from telemetry import TelemetryMerger
+        import tty
+
+        self.rate = rate
+        self.latencies: list[float] = []
+        self.sent = 0
+
+        def on_packet(packet: dict, age: float):
+            main.set_rocket_packet(packet, age)
+            self.latencies.append(time.monotonic() - packet[SENT_FIELD])
+
+        self.merger = TelemetryMerger(
+            on_packet=on_packet, log_path=None, ingest_process=ingest_process
+        )
+        main.TELEMETRY = self.merger
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        service = self.merger.add_source(os.ttyname(self.slave))
+
+        deadline = time.monotonic() + 10
+        while (
+            service.state != ConnectionState.CONNECTED and time.monotonic() < deadline
+        ):
+            time.sleep(0.01)
+
+        self.packets = packets(log_path, rate)
+        self.stop_event = Event()
+        self.thread = Thread(target=self.write, name="bench_telemetry", daemon=True)
+        self.thread.start()
+
+    def write(self):
+        start = time.monotonic()
+        n = 0
+        while not self.stop_event.is_set():
+            n += 1
+            time.sleep(max(0.0, start + n / self.rate - time.monotonic()))
+
+            packet = next(self.packets)
+            packet[SENT_FIELD] = time.monotonic()
+            os.write(self.master, (frame(json.dumps(packet)) + "\n").encode("utf-8"))
+            self.sent += 1
+
+    def reset(self):
+        self.latencies = []
+        self.sent = 0
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.merger.stop()
+        self.merger.join()
+        os.close(self.slave)
+        os.close(self.master)
+
+
+class Window:
+    """Stands in for the window's redraw tick, which `after` schedules every
+    `REDRAW_INTERVAL_MS` on the Tk thread. Each tick formats the Telemetry
+    panel from the tracked target, and records how late it ran."""
+
+    def __init__(self):
+        from main import REDRAW_INTERVAL_MS
+
+        self.interval = REDRAW_INTERVAL_MS / 1000
+        self.lateness: list[float] = []
+        self.stop_event = Event()
+        self.thread = Thread(target=self.run, name="bench_window", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        import main
+        from telemetry import DEFAULT_TARGET
+        from telemetry_view import TelemetryViewModel, format_target
+
+        view = TelemetryViewModel()
+        due = time.monotonic() + self.interval
+        while not self.stop_event.is_set():
+            time.sleep(max(0.0, due - time.monotonic()))
+            now = time.monotonic()
+            self.lateness.append(now - due)
+
+            for status in main.TARGETS.status(DEFAULT_TARGET):
+                view.changes(format_target(status))
+
+            # Like `after`, the next tick is counted from when this one ran
+            due = now + self.interval
+
+    def reset(self):
+        self.lateness = []
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def serve() -> tuple:
+    """The real request handler on a free local port."""
+    import main
+
+    class QuietHandler(main.HTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = main.APIServer(("127.0.0.1", 0), QuietHandler)
+    Thread(target=server.serve_forever, name="bench_server", daemon=True).start()
+    return server, server.server_address[1]
+
+
+def bench_level(
+    clients: int,
+    port: int,
+    paths: list[str],
+    arguments,
+    telemetry: Telemetry,
+    window: Window,
+) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = []
+
+    # Clients are spread over processes so that making requests does not
+    # compete with the server for its GIL
+    shares = [clients // arguments.processes] * arguments.processes
+    for i in range(clients % arguments.processes):
+        shares[i] += 1
+    shares = [share for share in shares if share > 0]
+
+    for share in shares:
+        process = context.Process(
+            target=run_clients,
+            args=(
+                port,
+                paths,
+                share,
+                arguments.mode == "keepalive",
+                arguments.interval,
+                arguments.seconds,
+                results,
+            ),
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+
+    # Spawning takes a while, measure once the clients have had time to start
+    time.sleep(0.5 if len(processes) > 0 else 0.0)
+    telemetry.reset()
+    window.reset()
+
+    latencies: dict[str, list[float]] = {path: [] for path in paths}
+    errors: dict[str, int] = {path: 0 for path in paths}
+    if len(processes) == 0:
+        time.sleep(arguments.seconds)
+    for _ in processes:
+        process_latencies, process_errors = results.get()
+        for path in paths:
+            latencies[path].extend(process_latencies[path])
+            errors[path] += process_errors[path]
+    for process in processes:
+        process.join()
+
+    lateness = list(window.lateness)
+    endpoints = {
+        path: {
+            "rps": len(latencies[path]) / arguments.seconds,
+            "errors": errors[path],
+            "latency": summarize(latencies[path]),
+        }
+        for path in paths
+    }
+    every_latency = [latency for path in paths for latency in latencies[path]]
+
+    return {
+        "clients": clients,
+        "rps": len(every_latency) / arguments.seconds,
+        "errors": sum(errors.values()),
+        "latency": summarize(every_latency),
+        "endpoints": endpoints,
+        "ingest_latency": summarize(telemetry.latencies),
+        "ingest_missed": max(0, telemetry.sent - len(telemetry.latencies)),
+        "window_lateness": summarize(lateness),
+        "window_stalls": sum(1 for late in lateness if late > STALL),
+    }
+
+
+def ms(summary: dict, key: str) -> str:
+    return "-" if summary["count"] == 0 else f"{summary[key] * 1000:.1f}"
+
+
+def print_results(results: list[dict]):
+    rows = [
+        ("clients per endpoint", lambda r: str(r["clients"])),
+        ("requests/s", lambda r: f"{r['rps']:.0f}"),
+        ("request errors", lambda r: str(r["errors"])),
+        ("request p50 ms", lambda r: ms(r["latency"], "p50")),
+        ("request p99 ms", lambda r: ms(r["latency"], "p99")),
+        ("ingest p50 ms", lambda r: ms(r["ingest_latency"], "p50")),
+        ("ingest p99 ms", lambda r: ms(r["ingest_latency"], "p99")),
+        ("ingest missed", lambda r: str(r["ingest_missed"])),
+        ("window late p99 ms", lambda r: ms(r["window_lateness"], "p99")),
+        ("window late max ms", lambda r: ms(r["window_lateness"], "max")),
+        (f"window stalls >{STALL * 1000:.0f}ms", lambda r: str(r["window_stalls"])),
+    ]
+    for name, cell in rows:
+        print(f"{name:<22}" + "".join(f"{cell(result):>10}" for result in results))
+
+    print()
+    for result in results:
+        if result["clients"] == 0:
+            continue
+        print(f"{result['clients']} clients per endpoint:")
+        for path, endpoint in result["endpoints"].items():
+            print(
+                f"  {path:<18} {endpoint['rps']:7.0f} req/s"
+                f"  p50 {ms(endpoint['latency'], 'p50'):>6} ms"
+                f"  p99 {ms(endpoint['latency'], 'p99'):>6} ms"
+                f"  {endpoint['errors']} errors"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API load test")
+    parser.add_argument(
+        "--clients",
+        default="0,1,4,16",
+        help="comma separated numbers of clients per endpoint to try in turn",
+    )
+    parser.add_argument(
+        "--seconds", type=float, default=5.0, help="per number of clients"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["keepalive", "poll"],
+        default="keepalive",
+        help="keep each client's connection open, or connect for every request",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.0,
+        help="seconds each client waits between requests, 0 for none",
+    )
+    parser.add_argument("--processes", type=int, default=2, help="client processes")
+    parser.add_argument("--rate", type=float, default=20.0, help="packets per second")
+    parser.add_argument(
+        "--log", help="packet log to replay, a synthetic flight if not given"
+    )
+    parser.add_argument(
+        "--ingest-process",
+        action="store_true",
+        help="read the replayed telemetry in a child process",
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    arguments = parser.parse_args()
+
+    import main as app
+    from utils import warm_up_geo_mag
+
+    warm_up_geo_mag()
+
+    levels = [int(clients) for clients in arguments.clients.split(",")]
+    paths = [f"/api/{endpoint}" for endpoint in app.ApiServerEndpoints]
+
+    with tempfile.TemporaryDirectory() as directory:
+        ground_path = os.path.join(directory, "ground_location.toml")
+        with open(ground_path, "w", encoding="utf-8") as ground_file:
+            ground_file.write(
+                f"latitude = {BENCH_GROUND.lat}\n"
+                f"longitude = {BENCH_GROUND.lon}\n"
+                f"altitude = {BENCH_GROUND.alt}\n"
+            )
+        app.GROUND_LOCATION_PATH = ground_path
+        app.TARGETS.set_ground(BENCH_GROUND)
+
+        server, port = serve()
+        telemetry = Telemetry(arguments.log, arguments.rate, arguments.ingest_process)
+        window = Window()
+
+        try:
+            results = [
+                bench_level(clients, port, paths, arguments, telemetry, window)
+                for clients in levels
+            ]
+        finally:
+            window.stop()
+            telemetry.stop()
+            server.shutdown()
+            server.server_close()
+
+    if arguments.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Ingest jitter benchmark: threaded ingest against ingest in a child process
+# (`--ingest-process`), while other threads keep the GIL busy the way the
+# window, the map tiles and the API server do.
+#
+# Packets are written to a pseudo-terminal at a steady rate. For each mode
+# this reports the latency from a packet being written until it was decoded
+# (in the child, for the process mode) and until it reached `on_packet`,
+# and the jitter of the time between packets reaching `on_packet`.
+#
+# Usage: uv run src/bench_ingest.py [--rate 50] [--seconds 10] [--load 2]
+
+import argparse
+import json
+import os
+import statistics
+from threading import Event, Thread
+import time
+
+## LOCAL IMPORTS ##
+from bench_utils import summarize, synthetic_flight
+from telemetry import TelemetryMerger
+from utils import ConnectionState, frame
+###################
+
+SENT_FIELD = "bench_sent"
+"""Packet field holding when the benchmark wrote it, on the monotonic clock"""
+
+
+def busy(stop: Event):
+    """Pure Python work which holds the GIL, like drawing or serving JSON."""
+    packet = {"gps": {"latitude": 42.0, "longitude": -96.0, "altitude": 400.0}}
+    while not stop.is_set():
+        for _ in range(1000):
+            json.loads(json.dumps(packet))
+
+
+def bench_mode(ingest_process: bool, rate: float, seconds: float, load: int) -> dict:
+    import tty
+
+    received: list[float] = []
+    delivered: list[float] = []
+    arrivals: list[float] = []
+
+    def on_packet(packet: dict, age: float):
+        now = time.monotonic()
+        delivered.append(now - packet[SENT_FIELD])
+        arrivals.append(now)
+        received.append(now - age - packet[SENT_FIELD])
+
+    merger = TelemetryMerger(
+        on_packet=on_packet, log_path=None, ingest_process=ingest_process
+    )
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    port = os.ttyname(slave)
+    service = merger.add_source(port)
+
+    deadline = time.monotonic() + 10
+    while service.state != ConnectionState.CONNECTED and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    stop = Event()
+    load_threads = [
+        Thread(target=busy, args=(stop,), name=f"load_{i}", daemon=True)
+        for i in range(load)
+    ]
+    for thread in load_threads:
+        thread.start()
+
+    count = int(rate * seconds)
+    start = time.monotonic()
+    for i, (_timestamp, packet) in enumerate(synthetic_flight(rate=rate)):
+        if i >= count:
+            break
+
+        due = start + i / rate
+        time.sleep(max(0.0, due - time.monotonic()))
+
+        packet[SENT_FIELD] = time.monotonic()
+        os.write(master, (frame(json.dumps(packet)) + "\n").encode("utf-8"))
+
+    time.sleep(0.5)
+    stop.set()
+    for thread in load_threads:
+        thread.join()
+
+    merger.stop()
+    merger.join()
+    os.close(slave)
+    os.close(master)
+
+    intervals = [b - a for a, b in zip(arrivals, arrivals[1:])]
+    return {
+        "packets": len(delivered),
+        "missed": count - len(delivered),
+        "decoded_latency": summarize(received),
+        "delivered_latency": summarize(delivered),
+        "interval_jitter": (
+            statistics.pstdev(intervals) if len(intervals) > 1 else None
+        ),
+    }
+
+
+def print_results(name: str, results: dict):
+    print(f"{name}: {results['packets']} packets, {results['missed']} missed")
+    for key in ("decoded_latency", "delivered_latency"):
+        summary = results[key]
+        if summary["count"] == 0:
+            continue
+        print(
+            f"  {key:<18} p50 {summary['p50'] * 1000:7.2f} ms"
+            f"  p99 {summary['p99'] * 1000:7.2f} ms"
+            f"  max {summary['max'] * 1000:7.2f} ms"
+        )
+    if results["interval_jitter"] is not None:
+        print(f"  {'interval jitter':<18} {results['interval_jitter'] * 1000:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Threaded vs process ingest jitter")
+    parser.add_argument("--rate", type=float, default=50.0, help="packets per second")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument(
+        "--load", type=int, default=2, help="threads keeping the GIL busy"
+    )
+    parser.add_argument("--mode", choices=["both", "thread", "process"], default="both")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    arguments = parser.parse_args()
+
+    modes = {"thread": False, "process": True}
+    if arguments.mode != "both":
+        modes = {arguments.mode: modes[arguments.mode]}
+
+    results = {
+        name: bench_mode(
+            ingest_process, arguments.rate, arguments.seconds, arguments.load
+        )
+        for name, ingest_process in modes.items()
+    }
+
+    if arguments.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for name, result in results.items():
+        print_results(name, result)
+
+
+if __name__ == "__main__":
+    main()
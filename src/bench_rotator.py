@@ -0,0 +1,190 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Rotator protocol benchmark, against the simulated rotator. Reports how many
+# commands per second get through, the round trip latency of each command,
+# and how far the dish is from where it should be while tracking a flight.
+#
+# Usage: uv run src/bench_rotator.py [--log packet_log.txt] [--speed 10] ...
+#
+# Without `--log` a synthetic flight is used. The simulator options from
+# `rotator_sim.py` (response delay, drop rate, ...) can be given here too.
+
+import argparse
+import json
+import time
+
+## LOCAL IMPORTS ##
+from bench_utils import BENCH_GROUND, summarize, synthetic_flight
+from replay import read_packet_log
+from rotator import Rotator, RotatorException
+from rotator_connection import RotatorConnection
+from rotator_sim import RotatorSimulator, add_config_arguments, config_from_arguments
+from utils import ConnectionState, GPSPoint
+###################
+
+
+def bench_commands(simulator: RotatorSimulator, count: int) -> dict:
+    """Send a mix of commands as fast as possible, timing each round trip."""
+    rotator = Rotator(simulator.serve_pty())
+
+    commands = [
+        ("VERS", rotator.version),
+        ("GETP", rotator.position),
+        ("DVER", lambda: rotator.set_position_vertical(45.0)),
+        ("DHOR", lambda: rotator.set_position_horizontal(90.0)),
+    ]
+    latencies: dict[str, list[float]] = {name: [] for name, _ in commands}
+    failures = 0
+
+    start = time.perf_counter()
+    for i in range(count):
+        name, command = commands[i % len(commands)]
+
+        sent = time.perf_counter()
+        try:
+            command()
+        except (RotatorException, ValueError):
+            failures += 1
+            rotator.main_port.reset_input_buffer()
+            continue
+        latencies[name].append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - start
+
+    rotator.close()
+    simulator.stop()
+
+    all_latencies = [latency for values in latencies.values() for latency in values]
+    return {
+        "commands_per_second": count / elapsed,
+        "failures": failures,
+        "latency": summarize(all_latencies),
+        "latency_by_command": {
+            name: summarize(values) for name, values in latencies.items()
+        },
+    }
+
+
+def look_angles(ground: GPSPoint, packet: dict) -> tuple[float, float] | None:
+    """(vertical, horizontal) to point at for a packet, if it has a fix. The
+    true bearing is used, as the simulator has no idea of magnetic north."""
+    try:
+        air = GPSPoint(
+            packet["gps"]["latitude"],
+            packet["gps"]["longitude"],
+            packet["gps"]["altitude"],
+        )
+    except (KeyError, TypeError):
+        return None
+
+    return (ground.elevation_to(air), ground.bearing_to(air))
+
+
+def angle_difference(a: float, b: float) -> float:
+    return abs((a - b + 180) % 360 - 180)
+
+
+def bench_tracking(
+    simulator: RotatorSimulator, flight, ground: GPSPoint, speed: float
+) -> dict:
+    """Track a flight through a `RotatorConnection`, as the application does,
+    and measure the pointing error just before each new fix is sent."""
+    connection = RotatorConnection(simulator.serve_pty())
+    connection.start()
+    while connection.state != ConnectionState.CONNECTED:
+        time.sleep(0.01)
+
+    vertical_errors = []
+    horizontal_errors = []
+    target = None
+    first_recorded = None
+    first_real = time.monotonic()
+
+    for timestamp, packet in flight:
+        if first_recorded is None:
+            first_recorded = timestamp
+
+        due = first_real + (timestamp - first_recorded).total_seconds() / speed
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        if target is not None:
+            vertical, horizontal = simulator.position()
+            # The rotator's horizontal axis runs opposite to a bearing
+            vertical_errors.append(abs(target[0] - vertical))
+            horizontal_errors.append(angle_difference(target[1], -horizontal))
+
+        target = look_angles(ground, packet)
+        if target is not None:
+            connection.set_target(*target)
+
+    connection.stop()
+    connection.join()
+    simulator.stop()
+
+    return {
+        "vertical_error": summarize(vertical_errors),
+        "horizontal_error": summarize(horizontal_errors),
+        "reconnects": connection.reconnects,
+    }
+
+
+def print_summary(name: str, summary: dict, unit: str, scale: float = 1.0):
+    if summary["count"] == 0:
+        print(f"  {name}: no samples")
+        return
+
+    print(
+        f"  {name}: mean {summary['mean'] * scale:.2f}{unit}, "
+        f"p50 {summary['p50'] * scale:.2f}{unit}, "
+        f"p90 {summary['p90'] * scale:.2f}{unit}, "
+        f"p99 {summary['p99'] * scale:.2f}{unit}, "
+        f"max {summary['max'] * scale:.2f}{unit}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rotator protocol")
+    parser.add_argument("--commands", type=int, default=2000)
+    parser.add_argument("--log", help="packet log to track, instead of a made up one")
+    parser.add_argument(
+        "--speed", type=float, default=10.0, help="how fast to replay the flight"
+    )
+    add_config_arguments(parser)
+    arguments = parser.parse_args()
+
+    result = bench_commands(
+        RotatorSimulator(config_from_arguments(arguments)), arguments.commands
+    )
+    print(
+        f"Commands: {result['commands_per_second']:.0f}/s, {result['failures']} failed"
+    )
+    print_summary("round trip", result["latency"], "ms", 1000)
+    for name, summary in result["latency_by_command"].items():
+        print_summary(name, summary, "ms", 1000)
+
+    if arguments.log is not None:
+        from main import get_ground_point
+
+        flight = (
+            (timestamp, json.loads(received_json))
+            for timestamp, received_json in read_packet_log(arguments.log)
+        )
+        ground = get_ground_point()
+    else:
+        flight = synthetic_flight()
+        ground = BENCH_GROUND
+
+    # The simulated motors are sped up to match the replay
+    config = config_from_arguments(arguments)
+    config.time_scale = arguments.speed
+
+    tracking = bench_tracking(RotatorSimulator(config), flight, ground, arguments.speed)
+    print(f"Tracking at {arguments.speed}x, {tracking['reconnects']} reconnects:")
+    print_summary("vertical error", tracking["vertical_error"], "°")
+    print_summary("horizontal error", tracking["horizontal_error"], "°")
+
+
+if __name__ == "__main__":
+    main()
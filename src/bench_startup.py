@@ -0,0 +1,125 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Startup benchmark for the GUI. Reports how long it takes from launching the
+# interpreter until the first frame is drawn, and until the first telemetry
+# packet has been received, decoded and shown in the Telemetry panel.
+#
+# Usage: uv run src/bench_startup.py [runs]
+#
+# This needs a display to run, and uses a pseudo-terminal in place of the RFD.
+
+import json
+import os
+import pathlib
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = pathlib.Path(__file__).resolve().parent
+RESULT_PREFIX = "BENCH_RESULT "
+
+TEST_PACKET = {"gps": {"latitude": 42.3833, "longitude": -96.9497, "altitude": 812.5}}
+
+
+def child():
+    """Runs inside the launched process, reports times relative to the
+    timestamp the parent took just before launching it."""
+    launched = float(os.environ["BENCH_LAUNCHED"])
+    offset = time.time() - time.perf_counter()
+
+    import main
+    from utils import ConnectionState, frame
+
+    app = main.App()
+    result = {}
+    expected_text = f"{TEST_PACKET['gps']['latitude']:.8f}"
+
+    def send_packet():
+        if app.first_frame_time is None:
+            app.after(1, send_packet)
+            return
+
+        result["first_frame"] = app.first_frame_time + offset - launched
+
+        master, slave = os.openpty()
+        ingest = app.telemetry_merger.add_source(os.ttyname(slave))
+
+        # Give the ingest service a moment to open the port
+        while ingest.state != ConnectionState.CONNECTED:
+            time.sleep(0.001)
+
+        result["packet_sent"] = time.time() - launched
+        os.write(master, (frame(json.dumps(TEST_PACKET)) + "\n").encode("utf-8"))
+
+        wait_for_packet()
+
+    def wait_for_packet():
+        if app.telemetry.lat.cget("text") != expected_text:
+            app.after(1, wait_for_packet)
+            return
+
+        result["first_packet"] = time.time() - launched
+        print(RESULT_PREFIX + json.dumps(result), flush=True)
+        app.on_closing()
+
+    app.after(1, send_packet)
+    app.start()
+
+
+def run_once() -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        # Run against a scratch copy so the packet log is not touched
+        shutil.copy(SRC_DIR / "ground_location.toml", workdir)
+
+        env = dict(os.environ)
+        env["BENCH_LAUNCHED"] = repr(time.time())
+        output = subprocess.run(
+            [sys.executable, str(SRC_DIR / "bench_startup.py"), "--child"],
+            cwd=workdir,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+
+    for line in output.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line.removeprefix(RESULT_PREFIX))
+
+    raise RuntimeError(f"Benchmark run failed:\n{output.stdout}\n{output.stderr}")
+
+
+def main(arguments: list[str]):
+    if "--child" in arguments:
+        child()
+        return
+
+    runs = int(arguments[0]) if len(arguments) > 0 else 5
+
+    results = []
+    for i in range(runs):
+        result = run_once()
+        results.append(result)
+        print(
+            f"run {i + 1}: first frame {result['first_frame'] * 1000:.0f}ms, "
+            f"first packet {result['first_packet'] * 1000:.0f}ms "
+            f"({(result['first_packet'] - result['packet_sent']) * 1000:.0f}ms after send)"
+        )
+
+    for key, name in [
+        ("first_frame", "time to first frame"),
+        ("first_packet", "time to first packet processed"),
+    ]:
+        values = [r[key] * 1000 for r in results]
+        print(
+            f"{name}: median {statistics.median(values):.0f}ms, "
+            f"min {min(values):.0f}ms, max {max(values):.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
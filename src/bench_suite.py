@@ -0,0 +1,560 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Benchmark suite for the tracking hot paths, compared against a stored
+# baseline so that performance regressions show up. Covers:
+#   - `crc8` throughput
+#   - the `GPSPoint` look angle math, and the ENU pointing engine which
+#     replaces it, including how far apart the two are at short range
+#   - framing and JSON decode of telemetry lines
+#   - API requests per second and latency, per endpoint
+#   - end to end latency from a packet arriving on the RFD to the rotator
+#     being commanded, over pseudo-terminals with the simulated rotator
+#
+# Usage:
+#   uv run src/bench_suite.py                  run and compare to the baseline
+#   uv run src/bench_suite.py --save-baseline  run and store as the baseline
+#
+# All inputs are fixed (the synthetic flight and `BENCH_GROUND`), so runs on
+# the same machine are comparable, and results are scaled by the speed of a
+# reference workload to take out CPU frequency changes. Baselines from another
+# machine are not comparable; re-save the baseline when moving to a different
+# one. The exit status is 1 if anything regressed by more than `--threshold`.
+
+import argparse
+import http.client
+import json
+import math
+import os
+import pathlib
+import platform
+import sys
+import tempfile
+from threading import Event, Thread
+import time
+import timeit
+
+## LOCAL IMPORTS ##
+from bench_utils import BENCH_GROUND, summarize, synthetic_flight
+from pointing import PointingFrame
+from rotator_group import RotatorGroup
+from rotator_sim import RotatorSimulator, SimulatorConfig
+from targets import TargetTracker, look_angles
+from telemetry import DEFAULT_TARGET, IngestService, TelemetryMerger
+from utils import (
+    EARTH_RADIUS_METERS,
+    ConnectionState,
+    GPSPoint,
+    crc8,
+    frame,
+    warm_up_geo_mag,
+)
+###################
+
+BASELINE_PATH = pathlib.Path(__file__).resolve().parent / "bench_baseline.json"
+
+FLIGHT = [packet for _, packet in synthetic_flight(seconds=60, rate=10)]
+"""Packets used as input everywhere, the first minute of the synthetic flight"""
+
+
+def metric(
+    value: float,
+    unit: str,
+    higher_is_better: bool,
+    gated: bool = True,
+    scales: bool = True,
+) -> dict:
+    """One benchmark result. Results which are not `gated` are reported but
+    too noisy to fail the run over, like tail latencies. Results which
+    `scales` depend on how fast the machine is running, see `reference`."""
+    return {
+        "value": value,
+        "unit": unit,
+        "higher_is_better": higher_is_better,
+        "gated": gated,
+        "scales": scales,
+    }
+
+
+def reference() -> float:
+    """Speed of a fixed, plain Python workload. Shared and laptop CPUs change
+    speed a lot from run to run, so results are compared relative to this
+    rather than as they are."""
+
+    def work():
+        total = 0.0
+        values = {}
+        for i in range(1000):
+            total += math.sqrt(i) * math.sin(i)
+            values[str(i)] = total
+        return json.dumps(values)
+
+    return best_rate(work, number=20, repeat=7)
+
+
+def best_rate(function, number: int, repeat: int = 5) -> float:
+    """Calls per second of `function`, from the fastest of `repeat` runs."""
+    best = min(timeit.repeat(function, number=number, repeat=repeat))
+    return number / best
+
+
+def air_points() -> list[GPSPoint]:
+    return [
+        GPSPoint(
+            packet["gps"]["latitude"],
+            packet["gps"]["longitude"],
+            packet["gps"]["altitude"],
+        )
+        for packet in FLIGHT
+    ]
+
+
+def bench_crc8(scale: float) -> dict:
+    data = "".join(json.dumps(packet) for packet in FLIGHT[:50]).encode("utf-8")
+
+    rate = best_rate(lambda: crc8(data), number=max(1, int(20 * scale)))
+    return {"crc8": metric(rate * len(data) / 1e6, "MB/s", True)}
+
+
+def bench_look_angles(scale: float) -> dict:
+    warm_up_geo_mag()
+    points = air_points()
+    ground = BENCH_GROUND
+
+    def each(method):
+        def run():
+            for point in points:
+                method(point)
+
+        return run
+
+    results = {}
+    for name, method, number in [
+        ("distance_to", ground.distance_to, 50),
+        ("bearing_to", ground.bearing_to, 50),
+        ("elevation_to", ground.elevation_to, 50),
+        ("bearing_mag_corrected_to", ground.bearing_mag_corrected_to, 1),
+    ]:
+        rate = best_rate(each(method), number=max(1, int(number * scale)), repeat=3)
+        results[f"look_angles.{name}"] = metric(rate * len(points), "calls/s", True)
+
+    return results
+
+
+def short_range_points() -> list[GPSPoint]:
+    """Points all around `BENCH_GROUND` out to 2km, where the spherical
+    `GPSPoint` math and the ellipsoid should agree closely."""
+    points = []
+    for distance in (100.0, 500.0, 2000.0):
+        for bearing in range(0, 360, 15):
+            for height in (10.0, 300.0, 1000.0):
+                angle = distance / EARTH_RADIUS_METERS
+                points.append(
+                    GPSPoint(
+                        BENCH_GROUND.lat
+                        + math.degrees(angle * math.cos(math.radians(bearing))),
+                        BENCH_GROUND.lon
+                        + math.degrees(
+                            angle
+                            * math.sin(math.radians(bearing))
+                            / math.cos(math.radians(BENCH_GROUND.lat))
+                        ),
+                        (BENCH_GROUND.alt or 0.0) + height,
+                    )
+                )
+    return points
+
+
+def bench_pointing(scale: float) -> dict:
+    """`PointingFrame.look` for one fix at a time and for the whole flight
+    at once, and the full `look_angles` done for every packet. The largest
+    differences from `GPSPoint.bearing_to` and `elevation_to` at short range
+    are reported too, as a check on the ENU math."""
+    warm_up_geo_mag()
+    points = air_points()
+    ground = BENCH_GROUND
+    frame = PointingFrame(ground)
+
+    def scalar():
+        for point in points:
+            frame.look(point.lat, point.lon, point.alt)
+
+    def full():
+        for point in points:
+            look_angles(ground, point)
+
+    number = max(1, int(50 * scale))
+    results = {
+        "pointing.look": metric(
+            best_rate(scalar, number=number, repeat=3) * len(points), "calls/s", True
+        ),
+        "pointing.look_angles": metric(
+            best_rate(full, number=number, repeat=3) * len(points), "calls/s", True
+        ),
+    }
+
+    try:
+        import numpy
+    except ImportError:
+        print("NumPy is not installed, skipping the batched pointing benchmark")
+    else:
+        latitudes = numpy.array([point.lat for point in points])
+        longitudes = numpy.array([point.lon for point in points])
+        altitudes = numpy.array([point.alt for point in points])
+        rate = best_rate(
+            lambda: frame.look_batch(latitudes, longitudes, altitudes),
+            number=number * 10,
+            repeat=3,
+        )
+        results["pointing.look_batch"] = metric(rate * len(points), "points/s", True)
+
+    azimuth_error = 0.0
+    elevation_error = 0.0
+    for point in short_range_points():
+        azimuth, elevation, _range = frame.look(point.lat, point.lon, point.alt)
+        azimuth_error = max(
+            azimuth_error, abs((azimuth - ground.bearing_to(point) + 180) % 360 - 180)
+        )
+        elevation_error = max(
+            elevation_error, abs(elevation - ground.elevation_to(point))
+        )
+
+    results["pointing.azimuth_difference"] = metric(
+        azimuth_error, "deg", False, scales=False
+    )
+    results["pointing.elevation_difference"] = metric(
+        elevation_error, "deg", False, scales=False
+    )
+    return results
+
+
+def bench_decode(scale: float) -> dict:
+    """Lines per second through `IngestService.process_line`, which is the
+    CRC check, unframing and JSON decode done for every received line."""
+    service = IngestService(
+        "bench", on_packet=lambda packet, received: None, log_path=None
+    )
+    lines = [(frame(json.dumps(packet)) + "\n").encode("utf-8") for packet in FLIGHT]
+
+    def run():
+        for line in lines:
+            service.process_line(line)
+
+    rate = best_rate(run, number=max(1, int(10 * scale)))
+    return {"decode": metric(rate * len(lines), "lines/s", True)}
+
+
+API_ROUNDS = 3
+
+
+def time_requests(port: int, path: str, count: int) -> tuple[float, list[float]]:
+    """Make `count` requests one after the other, returning the requests per
+    second and the latency of each."""
+    latencies = []
+
+    start = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        connection.request("GET", path)
+        connection.getresponse().read()
+        connection.close()
+        latencies.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - start
+
+    return count / elapsed, latencies
+
+
+def bench_api(scale: float) -> dict:
+    """Requests per second and latency for each endpoint, one request at a
+    time, against the real request handler on a local port."""
+    import main
+
+    warm_up_geo_mag()
+
+    with tempfile.TemporaryDirectory() as directory:
+        ground_path = os.path.join(directory, "ground_location.toml")
+        with open(ground_path, "w", encoding="utf-8") as ground_file:
+            ground_file.write(
+                f"latitude = {BENCH_GROUND.lat}\n"
+                f"longitude = {BENCH_GROUND.lon}\n"
+                f"altitude = {BENCH_GROUND.alt}\n"
+            )
+        main.GROUND_LOCATION_PATH = ground_path
+        main.ROCKET_PACKET_CONT = FLIGHT[-1]
+
+        class QuietHandler(main.HTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        server = main.APIServer(("127.0.0.1", 0), QuietHandler)
+        Thread(target=server.serve_forever, name="bench_server", daemon=True).start()
+        port = server.server_address[1]
+
+        results = {}
+        try:
+            for endpoint in main.ApiServerEndpoints:
+                rates = []
+                medians = []
+                latencies = []
+                for _ in range(API_ROUNDS):
+                    rate, round_latencies = time_requests(
+                        port, f"/api/{endpoint}", max(10, int(200 * scale))
+                    )
+                    rates.append(rate)
+                    medians.append(summarize(round_latencies)["p50"])
+                    latencies.extend(round_latencies)
+
+                # The best round is the least disturbed by anything else
+                # running on the machine
+                results[f"api.{endpoint}.rps"] = metric(max(rates), "req/s", True)
+                results[f"api.{endpoint}.p50"] = metric(
+                    min(medians) * 1000, "ms", False
+                )
+                results[f"api.{endpoint}.p99"] = metric(
+                    summarize(latencies)["p99"] * 1000, "ms", False, gated=False
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    return results
+
+
+def bench_end_to_end(scale: float) -> dict:
+    """Time from a framed packet being written to the RFD port until the
+    simulated rotator receives the DHOR command for it. The packet goes the
+    same way it does in the application: through the merger and the target
+    tracker, which repoints the rotator group from the ingest thread.
+
+    A second rotator in the group takes 200ms to answer every command, which
+    must not hold up the first one."""
+    import tty
+
+    warm_up_geo_mag()
+
+    simulator = RotatorSimulator(SimulatorConfig(seed=0))
+    slow_simulator = RotatorSimulator(SimulatorConfig(seed=1, response_delay=0.2))
+    commanded = Event()
+
+    def on_command(line: str):
+        if line.startswith("DHOR"):
+            commanded.set()
+
+    simulator.on_command = on_command
+
+    group = RotatorGroup(DEFAULT_TARGET)
+    connection = group.connect("main", simulator.serve_pty(), BENCH_GROUND)
+    slow_ground = GPSPoint(BENCH_GROUND.lat + 0.01, BENCH_GROUND.lon, BENCH_GROUND.alt)
+    slow_connection = group.connect("slow", slow_simulator.serve_pty(), slow_ground)
+
+    tracker = TargetTracker(on_update=group.point)
+    tracker.set_ground(BENCH_GROUND)
+    merger = TelemetryMerger(on_packet=tracker.update, log_path=None)
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    ingest = merger.add_source(os.ttyname(slave))
+
+    deadline = time.monotonic() + 10
+    while (
+        connection.state != ConnectionState.CONNECTED
+        or slow_connection.state != ConnectionState.CONNECTED
+        or ingest.state != ConnectionState.CONNECTED
+    ) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    latencies = []
+    missed = 0
+    for packet in FLIGHT[: max(10, int(200 * scale))]:
+        commanded.clear()
+        line = (frame(json.dumps(packet)) + "\n").encode("utf-8")
+
+        sent = time.perf_counter()
+        os.write(master, line)
+        if commanded.wait(2.0):
+            latencies.append(time.perf_counter() - sent)
+        else:
+            missed += 1
+
+    # The slow rotator may not have finished a single target yet
+    deadline = time.monotonic() + 2
+    while slow_connection.status()["latency"] is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    latency = connection.status()["latency"]
+    slow_latency = slow_connection.status()["latency"]
+
+    merger.stop()
+    group.stop()
+    merger.join()
+    group.join()
+    simulator.stop()
+    slow_simulator.stop()
+    os.close(slave)
+    os.close(master)
+
+    summary = summarize(latencies)
+    if summary["count"] == 0:
+        print(f"End to end: no commands arrived, {missed} missed")
+        return {}
+
+    return {
+        "end_to_end.p50": metric(summary["p50"] * 1000, "ms", False),
+        "end_to_end.p99": metric(summary["p99"] * 1000, "ms", False, gated=False),
+        "end_to_end.missed": metric(missed, "packets", False, scales=False),
+        # Each rotator's own view, from the target being set until it was
+        # accepted, not gated as the slow one is dominated by its delay
+        "end_to_end.rotator_latency": metric(
+            (latency or {}).get("mean", math.nan) * 1000, "ms", False, gated=False
+        ),
+        "end_to_end.slow_rotator_latency": metric(
+            (slow_latency or {}).get("mean", math.nan) * 1000,
+            "ms",
+            False,
+            gated=False,
+        ),
+    }
+
+
+BENCHMARKS = {
+    "crc8": bench_crc8,
+    "look_angles": bench_look_angles,
+    "pointing": bench_pointing,
+    "decode": bench_decode,
+    "api": bench_api,
+    "end_to_end": bench_end_to_end,
+}
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print a comparison of a run against the baseline, returning the names
+    of any results which got worse by more than `threshold`."""
+    regressions = []
+
+    if len(baseline) > 0 and baseline.get("environment") != environment():
+        print("NOTE: the baseline was recorded on a different machine or Python,")
+        print("      differences may not mean anything.")
+
+    speed = 1.0
+    if results.get("reference") and baseline.get("reference"):
+        speed = results["reference"] / baseline["reference"]
+        print(
+            f"This machine is running at {speed:.2f}x the speed it was for the "
+            "baseline, the baseline is scaled to match"
+        )
+
+    old = baseline.get("results", {})
+    width = max(len(name) for name in [*results["results"], *old])
+    print(f"{'benchmark':<{width}}  {'baseline':>18}  {'current':>18}  change")
+
+    for name, current in results["results"].items():
+        value = f"{current['value']:.4g} {current['unit']}"
+
+        if name not in old:
+            print(f"{name:<{width}}  {'-':>18}  {value:>18}  new")
+            continue
+
+        previous = old[name]["value"]
+        if current["scales"]:
+            previous = (
+                previous * speed if current["higher_is_better"] else previous / speed
+            )
+        previous_text = f"{previous:.4g} {current['unit']}"
+        if previous == 0:
+            print(f"{name:<{width}}  {previous_text:>18}  {value:>18}")
+            continue
+
+        change = (current["value"] - previous) / previous
+        worse = -change if current["higher_is_better"] else change
+
+        status = ""
+        if worse > threshold and not current["gated"]:
+            status = "worse (not gated)"
+        elif worse > threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif worse < -threshold:
+            status = "improved"
+
+        print(
+            f"{name:<{width}}  {previous_text:>18}  {value:>18}  "
+            f"{change * 100:+.1f}% {status}"
+        )
+
+    for name in old:
+        if name not in results["results"]:
+            print(f"{name:<{width}}  {'(not run)':>18}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tracking hot paths")
+    parser.add_argument(
+        "--only",
+        action="append",
+        choices=BENCHMARKS.keys(),
+        help="run only this benchmark, can be given more than once",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiplies the amount of work done, lower for a quicker run",
+    )
+    parser.add_argument(
+        "--baseline", default=str(BASELINE_PATH), help="baseline file to use"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store these results"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="fraction a result may get worse by before it counts as a regression",
+    )
+    arguments = parser.parse_args()
+
+    # Measured before and after, in case the machine speeds up or slows
+    # down part way through
+    speed = reference()
+    results = {}
+    for name in arguments.only or BENCHMARKS.keys():
+        print(f"Running {name}...", flush=True)
+        results.update(BENCHMARKS[name](arguments.scale))
+    speed = max(speed, reference())
+
+    run = {"environment": environment(), "reference": speed, "results": results}
+
+    if arguments.save_baseline:
+        with open(arguments.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(run, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"Saved baseline to {arguments.baseline}")
+
+    try:
+        with open(arguments.baseline, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+    except FileNotFoundError:
+        print(f"No baseline at {arguments.baseline}, run with --save-baseline")
+        baseline = {}
+
+    regressions = compare(run, baseline, arguments.threshold)
+    if len(regressions) > 0:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Helpers shared by the benchmarks.
+
+import datetime
+import json
+import math
+from typing import Iterator
+
+## LOCAL IMPORTS ##
+from utils import GPSPoint
+###################
+
+BENCH_GROUND = GPSPoint(42.382736582735035, -96.95124955246622, 442.0)
+"""Ground station used by the benchmarks, so results do not depend on the
+saved ground position"""
+
+
+def percentile(values: list[float], p: float) -> float:
+    """The `p`th percentile (0 to 100) of some values, interpolated."""
+    if len(values) == 0:
+        return math.nan
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: list[float]) -> dict:
+    """Mean, p50, p90, p99 and max of some values."""
+    if len(values) == 0:
+        return {"count": 0}
+
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def synthetic_flight(
+    seconds: float = 300.0, rate: float = 10.0, apogee: float = 3000.0
+) -> Iterator[tuple[datetime.datetime, dict]]:
+    """A made up flight above `BENCH_GROUND`: a fast climb to `apogee` meters,
+    then a slow descent under parachute while drifting downrange. Yields
+    `(timestamp, packet)` at `rate` packets per second. The climb takes the
+    first tenth of the flight, up to 30 seconds."""
+    if seconds <= 0:
+        raise ValueError(f"A flight needs to last some time, not {seconds}s")
+
+    start = datetime.datetime(2025, 6, 20, 10, 0, 0)
+    burnout = min(30.0, seconds / 10)
+    descent_rate = apogee / (seconds - burnout)
+
+    for i in range(int(seconds * rate)):
+        t = i / rate
+        if t < burnout:
+            altitude = apogee * math.sin(t / burnout * math.pi / 2)
+        else:
+            altitude = max(0.0, apogee - descent_rate * (t - burnout))
+
+        # Drift to the north-east, a bit over 5 m/s
+        drift = 5.0 * t
+        packet = {
+            "seq": i,
+            "gps": {
+                "latitude": BENCH_GROUND.lat + drift / 111_320,
+                "longitude": BENCH_GROUND.lon
+                + drift / (111_320 * math.cos(BENCH_GROUND.lat_rad())),
+                "altitude": BENCH_GROUND.alt + altitude,
+            },
+        }
+        yield start + datetime.timedelta(seconds=t), packet
+
+
+def write_packet_log(path: str, **kwargs):
+    """Write a synthetic flight to a packet log, in the same format as the
+    ingest service does."""
+    with open(path, "w", encoding="utf-8") as packetlog:
+        for timestamp, packet in synthetic_flight(**kwargs):
+            packetlog.write(f"{timestamp.isoformat()},{json.dumps(packet)}\n")
@@ -0,0 +1,59 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Clocks which the telemetry pipeline reads time from, so that recorded
+# flights can be replayed faster than real time.
+
+from abc import ABC, abstractmethod
+import datetime
+from threading import Lock
+import time
+
+
+class Clock(ABC):
+    """Where the pipeline gets the current time from."""
+
+    @abstractmethod
+    def now(self) -> float:
+        """Monotonic time in seconds, for measuring ages and intervals."""
+
+    @abstractmethod
+    def wall(self) -> datetime.datetime:
+        """The current date and time, for timestamping packets."""
+
+
+class SystemClock(Clock):
+    """The real time, used for live flights."""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def wall(self) -> datetime.datetime:
+        return datetime.datetime.now()
+
+
+class ReplayClock(Clock):
+    """A clock which only moves when it is told to, by whatever is replaying
+    the recorded data. This lets a whole flight be replayed in seconds while
+    everything downstream still sees the recorded timing."""
+
+    def __init__(self, start: datetime.datetime):
+        self._start = start
+        self._elapsed = 0.0
+        self._lock = Lock()
+
+    def set(self, timestamp: datetime.datetime):
+        """Move the clock to a recorded time. It never goes backwards."""
+        elapsed = (timestamp - self._start).total_seconds()
+        with self._lock:
+            self._elapsed = max(self._elapsed, elapsed)
+
+    def now(self) -> float:
+        with self._lock:
+            return self._elapsed
+
+    def wall(self) -> datetime.datetime:
+        return self._start + datetime.timedelta(seconds=self.now())
+
+
+SYSTEM_CLOCK = SystemClock()
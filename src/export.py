@@ -0,0 +1,455 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Exports the packet log to a columnar file for analysis: NumPy `.npz`, or
+# Parquet. Nested packet fields are flattened into typed columns (`gps.latitude`
+# and so on), and the look angles from the ground station are added.
+#
+# Usage:
+#   uv run src/export.py flight.npz [--log packet_log.txt] [--session N]
+#   uv run src/export.py flight.parquet --start 2025-06-20T10:00 --end ...
+#
+# Needs the optional `export` dependencies (NumPy, and pyarrow for Parquet),
+# install them with `uv sync --extra export`.
+#
+# Columns:
+#   log_time          when the packet was received, POSIX seconds
+#   <field>           every packet field, nested names joined with `.`
+#   azimuth           true bearing from the ground station, degrees
+#   azimuth_magnetic  the same, corrected for magnetic declination
+#   elevation         degrees above the horizon
+#   range             straight line distance in meters
+#
+# The log is read in chunks which are parsed in parallel, and columns are
+# built up in temporary files, so memory use does not depend on the size of
+# the log.
+
+import argparse
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import datetime
+import json
+import math
+import os
+import tempfile
+from typing import Any, Iterable, Iterator, Optional
+
+## LOCAL IMPORTS ##
+from packet_log import PacketLog
+from pointing import pointing_frame
+from telemetry import PACKET_LOG_PATH
+from utils import GPSPoint
+###################
+
+CHUNK_LINES = 20_000
+"""Lines parsed at a time by each worker"""
+
+BLOCK_ROWS = 1 << 16
+"""Rows converted or written at a time when finishing the columns"""
+
+COMPUTED_COLUMNS = ("azimuth", "azimuth_magnetic", "elevation", "range")
+
+
+class ExportError(Exception):
+    """The export could not be done, e.g. an optional dependency is missing."""
+
+
+def flatten(packet: dict, prefix: str = "") -> Iterator[tuple[str, Any]]:
+    """Yields `(name, value)` for every field of a packet, with nested
+    names joined by `.`. Lists are kept whole, as JSON."""
+    for key, value in packet.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, f"{name}.")
+        elif isinstance(value, list):
+            yield name, json.dumps(value)
+        else:
+            yield name, value
+
+
+def parse_chunk(
+    lines: list[bytes], ground: Optional[GPSPoint], declination: float
+) -> tuple[int, dict[str, list]]:
+    """Parse log lines into columns. Runs in the worker processes, so only
+    takes and returns plain data. Returns the number of rows, and the values
+    of each column with None where a row does not have it. The look angles
+    are worked out for the whole chunk at once."""
+    columns: dict[str, list] = {"log_time": []}
+    fixes: list[tuple[float, float, float]] = []
+    rows = 0
+
+    for line in lines:
+        try:
+            timestamp, received_json = line.decode("utf-8").split(",", maxsplit=1)
+            packet = json.loads(received_json)
+            log_time = datetime.datetime.fromisoformat(timestamp).timestamp()
+        except ValueError:
+            continue
+
+        if not isinstance(packet, dict):
+            continue
+
+        values = dict(flatten(packet))
+        values["log_time"] = log_time
+        fixes.append(gps_fix(packet))
+
+        for name, value in values.items():
+            column = columns.get(name)
+            if column is None:
+                column = columns[name] = [None] * rows
+            column.append(value)
+
+        rows += 1
+        for column in columns.values():
+            if len(column) < rows:
+                column.append(None)
+
+    if ground is not None and rows > 0:
+        frame = pointing_frame(ground.lat, ground.lon, ground.alt or 0.0)
+        azimuth, elevation, slant_range = frame.look_batch(*zip(*fixes))
+        columns["azimuth"] = azimuth.tolist()
+        columns["azimuth_magnetic"] = (azimuth + declination).tolist()
+        columns["elevation"] = elevation.tolist()
+        columns["range"] = slant_range.tolist()
+
+    return rows, columns
+
+
+def gps_fix(packet: dict) -> tuple[float, float, float]:
+    """Latitude, longitude and altitude of a packet, NaN without a fix."""
+    try:
+        return (
+            float(packet["gps"]["latitude"]),
+            float(packet["gps"]["longitude"]),
+            float(packet["gps"]["altitude"]),
+        )
+    except (KeyError, TypeError, ValueError):
+        return (math.nan, math.nan, math.nan)
+
+
+class Column:
+    """One column being built up in a temporary file. Numbers are stored as
+    doubles (NaN when missing) until `finish` picks the final type; a column
+    which turns out to hold any text becomes a text column."""
+
+    def __init__(self, directory: str, number: int, name: str, rows_before: int):
+        self.name = name
+        self.path = os.path.join(directory, f"{number}.column")
+        self.text = False
+        self.rows = 0
+        self.missing = False
+        self.integral = True
+        """Every value seen so far is an int"""
+        self.boolean = True
+        """Every value seen so far is a bool"""
+        self.longest = 1
+
+        self._file = open(self.path, "wb")
+        self.append([None] * rows_before)
+
+    def append(self, values: list):
+        if not self.text and any(
+            value is not None and not isinstance(value, (bool, int, float))
+            for value in values
+        ):
+            self._to_text()
+
+        for value in values:
+            if value is None:
+                self.missing = True
+            elif not isinstance(value, bool):
+                self.boolean = False
+                if not isinstance(value, int):
+                    self.integral = False
+
+        if self.text:
+            for value in values:
+                text = "" if value is None else str(value)
+                self.longest = max(self.longest, len(text))
+                self._file.write(json.dumps(text).encode("utf-8") + b"\n")
+        else:
+            array(
+                "d", [math.nan if value is None else float(value) for value in values]
+            ).tofile(self._file)
+
+        self.rows += len(values)
+
+    def _to_text(self):
+        """Rewrite the numbers so far as text."""
+        self._file.close()
+        numbers = array("d")
+        with open(self.path, "rb") as column_file:
+            numbers.fromfile(column_file, self.rows)
+
+        self._file = open(self.path, "wb")
+        self.text = True
+        self.rows = 0
+
+        # Put back the original ints and bools where they were
+        values: list = []
+        for number in numbers:
+            if math.isnan(number):
+                values.append(None)
+            elif self.boolean:
+                values.append(bool(number))
+            elif self.integral:
+                values.append(int(number))
+            else:
+                values.append(number)
+        self.append(values)
+
+    def finish(self):
+        """The finished column as a NumPy array, memory-mapped from disk."""
+        import numpy
+
+        self._file.close()
+
+        if self.text:
+            dtype = numpy.dtype(f"U{self.longest}")
+        elif self.boolean and not self.missing:
+            dtype = numpy.dtype(bool)
+        elif self.integral and not self.missing:
+            dtype = numpy.dtype(numpy.int64)
+        else:
+            dtype = numpy.dtype(numpy.float64)
+
+        if self.rows == 0:
+            return numpy.empty(0, dtype)
+        if not self.text and dtype == numpy.float64:
+            return numpy.memmap(self.path, numpy.float64, "r", shape=(self.rows,))
+
+        finished = numpy.memmap(
+            f"{self.path}.finished", dtype, "w+", shape=(self.rows,)
+        )
+
+        if self.text:
+            with open(self.path, "rb") as column_file:
+                row = 0
+                block = []
+                for line in column_file:
+                    block.append(json.loads(line))
+                    if len(block) == BLOCK_ROWS:
+                        finished[row : row + len(block)] = block
+                        row += len(block)
+                        block = []
+                finished[row : row + len(block)] = block
+        else:
+            numbers = numpy.memmap(self.path, numpy.float64, "r", shape=(self.rows,))
+            for row in range(0, self.rows, BLOCK_ROWS):
+                finished[row : row + BLOCK_ROWS] = numbers[row : row + BLOCK_ROWS]
+
+        return finished
+
+
+class ColumnStore:
+    """All the columns of an export, kept the same length."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.columns: dict[str, Column] = {}
+        self.rows = 0
+
+    def append(self, rows: int, values: dict[str, list]):
+        for name, column_values in values.items():
+            if name not in self.columns:
+                self.columns[name] = Column(
+                    self.directory, len(self.columns), name, self.rows
+                )
+            self.columns[name].append(column_values)
+
+        for name, column in self.columns.items():
+            if name not in values:
+                column.append([None] * rows)
+
+        self.rows += rows
+
+    def finish(self) -> dict[str, Any]:
+        """The finished columns by name, `log_time` and the packet fields
+        first, then the computed ones."""
+        names = sorted(
+            self.columns,
+            key=lambda name: (
+                name != "log_time",
+                name in COMPUTED_COLUMNS,
+                COMPUTED_COLUMNS.index(name) if name in COMPUTED_COLUMNS else name,
+            ),
+        )
+        return {name: self.columns[name].finish() for name in names}
+
+
+def chunks(lines: Iterable[bytes], size: int) -> Iterator[list[bytes]]:
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def parse_all(
+    lines: Iterable[bytes],
+    store: ColumnStore,
+    ground: Optional[GPSPoint],
+    declination: float,
+    workers: int,
+):
+    """Parse every line into the store, in order. With more than one worker,
+    chunks are parsed in parallel, with only a few waiting at any time so the
+    whole log is never held in memory."""
+    if workers <= 1:
+        for chunk in chunks(lines, CHUNK_LINES):
+            store.append(*parse_chunk(chunk, ground, declination))
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending: deque[Future] = deque()
+        for chunk in chunks(lines, CHUNK_LINES):
+            pending.append(executor.submit(parse_chunk, chunk, ground, declination))
+            if len(pending) >= workers * 2:
+                store.append(*pending.popleft().result())
+
+        while len(pending) > 0:
+            store.append(*pending.popleft().result())
+
+
+def write_npz(path: str, columns: dict[str, Any]):
+    import zipfile
+
+    import numpy
+
+    # The same as `numpy.savez`, but writing each array as it is converted
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, values in columns.items():
+            with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                numpy.lib.format.write_array(member, values, allow_pickle=False)
+
+
+def write_parquet(path: str, columns: dict[str, Any], rows: int):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ExportError(
+            "Parquet export needs pyarrow, install the `export` extra"
+        ) from e
+
+    schema = pyarrow.schema(
+        [
+            (name, pyarrow.from_numpy_dtype(values.dtype))
+            if values.dtype.kind != "U"
+            else (name, pyarrow.string())
+            for name, values in columns.items()
+        ]
+    )
+
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for row in range(0, rows, BLOCK_ROWS):
+            writer.write_table(
+                pyarrow.table(
+                    {
+                        name: pyarrow.array(values[row : row + BLOCK_ROWS])
+                        for name, values in columns.items()
+                    },
+                    schema=schema,
+                )
+            )
+
+
+def export(
+    output: str,
+    log_path: str = PACKET_LOG_PATH,
+    ground: Optional[GPSPoint] = None,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    session: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> int:
+    """Export the packets in a range of the log to `output`, as Parquet if it
+    ends in `.parquet` and `.npz` otherwise. Look angles are added if a
+    ground position is given. Returns the number of packets exported."""
+    try:
+        import numpy  # noqa: F401
+    except ImportError as e:
+        raise ExportError("Export needs NumPy, install the `export` extra") from e
+
+    declination = 0.0 if ground is None else ground.declination()
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    with (
+        PacketLog(log_path) as packet_log,
+        tempfile.TemporaryDirectory(
+            prefix="export_", dir=os.path.dirname(os.path.abspath(output))
+        ) as directory,
+    ):
+        if session is not None:
+            try:
+                packet_log.session(session)
+            except ValueError as e:
+                raise ExportError(str(e)) from e
+
+        store = ColumnStore(directory)
+        parse_all(
+            packet_log.query_lines(start, end, session),
+            store,
+            ground,
+            declination,
+            workers,
+        )
+
+        columns = store.finish()
+        if output.endswith(".parquet"):
+            write_parquet(output, columns, store.rows)
+        else:
+            write_npz(output, columns)
+
+        # The memory maps have to go before their files can be removed
+        del columns
+
+    return store.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the packet log")
+    parser.add_argument("output", help="file to write, .npz or .parquet")
+    parser.add_argument("--log", default=PACKET_LOG_PATH, help="packet log to read")
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--session", type=int, help="only this session")
+    parser.add_argument("--workers", type=int, help="processes to parse with")
+    parser.add_argument(
+        "--no-angles", action="store_true", help="leave out the look angles"
+    )
+    arguments = parser.parse_args()
+
+    ground = None
+    if not arguments.no_angles:
+        from main import get_ground_point
+
+        try:
+            ground = get_ground_point()
+        except OSError as e:
+            print(f"No ground position, leaving out the look angles: {e}")
+
+    try:
+        rows = export(
+            arguments.output,
+            arguments.log,
+            ground,
+            arguments.start,
+            arguments.end,
+            arguments.session,
+            arguments.workers,
+        )
+    except ExportError as e:
+        print(e)
+        raise SystemExit(1)
+
+    print(f"Exported {rows} packets to {arguments.output}")
+
+
+if __name__ == "__main__":
+    main()
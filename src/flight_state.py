@@ -0,0 +1,229 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Flight state worked out from the stream of GPS fixes: ground speed,
+# vertical rate, apogee and where the rocket is going to land, for recovery.
+
+from collections import deque
+from enum import StrEnum
+import math
+from threading import Lock
+from typing import Optional
+
+## LOCAL IMPORTS ##
+from clock import SYSTEM_CLOCK, Clock
+from utils import EARTH_RADIUS_METERS
+###################
+
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_METERS / 180
+
+
+class FlightPhase(StrEnum):
+    PAD = "pad"
+    ASCENT = "ascent"
+    DESCENT = "descent"
+    LANDED = "landed"
+
+
+class FlightStateEstimator:
+    """Keeps the flight state up to date as fixes come in, for a constant
+    cost per packet.
+
+    Velocities are the least squares slope of the fixes over the last
+    `window` seconds, kept as running sums which are added to as fixes come
+    in and taken from as they fall out of the window. Positions are in
+    meters north and east of the first fix, and times in seconds since it."""
+
+    def __init__(
+        self,
+        window: float = 2.0,
+        ground_altitude: Optional[float] = None,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        self.window = window
+        self.ground_altitude = ground_altitude
+        """Altitude of the landing area, the first fix's altitude if None"""
+        self.clock = clock
+
+        self.ascent_rate = 5.0
+        """Vertical rate in m/s above which the rocket has left the pad"""
+        self.descent_rate = -2.0
+        """Vertical rate in m/s below which the rocket is coming down"""
+        self.apogee_margin = 5.0
+        """Meters below the highest fix before apogee is called"""
+        self.landed_rate = 1.0
+        """Vertical rate in m/s under which the rocket is still, once down"""
+        self.landed_height = 30.0
+        """Meters above the ground within which the rocket may have landed"""
+
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._origin: Optional[tuple[float, float, float]] = None
+            """(latitude, longitude, time) of the first fix"""
+            self._samples: deque[tuple[float, float, float, float]] = deque()
+            """(t, north, east, altitude) of each fix in the window"""
+            self._sums = [0.0] * 9
+
+            self.phase = FlightPhase.PAD
+            self.latest: Optional[tuple[float, float, float]] = None
+            self.vertical_rate: Optional[float] = None
+            self.north_rate: Optional[float] = None
+            self.east_rate: Optional[float] = None
+            self.max_altitude: Optional[float] = None
+            self._max_fix: Optional[tuple[float, float, float]] = None
+            self.apogee: Optional[dict] = None
+            self.landing: Optional[dict] = None
+
+    def update(self, packet: dict, time: Optional[float] = None):
+        """Add a packet, ignoring it if it has no GPS fix. `time` is when it
+        was taken, in seconds, and defaults to now on `clock`."""
+        try:
+            latitude = float(packet["gps"]["latitude"])
+            longitude = float(packet["gps"]["longitude"])
+            altitude = float(packet["gps"]["altitude"])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        if time is None:
+            time = self.clock.now()
+
+        with self._lock:
+            self._add(latitude, longitude, altitude, time)
+
+    def _add(self, latitude: float, longitude: float, altitude: float, time: float):
+        if self._origin is None:
+            self._origin = (latitude, longitude, time)
+            if self.ground_altitude is None:
+                self.ground_altitude = altitude
+
+        origin_lat, origin_lon, origin_time = self._origin
+        t = time - origin_time
+        north = (latitude - origin_lat) * METERS_PER_DEGREE
+        east = (
+            (longitude - origin_lon)
+            * METERS_PER_DEGREE
+            * math.cos(math.radians(origin_lat))
+        )
+
+        if len(self._samples) > 0 and t <= self._samples[-1][0]:
+            # Out of order or repeated, it would only skew the rates
+            return
+
+        self._samples.append((t, north, east, altitude))
+        self._accumulate(t, north, east, altitude, 1)
+        while self._samples[0][0] < t - self.window:
+            self._accumulate(*self._samples.popleft(), -1)
+
+        self.latest = (latitude, longitude, altitude)
+        if self.max_altitude is None or altitude > self.max_altitude:
+            self.max_altitude = altitude
+            self._max_fix = (latitude, longitude, altitude)
+
+        self._fit()
+        self._update_phase(latitude, longitude, altitude)
+
+    def _accumulate(
+        self, t: float, north: float, east: float, altitude: float, sign: int
+    ):
+        sums = self._sums
+        sums[0] += sign
+        sums[1] += sign * t
+        sums[2] += sign * t * t
+        sums[3] += sign * north
+        sums[4] += sign * t * north
+        sums[5] += sign * east
+        sums[6] += sign * t * east
+        sums[7] += sign * altitude
+        sums[8] += sign * t * altitude
+
+    def _fit(self):
+        n, st, stt, sn, stn, se, ste, sa, sta = self._sums
+        denominator = n * stt - st * st
+        if n < 3 or denominator <= 1e-9:
+            return
+
+        self.north_rate = (n * stn - st * sn) / denominator
+        self.east_rate = (n * ste - st * se) / denominator
+        self.vertical_rate = (n * sta - st * sa) / denominator
+
+    def _update_phase(self, latitude: float, longitude: float, altitude: float):
+        if self.vertical_rate is None or self.max_altitude is None:
+            return
+
+        match self.phase:
+            case FlightPhase.PAD:
+                if self.vertical_rate > self.ascent_rate:
+                    self.phase = FlightPhase.ASCENT
+            case FlightPhase.ASCENT:
+                if (
+                    self.vertical_rate < self.descent_rate
+                    and altitude < self.max_altitude - self.apogee_margin
+                    and self._max_fix is not None
+                ):
+                    self.phase = FlightPhase.DESCENT
+                    apogee_lat, apogee_lon, apogee_alt = self._max_fix
+                    self.apogee = {
+                        "altitude": apogee_alt,
+                        "latitude": apogee_lat,
+                        "longitude": apogee_lon,
+                    }
+            case FlightPhase.DESCENT:
+                height = altitude - (self.ground_altitude or 0.0)
+                if (
+                    abs(self.vertical_rate) < self.landed_rate
+                    and height < self.landed_height
+                ):
+                    self.phase = FlightPhase.LANDED
+                    self.landing = {
+                        "latitude": latitude,
+                        "longitude": longitude,
+                        "seconds": 0.0,
+                    }
+                else:
+                    self.landing = self._predict_landing(latitude, longitude, height)
+
+    def _predict_landing(
+        self, latitude: float, longitude: float, height: float
+    ) -> Optional[dict]:
+        """Carry on at the current velocity until reaching the ground."""
+        if (
+            self.vertical_rate is None
+            or self.vertical_rate >= 0
+            or self.north_rate is None
+            or self.east_rate is None
+        ):
+            return None
+
+        seconds = max(0.0, height / -self.vertical_rate)
+        north = self.north_rate * seconds
+        east = self.east_rate * seconds
+
+        return {
+            "latitude": latitude + north / METERS_PER_DEGREE,
+            "longitude": longitude
+            + east / (METERS_PER_DEGREE * math.cos(math.radians(latitude))),
+            "seconds": seconds,
+        }
+
+    def state(self) -> dict:
+        """The current flight state, for display and the API. Rates are None
+        until there are enough fixes to work them out."""
+        with self._lock:
+            ground_speed = None
+            course = None
+            if self.north_rate is not None and self.east_rate is not None:
+                ground_speed = math.hypot(self.north_rate, self.east_rate)
+                course = math.degrees(math.atan2(self.east_rate, self.north_rate)) % 360
+
+            return {
+                "phase": str(self.phase),
+                "ground_speed": ground_speed,
+                "course": course,
+                "vertical_rate": self.vertical_rate,
+                "max_altitude": self.max_altitude,
+                "apogee": None if self.apogee is None else dict(self.apogee),
+                "landing": None if self.landing is None else dict(self.landing),
+            }
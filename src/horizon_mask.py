@@ -0,0 +1,134 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Horizon mask: the lowest elevation a rotator can usefully point at in
+# each direction, because of terrain, buildings or the trailer. Surveyed
+# points are given in a TOML file:
+#
+#   mode = "clamp"  # or "flag", to only report masked commands
+#   points = [
+#       # [true azimuth, minimum elevation], in degrees
+#       [0, 2.0],
+#       [90, 4.5],
+#       [200, 12.0],
+#   ]
+#
+# and interpolated between, wrapping around at north.
+
+from array import array
+import bisect
+from enum import StrEnum
+import math
+
+## LOCAL IMPORTS ##
+from utils import GPSPoint
+###################
+
+
+class MaskMode(StrEnum):
+    CLAMP = "clamp"
+    """Commands below the mask are raised up to it"""
+    FLAG = "flag"
+    """Commands below the mask are sent anyway, and only reported"""
+
+
+class HorizonMask:
+    """Minimum elevation by true azimuth, linearly interpolated between
+    surveyed points."""
+
+    def __init__(
+        self, points: list[tuple[float, float]], mode: MaskMode = MaskMode.CLAMP
+    ):
+        if len(points) == 0:
+            raise ValueError("A horizon mask needs at least one point")
+
+        self.points = sorted(
+            (azimuth % 360, elevation) for azimuth, elevation in points
+        )
+        self.mode = mode
+        self._azimuths = [azimuth for azimuth, _elevation in self.points]
+
+    def minimum(self, azimuth: float) -> float:
+        """Minimum elevation at a true azimuth. This searches the points, use
+        `table` for anything done every tick."""
+        azimuth %= 360
+        index = bisect.bisect_right(self._azimuths, azimuth)
+
+        # The neighbouring points, wrapping around past north
+        before_azimuth, before = self.points[index - 1]
+        after_azimuth, after = self.points[index % len(self.points)]
+        if index == 0:
+            before_azimuth -= 360
+        if index == len(self.points):
+            after_azimuth += 360
+
+        span = after_azimuth - before_azimuth
+        if span <= 0:
+            return before
+        return before + (after - before) * (azimuth - before_azimuth) / span
+
+    def table(self, ground: GPSPoint) -> "MaskTable":
+        """Precompute the mask for a ground position, see `MaskTable`."""
+        return MaskTable(self, ground.declination())
+
+
+class MaskTable:
+    """A `HorizonMask` looked up by the magnetic azimuth commanded to the
+    rotator, at a fixed resolution, so checking a command is one index into
+    an array. Built whenever the ground position is set, as that is what the
+    declination depends on."""
+
+    RESOLUTION = 10
+    """Entries per degree"""
+
+    def __init__(self, mask: HorizonMask, declination: float):
+        self.mode = mask.mode
+        self.declination = declination
+
+        size = 360 * self.RESOLUTION
+        self._minimums = array(
+            "d",
+            (
+                mask.minimum(index / self.RESOLUTION - declination)
+                for index in range(size)
+            ),
+        )
+
+    def minimum(self, azimuth: float) -> float:
+        """Minimum elevation at a magnetic azimuth."""
+        index = round(azimuth * self.RESOLUTION) % len(self._minimums)
+        return self._minimums[index]
+
+    def apply(self, elevation: float, azimuth: float) -> tuple[float, bool]:
+        """The elevation to command, and whether the requested one is below
+        the mask. Angles which are not known (NaN) are passed through."""
+        if math.isnan(elevation) or math.isnan(azimuth):
+            return elevation, False
+
+        minimum = self.minimum(azimuth)
+        if elevation >= minimum:
+            return elevation, False
+
+        if self.mode == MaskMode.CLAMP:
+            return minimum, True
+        return elevation, True
+
+
+def load_horizon_mask(path: str) -> HorizonMask:
+    """Read a horizon mask file, see the top of this file. Raises `OSError`
+    if it cannot be read and `ValueError` if it is not a valid mask."""
+    import tomlkit
+
+    with open(path, "r", encoding="utf-8") as f:
+        mask_toml = tomlkit.load(f)
+
+    try:
+        points = [
+            (float(azimuth), float(elevation))
+            for azimuth, elevation in mask_toml["points"]  # type: ignore
+        ]
+        mode = MaskMode(mask_toml.get("mode", MaskMode.CLAMP))
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid horizon mask in {path}: {e}") from e
+
+    return HorizonMask(points, mode)
@@ -0,0 +1,404 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Telemetry ingest in a child process, so reading the radio never waits
+# for the GIL behind the window, the map's tile threads or the API server.
+#
+# The child reads the serial port, splits and checks each line (CRC, framing
+# and that it is a JSON object) and timestamps it as it arrives. Every valid
+# packet is written into a ring of fixed size records in shared memory,
+# which the parent reads without anything being pickled. A record is its
+# sequence number and receive time followed by the packet's JSON, not a
+# decoded packet: the parent parses the JSON again, under its own GIL, to
+# hand the packet on.
+#
+# So this only moves the serial reads and the CRC and framing checks out of
+# the window's process. What it buys is that packets are timestamped when
+# they arrive however busy the parent is, and that time is the one used for
+# the link health, the packet log and the tracked targets. Link health is
+# kept in the ring's header by the child.
+
+import json
+import multiprocessing
+from multiprocessing import shared_memory
+import struct
+from threading import Thread
+from typing import Any, Iterator, Optional
+
+## LOCAL IMPORTS ##
+from telemetry import IngestService, PortFactory
+from utils import ConnectionState
+###################
+
+RING_SLOTS = 256
+SLOT_SIZE = 2048
+"""Bytes per record, packets longer than fit are dropped"""
+
+STATS_INTERVAL = 0.25
+"""Seconds between the child publishing its link health"""
+
+WRITTEN = struct.Struct("<Q")
+"""Records written so far, at the start of the ring"""
+STATS = struct.Struct("<QQQQB")
+"""CRC errors, frame errors, decode errors, reconnects and state + 1 (0
+until the child first writes them)"""
+ERROR_SIZE = 128
+"""Bytes kept of the child's last error"""
+HEADER_SIZE = 256
+
+RECORD = struct.Struct("<QdI")
+"""Sequence number + 1 (0 while being written), receive time on the
+monotonic clock and length of the JSON which follows"""
+
+STATES = list(ConnectionState)
+
+
+class PacketRecord:
+    """A packet read from a `PacketRing`."""
+
+    def __init__(self, sequence: int, received: float, data: bytes):
+        self.sequence = sequence
+        self.received = received
+        """When the child decoded it, on the monotonic clock, which is the
+        same in every process"""
+        self.data = data
+        """The packet's JSON"""
+
+
+class PacketRing:
+    """Packet records in shared memory, written by one process and read by
+    another. The writer never waits: a reader which falls more than `slots`
+    records behind loses the oldest ones, counted in `lost`.
+
+    Each record's sequence number is cleared while it is being written and
+    checked again after it has been copied out, so a record overwritten
+    while it was being read is counted as lost rather than returned torn."""
+
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        slots: int = RING_SLOTS,
+        slot_size: int = SLOT_SIZE,
+    ):
+        """Creates a new ring, or opens the one called `name`."""
+        self.slots = slots
+        self.slot_size = slot_size
+        self.max_data = slot_size - RECORD.size
+        self.memory = shared_memory.SharedMemory(
+            name=name,
+            create=name is None,
+            size=HEADER_SIZE + slots * slot_size if name is None else 0,
+        )
+        self.name = self.memory.name
+        self.lost = 0
+
+        self._written = 0
+        """Writer: records written so far"""
+        self._next = 0
+        """Reader: the next record to read"""
+
+    def write(self, data: bytes, received: float) -> bool:
+        """Add a packet's JSON, returns False if it is too long to fit."""
+        if len(data) > self.max_data:
+            return False
+
+        buffer = self.memory.buf
+        offset = self._offset(self._written)
+        struct.pack_into("<Q", buffer, offset, 0)
+        start = offset + RECORD.size
+        buffer[start : start + len(data)] = data
+        RECORD.pack_into(buffer, offset, self._written + 1, received, len(data))
+
+        self._written += 1
+        WRITTEN.pack_into(buffer, 0, self._written)
+        return True
+
+    def read(self) -> Iterator[PacketRecord]:
+        """Every record written since the last read, oldest first."""
+        buffer = self.memory.buf
+        (written,) = WRITTEN.unpack_from(buffer, 0)
+
+        if written - self._next > self.slots:
+            self.lost += written - self._next - self.slots
+            self._next = written - self.slots
+
+        while self._next < written:
+            sequence = self._next
+            self._next += 1
+
+            offset = self._offset(sequence)
+            stamp, received, length = RECORD.unpack_from(buffer, offset)
+            if stamp != sequence + 1 or length > self.max_data:
+                self.lost += 1
+                continue
+
+            start = offset + RECORD.size
+            data = bytes(buffer[start : start + length])
+            if struct.unpack_from("<Q", buffer, offset)[0] != stamp:
+                self.lost += 1
+                continue
+
+            yield PacketRecord(sequence, received, data)
+
+    def write_stats(self, service: IngestService):
+        STATS.pack_into(
+            self.memory.buf,
+            WRITTEN.size,
+            service.crc_errors,
+            service.frame_errors,
+            service.decode_errors,
+            service.reconnects,
+            STATES.index(service.state) + 1,
+        )
+
+        error = (service.last_error or "").encode("utf-8")[:ERROR_SIZE]
+        start = WRITTEN.size + STATS.size
+        self.memory.buf[start : start + ERROR_SIZE] = error.ljust(ERROR_SIZE, b"\0")
+
+    def read_stats(self) -> Optional[tuple[list[int], ConnectionState, str]]:
+        """The child's error counts (CRC, frame, decode and reconnects), link
+        state and last error, or None if it has not written them yet."""
+        *counts, state = STATS.unpack_from(self.memory.buf, WRITTEN.size)
+        if state == 0:
+            return None
+
+        start = WRITTEN.size + STATS.size
+        error = bytes(self.memory.buf[start : start + ERROR_SIZE]).rstrip(b"\0")
+        return counts, STATES[state - 1], error.decode("utf-8", "replace")
+
+    def close(self):
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+    def _offset(self, sequence: int) -> int:
+        return HEADER_SIZE + (sequence % self.slots) * self.slot_size
+
+
+class ProcessIngestService(IngestService):
+    """An `IngestService` which reads the radio in a child process, see the
+    top of this file. The parent parses each packet's JSON, passes it to
+    `on_packet` and logs it, so deduplication across radios works the same
+    as with the threaded service.
+
+    The child is restarted with backoff if it dies. Uplink writes are sent
+    to it over a pipe, and are reported as sent as long as the radio is
+    connected."""
+
+    def __init__(
+        self,
+        *args,
+        slots: int = RING_SLOTS,
+        slot_size: int = SLOT_SIZE,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.slots = slots
+        self.slot_size = slot_size
+        self.lost = 0
+        """Packets overwritten in the ring before they were read"""
+
+    def write(self, data: bytes) -> bool:
+        with self._port_lock:
+            if self._port is None or self.state != ConnectionState.CONNECTED:
+                return False
+
+            try:
+                self._port.send_bytes(data)
+            except OSError as e:
+                print(f"Failed to write to {self.port}: {e}")
+                return False
+
+        return True
+
+    def health(self) -> dict:
+        health = super().health()
+        health["ring_lost"] = self.lost
+        return health
+
+    def _run(self):
+        if self._previous is not None:
+            self._previous.join()
+            self._previous = None
+
+        # Not forked, the child should not start out with copies of every
+        # thread and lock in the GUI
+        context = multiprocessing.get_context("spawn")
+        backoff = self.min_backoff
+        self.state = ConnectionState.CONNECTING
+
+        while not self._stop.is_set():
+            # Counts carry on from where the last child left off
+            base = [
+                self.crc_errors,
+                self.frame_errors,
+                self.decode_errors,
+                self.reconnects,
+            ]
+            ring = PacketRing(slots=self.slots, slot_size=self.slot_size)
+            doorbell = context.Semaphore(0)
+            stop = context.Event()
+            uplink_receive, uplink_send = context.Pipe(duplex=False)
+            process = context.Process(
+                target=run_child,
+                args=(
+                    self.port,
+                    self.baud,
+                    self.min_backoff,
+                    self.max_backoff,
+                    self.port_factory,
+                    ring.name,
+                    self.slots,
+                    self.slot_size,
+                    doorbell,
+                    stop,
+                    uplink_receive,
+                ),
+                name=f"ingest_{self.port}",
+                daemon=True,
+            )
+
+            try:
+                process.start()
+                with self._port_lock:
+                    self._port = uplink_send
+
+                while not self._stop.is_set() and process.is_alive():
+                    doorbell.acquire(timeout=STATS_INTERVAL)
+                    self._read(ring)
+                    self._read_stats(ring, base)
+            finally:
+                with self._port_lock:
+                    self._port = None
+                stop.set()
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+                uplink_send.close()
+                uplink_receive.close()
+                ring.close()
+                ring.unlink()
+
+            if not self._stop.is_set():
+                # The child should only stop when asked to
+                self.last_error = f"ingest process exited with {process.exitcode}"
+                print(f"Telemetry on {self.port} {self.last_error}")
+                self.reconnects += 1
+                self.state = ConnectionState.RECONNECTING
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+        self.state = ConnectionState.DISCONNECTED
+        self._release()
+
+    def _read(self, ring: PacketRing):
+        for record in ring.read():
+            try:
+                received_json = record.data.decode("utf-8")
+                packet = json.loads(received_json)
+            except ValueError as e:
+                self.decode_errors += 1
+                print(f"Failed to decode json from the ingest process: {e}")
+                continue
+
+            self.packets += 1
+            self.last_packet_time = record.received
+            self._deliver(received_json, packet, record.received)
+
+        self.lost = ring.lost
+
+    def _read_stats(self, ring: PacketRing, base: list[int]):
+        stats = ring.read_stats()
+        if stats is None:
+            return
+
+        counts, self.state, error = stats
+        (
+            self.crc_errors,
+            self.frame_errors,
+            self.decode_errors,
+            self.reconnects,
+        ) = (b + c for b, c in zip(base, counts))
+        self.last_error = error or None
+
+
+class ChildIngestService(IngestService):
+    """The `IngestService` running in the child, which writes packets into
+    the ring instead of passing them on."""
+
+    def __init__(self, ring: PacketRing, doorbell: Any, *args, **kwargs):
+        super().__init__(
+            *args, on_packet=lambda packet, received: None, log_path=None, **kwargs
+        )
+        self.ring = ring
+        self.doorbell = doorbell
+
+    def process_line(self, line: bytes) -> Optional[dict]:
+        decoded = self.decode_line(line)
+        if decoded is None:
+            return None
+
+        received_json, packet = decoded
+        data = received_json.encode("utf-8")
+        if not self.ring.write(data, self.clock.now()):
+            self.frame_errors += 1
+            print(f"Packet of {len(data)} bytes does not fit in the ring, dropped")
+            return None
+
+        self.doorbell.release()
+        return packet
+
+
+def run_child(
+    port: str,
+    baud: int,
+    min_backoff: float,
+    max_backoff: float,
+    port_factory: PortFactory,
+    ring_name: str,
+    slots: int,
+    slot_size: int,
+    doorbell: Any,
+    stop: Any,
+    uplink: Any,
+):
+    """Entry point of the child process."""
+    ring = PacketRing(ring_name, slots, slot_size)
+    service = ChildIngestService(
+        ring,
+        doorbell,
+        port,
+        baud=baud,
+        min_backoff=min_backoff,
+        max_backoff=max_backoff,
+        port_factory=port_factory,
+    )
+    service.start()
+    ring.write_stats(service)
+    Thread(
+        target=forward_uplink, args=(service, uplink, stop), name="uplink", daemon=True
+    ).start()
+
+    while not stop.wait(STATS_INTERVAL):
+        ring.write_stats(service)
+
+    service.stop()
+    service.join()
+    ring.write_stats(service)
+    ring.close()
+
+
+def forward_uplink(service: IngestService, uplink: Any, stop: Any):
+    """Write whatever the parent sends up through the radio."""
+    while not stop.is_set():
+        try:
+            if uplink.poll(STATS_INTERVAL):
+                service.write(uplink.recv_bytes())
+        except (EOFError, OSError):
+            return
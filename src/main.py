@@ -6,32 +6,79 @@
 # Lots of useful formulas for things used here:
 # https://www.movable-type.co.uk/scripts/latlong.html
 
+import argparse
+import datetime
 from enum import StrEnum
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hmac
+import ipaddress
+import os
 import pathlib
 import re
 from typing import Any, Callable, Optional, Union
-from urllib.parse import urlparse
+from urllib.parse import parse_qs, urlparse
 import customtkinter
-import tomlkit
-from tkintermapview import TkinterMapView
-import serial
-import serial.tools.list_ports
-from threading import Event, Thread
+from threading import Thread
 import json
 import signal
 import tkinter as tk
-import datetime
+import time
 
 ## LOCAL IMPORTS ##
-from rotator import Rotator
+from horizon_mask import HorizonMask, load_horizon_mask
+from ports import PortKind, PortMonitor
 from rotator_command import RotatorCommandWindow
-from utils import GPSPoint, crc8
+from rotator_group import RotatorGroup
+from strip_chart import StripCharts
+from targets import TargetTracker, look_angles, target_name
+from telemetry_view import (
+    RateLimiter,
+    TelemetryViewModel,
+    format_rotator,
+    format_target,
+)
+from telemetry import DEFAULT_TARGET, PACKET_LOG_PATH, TelemetryMerger
+from uplink import UplinkFull
+from utils import GPSPoint, warm_up_geo_mag
 ###################
 
+# NOTE: `tomlkit`, `serial` and `tkintermapview` are imported where they are
+# first used rather than up here. Together they make up most of the time it
+# takes for the window to appear, and none of them are needed to draw it.
+
 ROCKET_PACKET_CONT = None
 """Global variable storing rocket packet data"""
 
+ROTATORS = RotatorGroup(DEFAULT_TARGET)
+"""Global variable storing every rotator, by name"""
+
+TELEMETRY: Optional[TelemetryMerger] = None
+"""Global variable storing the telemetry ingest from all the radios"""
+
+TARGETS = TargetTracker()
+"""Global variable storing everything being tracked, by target name"""
+
+HORIZON_MASK: Optional[HorizonMask] = None
+"""Global variable storing the ground station's horizon mask, if it has one"""
+
+GROUND_LOCATION_PATH = "ground_location.toml"
+ROTATORS_PATH = "rotators.toml"
+HORIZON_MASK_PATH = "horizon_mask.toml"
+
+MAIN_ROTATOR = "main"
+"""The rotator at the ground station, picked in the window"""
+
+REDRAW_INTERVAL_MS = 100
+"""How often the Telemetry panel and the map are brought up to date"""
+MARKER_INTERVAL = 0.2
+"""Least seconds between moving each target's marker on the map"""
+PATH_INTERVAL = 1.0
+"""Least seconds between redrawing each target's trajectory, which can be
+thousands of points"""
+LAST_PACKET_MAX_AGE = 15 * 60.0
+"""Seconds after which the last logged packet is not shown at startup, as it
+is most likely from an earlier flight"""
+
 
 class App(customtkinter.CTk):
     APP_NAME = "ARCHER/AROWSS - UNL Aerospace"
@@ -68,7 +115,17 @@ class App(customtkinter.CTk):
 
         # Telemetry display
         self.telemetry = Telemetry(self.frame_left, command=self.set_ground_parameters)
-        self.telemetry.grid(pady=20)
+        self.telemetry.grid(pady=(20, 5))
+
+        # Which target the Telemetry panel shows and the rotator follows
+        self.target_menu = LabeledSelectMenu(
+            self.frame_left,
+            label_text="Track Target",
+            values=[DEFAULT_TARGET],
+            command=self.select_target,
+        )
+        self.target_menu.grid(pady=(0, 20))
+        self.tracked_target = DEFAULT_TARGET
 
         # Ground position settings
         self.ground_settings = GroundSettings(
@@ -89,6 +146,10 @@ class App(customtkinter.CTk):
         customtkinter.CTkButton(
             self.frame_left, text="Rescan Ports", command=self.rescan_ports
         ).grid()
+        self.auto_connect = customtkinter.CTkCheckBox(
+            self.frame_left, text="Auto Connect"
+        )
+        self.auto_connect.grid(pady=(10, 0))
 
         self.set_buttons_frame = customtkinter.CTkFrame(
             self.frame_left, corner_radius=0, fg_color="transparent"
@@ -97,17 +158,29 @@ class App(customtkinter.CTk):
         customtkinter.CTkButton(
             self.set_buttons_frame, text="Set RFD", width=50, command=self.set_telemetry
         ).grid(pady=10, padx=5, column=0, row=0)
+        customtkinter.CTkButton(
+            self.set_buttons_frame, text="Add RFD", width=50, command=self.add_telemetry
+        ).grid(pady=10, padx=5, column=1, row=0)
         customtkinter.CTkButton(
             self.set_buttons_frame,
             text="Set Rotator",
             width=50,
             command=self.set_rotator,
-        ).grid(pady=10, padx=5, column=1, row=0)
+        ).grid(pady=10, padx=5, column=2, row=0)
+
+        self.rotator_status = customtkinter.CTkLabel(
+            self.frame_left, text="Rotator: disconnected", anchor="w", justify="left"
+        )
+        self.rotator_status.grid()
+        self.link_status = customtkinter.CTkLabel(
+            self.frame_left, text="RFD: disconnected", anchor="w", justify="left"
+        )
+        self.link_status.grid()
 
         self.rotator_command_window_button = customtkinter.CTkButton(
             self.frame_left,
             text="Rotator Commands",
-            command=lambda: RotatorCommandWindow(self.rotator),
+            command=lambda: RotatorCommandWindow(ROTATORS.connection(MAIN_ROTATOR)),
         )
         self.rotator_command_window_button.grid(pady=10)
 
@@ -132,10 +205,46 @@ class App(customtkinter.CTk):
 
         self.frame_right.grid_rowconfigure(1, weight=1)
         self.frame_right.grid_rowconfigure(0, weight=0)
+        self.frame_right.grid_rowconfigure(2, weight=0)
         self.frame_right.grid_columnconfigure(0, weight=1)
         self.frame_right.grid_columnconfigure(1, weight=0)
         self.frame_right.grid_columnconfigure(2, weight=1)
 
+        # The map is created by `create_map` once the window is up
+        self.map_widget = None
+        self.ground_marker = None
+        self.target_markers = {}
+        """Target name → its map marker"""
+        self.target_paths = {}
+        """Target name → its trajectory on the map"""
+        self.drawn_trajectories = {}
+        """Target name → the version of its trajectory on the map"""
+        self.drawn_positions = {}
+        """Target name → where its marker is on the map"""
+        self.marker_limiter = RateLimiter(MARKER_INTERVAL)
+        self.path_limiter = RateLimiter(PATH_INTERVAL)
+        self.telemetry_view = TelemetryViewModel()
+
+        # Strip charts of the tracked target, under the map
+        self.charts = StripCharts(self.frame_right)
+        self.charts.grid(row=2, column=0, columnspan=3, sticky="ew")
+        self.charted_samples = 0
+        """Sequence number of the next sample of the tracked target to chart"""
+
+        self.first_frame_time = None
+
+        # How the ground station's rotator is polled and pointed, from `start`
+        self.rotator_poll_interval: Optional[float] = 0.5
+        self.rotator_resend_threshold: Optional[float] = None
+
+        # Watches for ports being plugged in and works out what is on them
+        self.port_monitor = PortMonitor()
+
+    def create_map(self):
+        """Create the map widget. This is slow (both the import and the first
+        tile requests), so it is done after the first frame is drawn."""
+        from tkintermapview import TkinterMapView
+
         self.map_widget = TkinterMapView(self.frame_right, corner_radius=0)
         self.map_widget.grid(
             row=1,
@@ -154,52 +263,174 @@ class App(customtkinter.CTk):
             pass_coords=True,
         )
 
+        self.map_widget.set_position(self.ground_position.lat, self.ground_position.lon)
+        self.map_widget.set_zoom(16)
+        self.change_map(self.map_option_menu.get())
+
+        self.update_ground_marker(self.ground_position.lat, self.ground_position.lon)
+        self.update_targets()
+
     def set_ports(self):
         self.set_rotator()
         self.set_telemetry()
 
     def set_rotator(self):
+        self.update_ports_in_use()
+
         rotator_port = self.rotator_port_menu.get()
         if rotator_port != "Select…":
-            rotator_port = rotator_port.split(maxsplit=1)[0]
-            try:
-                self.rotator = Rotator(rotator_port)
-                print(f"Rotator protocol v{self.rotator.protocol_version}")
-            except:  # noqa: E722
-                print("Rotator failed to initalize!")
+            self.connect_rotator(rotator_port.split(maxsplit=1)[0])
+
+    def connect_rotator(self, rotator_port: str):
+        # Connecting happens in the background, the old connection (if any)
+        # is closed before the new one opens its port
+        ROTATORS.connect(
+            MAIN_ROTATOR,
+            rotator_port,
+            GPSPoint(
+                self.ground_position.lat,
+                self.ground_position.lon,
+                self.ground_position.alt,
+            ),
+            mask=HORIZON_MASK,
+            poll_interval=self.rotator_poll_interval,
+            resend_threshold=self.rotator_resend_threshold,
+        )
+
+    def update_rotator_status(self):
+        statuses = ROTATORS.status()
+        if not any(status["name"] == MAIN_ROTATOR for status in statuses):
+            statuses.insert(0, {"name": MAIN_ROTATOR, "state": "disconnected"})
+
+        lines = []
+        for status in statuses:
+            name = "Rotator" if status["name"] == MAIN_ROTATOR else status["name"]
+            line = f"{name}: {status['state']}"
+            if status.get("protocol_version") is not None:
+                line += f" (v{status['protocol_version']})"
+            if status.get("latency") is not None:
+                line += f", {status['latency']['last'] * 1000:.0f} ms"
+            if status.get("reconnects", 0) > 0:
+                line += f", {status['reconnects']} reconnects"
+            if status.get("mask") is not None:
+                line += format_mask(status["mask"])
+            lines.append(line)
+
+            if status["name"] == MAIN_ROTATOR:
+                fields = format_rotator(status)
+                self.telemetry.render(self.telemetry_view.changes(fields))
+        text = "\n".join(lines)
+
+        if self.rotator_status.cget("text") != text:
+            self.rotator_status.configure(text=text)
+
+        self.after(500, self.update_rotator_status)
 
     def set_telemetry(self):
-        if self.rfd_event is not None:
-            self.rfd_event.set()
+        self.update_ports_in_use()
 
         rfd_port = self.rfd_port_menu.get()
         if rfd_port != "Select…":
             rfd_port = rfd_port.split(maxsplit=1)[0]
-            self.rfd_event = Event()
-            t = Thread(
-                target=gps_loop, args=[rfd_port, self.rfd_event], name="gps_thread"
-            )
-            t.start()
+
+            # Replace every radio with just this one
+            for port in list(self.telemetry_merger.sources):
+                if port != rfd_port:
+                    self.telemetry_merger.remove_source(port)
+
+            self.telemetry_merger.add_source(rfd_port)
             print("RFD Setup")
 
+    def add_telemetry(self):
+        """Read from another radio alongside the ones already set up."""
+        self.update_ports_in_use()
+
+        rfd_port = self.rfd_port_menu.get()
+        if rfd_port != "Select…":
+            rfd_port = rfd_port.split(maxsplit=1)[0]
+            self.telemetry_merger.add_source(rfd_port)
+            print(f"RFD added, {len(self.telemetry_merger.sources)} radios")
+
+    def update_link_status(self):
+        health = self.telemetry_merger.health()
+        if len(health["sources"]) == 0:
+            text = "RFD: disconnected"
+        else:
+            if health["last_packet_age"] is None:
+                text = "RFD: no packets yet"
+            else:
+                text = f"RFD: last packet {health['last_packet_age']:.1f}s ago"
+
+            for source in health["sources"]:
+                text += f"\n{source['port']}: {source['state']}"
+                text += f", {source['loss_rate']:.0%} loss"
+                if source["crc_errors"] > 0:
+                    text += f", {source['crc_errors']} CRC errors"
+                if source["reconnects"] > 0:
+                    text += f", {source['reconnects']} reconnects"
+
+        if self.link_status.cget("text") != text:
+            self.link_status.configure(text=text)
+
+        self.after(500, self.update_link_status)
+
     def rescan_ports(self):
-        """Rescan and update the serial ports"""
-        self.rotator_port_menu.option_menu.configure(state="disabled")
-        self.rfd_port_menu.option_menu.configure(state="disabled")
-
-        self.port_list = list(
-            filter(
-                lambda p: "/dev/ttyS" not in p,
-                map(lambda p: str(p), serial.tools.list_ports.comports()),
-            )
-        )
-        self.port_list.insert(0, "Select…")
+        """Rescan and re-probe all the serial ports"""
+        self.port_monitor.rescan()
+
+    def poll_ports(self):
+        """Apply any port changes found by the port monitor"""
+        changed = False
+        while not self.port_monitor.changes.empty():
+            device, kind = self.port_monitor.changes.get()
+            changed = True
+
+            if kind == PortKind.ROTATOR:
+                self.port_identified(device, self.rotator_port_menu, self.set_rotator)
+            elif kind == PortKind.RFD:
+                self.port_identified(device, self.rfd_port_menu, self.set_telemetry)
+
+        if changed:
+            self.set_port_list()
+
+        self.after(250, self.poll_ports)
+
+    def port_identified(self, device: str, menu, connect: Callable[[], Any]):
+        """Fill in a port menu with a newly identified device, if one has not
+        been chosen already, and connect to it if auto connect is on."""
+        if menu.get() != "Select…":
+            return
+
+        menu.set(self.port_monitor.label(device))
+        if self.auto_connect.get():
+            connect()
 
-        self.rotator_port_menu.set_values(self.port_list)
-        self.rfd_port_menu.set_values(self.port_list)
+    def set_port_list(self):
+        self.port_list = ["Select…"] + [
+            self.port_monitor.label(device) for device in self.port_monitor.devices()
+        ]
 
-        self.rotator_port_menu.option_menu.configure(state="normal")
-        self.rfd_port_menu.option_menu.configure(state="normal")
+        for menu in [self.rotator_port_menu, self.rfd_port_menu]:
+            selected = menu.get()
+            menu.set_values(self.port_list)
+
+            # Keep the current selection if the port is still there
+            selected_device = selected.split(maxsplit=1)[0]
+            for port in self.port_list:
+                if port.split(maxsplit=1)[0] == selected_device:
+                    menu.set(port)
+
+        self.update_ports_in_use()
+
+    def update_ports_in_use(self):
+        """Stop the port monitor from probing ports the application uses."""
+        in_use = {
+            menu.get().split(maxsplit=1)[0]
+            for menu in [self.rotator_port_menu, self.rfd_port_menu]
+        } | set(self.telemetry_merger.sources)
+
+        # Including the rotators from `rotators.toml`, which are not in a menu
+        self.port_monitor.in_use = in_use | ROTATORS.ports()
 
     def set_ground_parameters(self):
         try:
@@ -218,27 +449,15 @@ class App(customtkinter.CTk):
                 self.ground_position.alt = float(alt_str)
                 self.ground_pos_toml["altitude"] = float(alt_str)
 
-            tomlkit.dump(
-                self.ground_pos_toml,
-                open("ground_location.toml", "w", encoding="utf-8"),
-            )
+            save_ground_toml(self.ground_pos_toml)
         except ValueError as e:
             print(f"Invalid value! {e}")
 
-        if self.ground_marker is not None:
-            self.ground_marker.set_position(
-                self.ground_position.lat, self.ground_position.lon
-            )
-        else:
-            self.ground_marker = self.map_widget.set_marker(
-                self.ground_position.lat, self.ground_position.lon
-            )
+        self.update_ground_marker(self.ground_position.lat, self.ground_position.lon)
+        self.ground_changed()
 
     def right_click_ground_position(self, coords):
-        if self.ground_marker is not None:
-            self.ground_marker.set_position(coords[0], coords[1])
-        else:
-            self.ground_marker = self.map_widget.set_marker(coords[0], coords[1])
+        self.update_ground_marker(coords[0], coords[1])
 
         self.ground_position = GPSPoint(coords[0], coords[1], self.ground_position.alt)
 
@@ -248,68 +467,115 @@ class App(customtkinter.CTk):
         self.ground_pos_toml["longitude"] = float(coords[1])
         self.ground_settings.altitude.set(str(self.ground_position.alt))
 
-        tomlkit.dump(
-            self.ground_pos_toml, open("ground_location.toml", "w", encoding="utf-8")
-        )
+        save_ground_toml(self.ground_pos_toml)
+        self.ground_changed()
 
-    def set_air_position(self):
-        # print("function ran yay")
-        if ROCKET_PACKET_CONT is None or "gps" not in ROCKET_PACKET_CONT:
-            self.after(500, self.set_air_position)
-            return
+    def ground_changed(self):
+        """Redo the look angles from the new ground position, and repoint."""
+        ground = GPSPoint(
+            self.ground_position.lat,
+            self.ground_position.lon,
+            self.ground_position.alt,
+        )
+        TARGETS.set_ground(ground)
+        ROTATORS.set_ground(MAIN_ROTATOR, ground)
 
-        if ROCKET_PACKET_CONT["gps"] is None:
-            self.after(500, self.set_air_position)
+    def update_ground_marker(self, lat: float, lon: float):
+        # The marker is placed by `create_map` if the map is not up yet
+        if self.map_widget is None:
             return
 
-        try:
-            gps_lat = ROCKET_PACKET_CONT["gps"]["latitude"]
-            gps_lon = ROCKET_PACKET_CONT["gps"]["longitude"]
-            gps_alt = ROCKET_PACKET_CONT["gps"]["altitude"]
-        except Exception as e:
-            print(f"Not all fields available: {e}")
-            self.after(500, self.set_air_position)
-            return
-
-        self.telemetry.lat.configure(text=f"{gps_lat:.8f}")
-        self.telemetry.lon.configure(text=f"{gps_lon:.8f}")
-        self.telemetry.alt.configure(text=f"{gps_alt:.2f}m")
-
-        self.air_position = GPSPoint(gps_lat, gps_lon, gps_alt)
-
-        # Update the marker for the air side
-        if self.air_marker is not None:
-            self.air_marker.set_position(gps_lat, gps_lon)
+        if self.ground_marker is not None:
+            self.ground_marker.set_position(lat, lon)
         else:
-            self.air_marker = self.map_widget.set_marker(gps_lat, gps_lon)
-
-        if self.ground_position is None:
-            self.after(500, self.set_air_position)
-            return
-
-        # Straight line distance between the ground positions
-        distance = self.ground_position.distance_to(self.air_position)
-
-        # Altitude above ground station position
-        altitude = self.ground_position.altitude_to(self.air_position)
-        if altitude is None:
-            altitude = 0.0
+            self.ground_marker = self.map_widget.set_marker(lat, lon)
 
-        horiz = self.ground_position.bearing_mag_corrected_to(self.air_position)
-        vert = self.ground_position.elevation_to(self.air_position)
+    def select_target(self, name: str):
+        self.tracked_target = name
+        self.charts.clear()
+        self.charted_samples = 0
+        self.show_target()
+        ROTATORS.track(name)
 
-        if self.rotator is not None:
-            self.rotator.set_position_vertical(vert)
-            self.rotator.set_position_horizontal(horiz)
+    def set_air_position(self):
+        """Redraw every target, runs every `REDRAW_INTERVAL_MS`. Only what
+        has changed is touched, and the map is redrawn at a limited rate."""
+        self.update_targets()
+        self.show_target()
+        self.update_charts()
+        self.after(REDRAW_INTERVAL_MS, self.set_air_position)
+
+    def update_targets(self):
+        """Update the target menu, and each target's marker and trajectory."""
+        names = TARGETS.names()
+        if len(names) > 0 and names != self.target_menu.option_menu.cget("values"):
+            self.target_menu.option_menu.configure(values=names)
+            if self.tracked_target not in names:
+                self.target_menu.set(names[0])
+                self.select_target(names[0])
+
+        if self.map_widget is None:
+            return
 
-        self.telemetry.rot_az.configure(text=f"{horiz:.1f}°")
-        self.telemetry.rot_alt.configure(text=f"{vert:.1f}°")
-        self.telemetry.dist.configure(text=f"{distance:.1f}")
-        self.telemetry.gr_alt.configure(text=f"{altitude:.1f}")
+        for status in TARGETS.status():
+            name = status["name"]
+            position = status["position"]
+            if position is None:
+                continue
+
+            lat_lon = (position["latitude"], position["longitude"])
+            marker = self.target_markers.get(name)
+            if marker is None:
+                self.target_markers[name] = self.map_widget.set_marker(
+                    *lat_lon, text=name
+                )
+                self.drawn_positions[name] = lat_lon
+            elif (
+                lat_lon != self.drawn_positions.get(name)
+                and self.marker_limiter.ready(name)
+            ):
+                marker.set_position(*lat_lon)
+                self.drawn_positions[name] = lat_lon
+
+            # Only redrawn when it has changed, it can be thousands of points
+            version, trajectory = TARGETS.trajectory(name)
+            if (
+                version == self.drawn_trajectories.get(name)
+                or len(trajectory) < 2
+                or not self.path_limiter.ready(name)
+            ):
+                continue
+            self.drawn_trajectories[name] = version
+
+            points = [(lat, lon) for lat, lon, _alt in trajectory]
+            path = self.target_paths.get(name)
+            if path is not None:
+                path.set_position_list(points)
+            else:
+                self.target_paths[name] = self.map_widget.set_path(points)
+
+    def update_charts(self):
+        """Add the tracked target's new samples to the strip charts."""
+        self.charted_samples, rows = TARGETS.samples(
+            self.tracked_target, self.charted_samples
+        )
+        if len(rows) > 0:
+            self.charts.add(rows)
+
+    def show_target(self):
+        """Fill in the Telemetry panel from the tracked target, touching only
+        the labels whose text changed."""
+        statuses = TARGETS.status(self.tracked_target)
+        if len(statuses) == 0 or statuses[0]["position"] is None:
+            return
 
-        self.after(500, self.set_air_position)
+        fields = format_target(statuses[0])
+        self.telemetry.render(self.telemetry_view.changes(fields))
 
     def change_map(self, new_map: str):
+        if self.map_widget is None:
+            return
+
         match new_map:
             case "Google hybrid":
                 self.map_widget.set_tile_server(
@@ -334,64 +600,123 @@ class App(customtkinter.CTk):
     def on_closing(self, signal=0, frame=None):
         print("Exiting!")
 
-        tomlkit.dump(
-            self.ground_pos_toml, open("ground_location.toml", "w", encoding="utf-8")
-        )
+        save_ground_toml(self.ground_pos_toml)
 
-        if self.rfd_event is not None:
-            self.rfd_event.set()
+        self.port_monitor.stop()
+
+        ROTATORS.stop()
+        ROTATORS.join(timeout=2)
+
+        self.telemetry_merger.stop()
+        self.telemetry_merger.join(timeout=2)
 
         self.destroy()
 
-    def start(self):
-        self.rescan_ports()
+    def on_first_frame(self, event=None):
+        if self.first_frame_time is not None:
+            return
 
-        # By default the rotator is None
-        self.rotator = None
-        # RFD thread event
-        self.rfd_event = None
+        self.first_frame_time = time.perf_counter()
+        self.after_idle(self.create_map)
 
-        #
-        if pathlib.Path("./ground_location.toml").is_file():
-            self.ground_pos_toml = tomlkit.load(
-                open("ground_location.toml", "r", encoding="utf-8")
-            )
-        else:
-            self.ground_pos_toml = tomlkit.TOMLDocument()
-            self.ground_pos_toml.add("latitude", 0)  # type: ignore
-            self.ground_pos_toml.add("longitude", 0)  # type: ignore
-            self.ground_pos_toml.add("altitude", 0)  # type: ignore
-            print(self.ground_pos_toml)
-            tomlkit.dump(
-                self.ground_pos_toml,
-                open("ground_location.toml", "w+", encoding="utf-8"),
-            )
+    def warm_up(self):
+        """Runs on a background thread at startup to do the slow work that the
+        first frame does not depend on."""
+        warm_up_geo_mag()
 
-        default_lat = float(self.ground_pos_toml.item("latitude"))  # type: ignore
-        default_lon = float(self.ground_pos_toml.item("longitude"))  # type: ignore
-        default_alt = float(self.ground_pos_toml.item("altitude"))  # type: ignore
+    def show_last_known_state(self):
+        """Fill in the telemetry display from the last logged packet, so a
+        restart does not leave the window blank until the next packet.
+        Packets older than `LAST_PACKET_MAX_AGE` are left out."""
+        last_packet = read_last_packet(PACKET_LOG_PATH)
+        if last_packet is None or last_packet[1].get("gps") is None:
+            return
+
+        timestamp, packet = last_packet
+        age = (datetime.datetime.now() - timestamp).total_seconds()
+        if age > LAST_PACKET_MAX_AGE:
+            print(f"The last logged packet is {age:.0f}s old, not showing it")
+            return
+
+        print(f"Showing the last logged packet, from {age:.0f}s ago")
+        TARGETS.update(packet, age=max(0.0, age))
+        self.show_target()
+
+    def start(
+        self,
+        rfd_ports: Optional[list[str]] = None,
+        rotator_port: Optional[str] = None,
+        rotators_path: str = ROTATORS_PATH,
+        ingest_process: bool = False,
+        horizon_mask_path: str = HORIZON_MASK_PATH,
+        poll_interval: Optional[float] = 0.5,
+        resend_threshold: Optional[float] = None,
+        uplink_attempts: Optional[int] = None,
+    ):
+        """Load the saved state, start the background services and run the
+        window. Ports given here, and the rotators in `rotators_path`, are
+        connected to right away. With `ingest_process` the RFDs are read in
+        child processes, see `ProcessIngestService`. The ground station's
+        rotator is kept above the mask in `horizon_mask_path`, if there is
+        one, and is polled and pointed as set by `poll_interval` and
+        `resend_threshold` (see `RotatorConnection`). Commands to the rocket
+        are only waited on and resent with `uplink_attempts`, see
+        `UplinkChannel`."""
+        self.rotator_poll_interval = poll_interval
+        self.rotator_resend_threshold = resend_threshold
+
+        # Telemetry ingest from the RFDs
+        self.telemetry_merger = TelemetryMerger(
+            on_packet=set_rocket_packet,
+            ingest_process=ingest_process,
+            uplink_attempts=uplink_attempts,
+        )
+
+        global TELEMETRY
+        TELEMETRY = self.telemetry_merger
+
+        self.ground_pos_toml = load_ground_toml()
+
+        global HORIZON_MASK
+        HORIZON_MASK = read_horizon_mask(horizon_mask_path)
+
+        default_lat = float(self.ground_pos_toml["latitude"])  # type: ignore
+        default_lon = float(self.ground_pos_toml["longitude"])  # type: ignore
+        default_alt = float(self.ground_pos_toml["altitude"])  # type: ignore
 
         # Set default value
-        self.map_widget.set_position(default_lat, default_lon)
-        self.map_widget.set_zoom(16)
         self.map_option_menu.set("Google hybrid")
-        self.map_widget.set_tile_server(
-            "https://mt0.google.com/vt/lyrs=y&hl=en&x={x}&y={y}&z={z}&s=Ga", max_zoom=22
-        )
 
         # The ground station position
-        self.ground_marker = None
         self.ground_position = GPSPoint(default_lat, default_lon, default_alt)
         self.ground_settings.latitude.set(str(default_lat))
         self.ground_settings.longitude.set(str(default_lon))
         self.ground_settings.altitude.set(str(default_alt))
-        self.set_ground_parameters()
-
-        # Rocket position
-        self.air_marker = None
-        self.air_position = GPSPoint(0, 0, 0)
 
-        self.after(500, self.set_air_position)
+        # Everything being tracked, the rotators are pointed as packets
+        # arrive, from the ingest threads rather than on the next redraw
+        TARGETS.set_ground(GPSPoint(default_lat, default_lon, default_alt))
+        self.show_last_known_state()
+        TARGETS.on_update = ROTATORS.point
+
+        for port in rfd_ports or []:
+            self.telemetry_merger.add_source(port)
+        if rotator_port is not None:
+            self.connect_rotator(rotator_port)
+        connect_extra_rotators(rotators_path)
+
+        # Port enumeration and the magnetic model are loaded in the background,
+        # and the map is built once the first frame is on screen. The ports
+        # connected to above are never probed.
+        Thread(target=self.warm_up, name="warm_up_thread", daemon=True).start()
+        self.update_ports_in_use()
+        self.port_monitor.start()
+        self.after(250, self.poll_ports)
+        self.bind("<Expose>", self.on_first_frame, add="+")
+
+        self.after(REDRAW_INTERVAL_MS, self.set_air_position)
+        self.after(500, self.update_rotator_status)
+        self.after(500, self.update_link_status)
 
         self.mainloop()
 
@@ -438,8 +763,48 @@ class Telemetry(customtkinter.CTkFrame):
         self.gr_alt = customtkinter.CTkLabel(self, width=50, text="...", anchor="w")
         self.gr_alt.grid(row=7, column=3)
 
+        customtkinter.CTkLabel(self, text="Actual El:").grid(row=8, column=0, padx=10)
+        self.act_alt = customtkinter.CTkLabel(self, width=50, text="...", anchor="w")
+        self.act_alt.grid(row=8, column=1)
+
+        customtkinter.CTkLabel(self, text="Actual Az:").grid(row=8, column=2, padx=10)
+        self.act_az = customtkinter.CTkLabel(self, width=50, text="...", anchor="w")
+        self.act_az.grid(row=8, column=3)
+
+        customtkinter.CTkLabel(self, text="Track Err:").grid(row=9, column=0, padx=10)
+        self.track_err = customtkinter.CTkLabel(self, width=200, text="...", anchor="w")
+        self.track_err.grid(row=9, column=1, columnspan=4)
+
         sep = tk.Frame(self, bg="#474747", height=1, bd=0)
-        sep.grid(row=8, columnspan=4, sticky="ew")
+        sep.grid(row=10, columnspan=4, sticky="ew")
+
+        customtkinter.CTkLabel(self, text="Speed:").grid(row=11, column=0, padx=10)
+        self.speed = customtkinter.CTkLabel(self, width=50, text="...", anchor="w")
+        self.speed.grid(row=11, column=1)
+
+        customtkinter.CTkLabel(self, text="Vert Rate:").grid(row=11, column=2, padx=10)
+        self.vert_rate = customtkinter.CTkLabel(self, width=50, text="...", anchor="w")
+        self.vert_rate.grid(row=11, column=3)
+
+        customtkinter.CTkLabel(self, text="Phase:").grid(row=12, column=0, padx=10)
+        self.phase = customtkinter.CTkLabel(self, width=50, text="...", anchor="w")
+        self.phase.grid(row=12, column=1)
+
+        customtkinter.CTkLabel(self, text="Apogee:").grid(row=12, column=2, padx=10)
+        self.apogee = customtkinter.CTkLabel(self, width=50, text="...", anchor="w")
+        self.apogee.grid(row=12, column=3)
+
+        customtkinter.CTkLabel(self, text="Landing:").grid(row=13, column=0, padx=10)
+        self.landing = customtkinter.CTkLabel(self, width=200, text="...", anchor="w")
+        self.landing.grid(row=13, column=1, columnspan=4)
+
+        sep = tk.Frame(self, bg="#474747", height=1, bd=0)
+        sep.grid(row=14, columnspan=4, sticky="ew")
+
+    def render(self, fields: dict[str, str]):
+        """Set the text of some fields, by the name of their label."""
+        for name, text in fields.items():
+            getattr(self, name).configure(text=text)
 
 
 class GroundSettings(customtkinter.CTkFrame):
@@ -519,93 +884,207 @@ class LabeledTextEntry(customtkinter.CTkFrame):
         self.entry.insert(0, string)
 
 
-def gps_loop(gps_port: str, event: Event):
+def load_ground_toml():
+    """Load the saved ground station position, creating the file if needed."""
+    import tomlkit
+
+    if pathlib.Path(GROUND_LOCATION_PATH).is_file():
+        with open(GROUND_LOCATION_PATH, "r", encoding="utf-8") as f:
+            return tomlkit.load(f)
+
+    ground_pos_toml = tomlkit.TOMLDocument()
+    ground_pos_toml.add("latitude", 0)  # type: ignore
+    ground_pos_toml.add("longitude", 0)  # type: ignore
+    ground_pos_toml.add("altitude", 0)  # type: ignore
+    print(ground_pos_toml)
+    save_ground_toml(ground_pos_toml)
+
+    return ground_pos_toml
+
+
+def save_ground_toml(ground_pos_toml):
+    import tomlkit
+
+    with open(GROUND_LOCATION_PATH, "w", encoding="utf-8") as f:
+        tomlkit.dump(ground_pos_toml, f)
+
+
+def read_horizon_mask(path: str) -> Optional[HorizonMask]:
+    """The horizon mask in `path`, None if there is no such file or it is
+    not a valid mask."""
+    if not pathlib.Path(path).is_file():
+        return None
+
     try:
-        gps_serial = serial.Serial(gps_port, 57600, timeout=1)
-    except IOError as e:
-        print(f"Failed to start GPS loop: {e}")
+        return load_horizon_mask(path)
+    except (OSError, ValueError) as e:
+        print(f"Not using horizon mask {path}: {e}")
+        return None
+
+
+def format_mask(mask: dict) -> str:
+    """A rotator's horizon mask status, for the end of its status line."""
+    periods = mask["periods"]
+    if mask["masked"]:
+        return f", masked for {periods[-1]['seconds']:.0f}s"
+    if len(periods) > 0:
+        return f", masked {len(periods)}x, last {periods[-1]['seconds']:.0f}s"
+    return ""
+
+
+def connect_extra_rotators(path: str):
+    """Connect the rotators set up away from the ground station, listed in
+    `path` as `[[rotator]]` tables with a `name`, `port`, `latitude`,
+    `longitude`, `altitude` and optionally the `target` to track, a
+    `horizon_mask` file, a `poll_interval` (0 to not poll) and a
+    `resend_threshold`. Without a target they follow the one picked in the
+    window."""
+    import tomlkit
+
+    if not pathlib.Path(path).is_file():
         return
 
-    print("Started GPS loop")
+    with open(path, "r", encoding="utf-8") as f:
+        rotators_toml = tomlkit.load(f)
 
-    # Ignoring the errors in this is OK because it must not crash!
-    while not event.is_set():
+    for rotator in rotators_toml.get("rotator", []):
         try:
-            new_data = gps_serial.readline().decode("utf-8").strip()
-        except Exception as e:
-            print(f"Failed to read telemetry: {e}")
+            name = str(rotator["name"])
+            ground = GPSPoint(
+                float(rotator["latitude"]),
+                float(rotator["longitude"]),
+                float(rotator["altitude"]),
+            )
+            port = str(rotator["port"])
+            poll_interval = float(rotator.get("poll_interval", 0.5)) or None
+            resend_threshold = rotator.get("resend_threshold")
+            if resend_threshold is not None:
+                resend_threshold = float(resend_threshold)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Skipping rotator in {path}: {e}")
             continue
 
-        if len(new_data) == 0:
+        if name == MAIN_ROTATOR:
+            print(f"Skipping rotator in {path}: {MAIN_ROTATOR} is the ground station's")
             continue
 
-        try:
-            received_crc, received_json = new_data.split(maxsplit=1)
-            received_crc = int(received_crc)
-        except Exception as e:
-            print(f"Splitting failed: {e}")
-            continue
+        mask = None
+        if rotator.get("horizon_mask") is not None:
+            mask = read_horizon_mask(str(rotator["horizon_mask"]))
+
+        target = rotator.get("target")
+        ROTATORS.connect(
+            name,
+            port,
+            ground,
+            None if target is None else str(target),
+            mask,
+            poll_interval,
+            resend_threshold,
+        )
+
 
-        # Calculate CRC from the data
-        calculated_crc = None
+def read_last_packet(path: str) -> Optional[tuple[datetime.datetime, dict]]:
+    """Reads the newest packet from the packet log, and when it was received,
+    without reading the whole file. Returns None if there is no usable
+    packet."""
+    try:
+        with open(path, "rb") as packetlog:
+            packetlog.seek(0, 2)
+            size = packetlog.tell()
+            packetlog.seek(max(0, size - 8192))
+            lines = packetlog.read().splitlines()
+    except OSError:
+        return None
+
+    for line in reversed(lines):
         try:
-            calculated_crc = crc8(received_json.encode("utf-8"))
-        except Exception as e:
-            print(f"Could not calculate new CRC: {e}")
+            timestamp, received_json = line.decode("utf-8").split(",", maxsplit=1)
+            return datetime.datetime.fromisoformat(timestamp), json.loads(received_json)
+        except ValueError:
             continue
 
-        # Compare CRCs if they exist and work
-        if calculated_crc != received_crc:
-            print(f"CRCs do not match ({calculated_crc} != {received_crc})")
-            continue
-        else:
-            print(f"CRCs match ({calculated_crc} == {received_crc})")
+    return None
+
+
+def set_rocket_packet(packet: dict, age: float = 0.0):
+    global ROCKET_PACKET_CONT
+    ROCKET_PACKET_CONT = packet
+    TARGETS.update(packet, age)
 
-        # Load the data as JSON and add it to the packet
-        try:
-            decoded_data = json.loads(received_json)
-            global ROCKET_PACKET_CONT
-            ROCKET_PACKET_CONT = decoded_data
-            print(decoded_data)
-            try:
-                timestamp = datetime.datetime.now().isoformat()
-
-                with open("packet_log.txt", "a") as packetlog:
-                    packetlog.write(timestamp)
-                    packetlog.write(",")
-                    packetlog.write(received_json)
-                    packetlog.write("\n")
-            except Exception as e:
-                print(f"Saving to txt failed: {e}")
-        except Exception as e:
-            print(f"Failed to decode json: {e}")
-
-    # Close the serial port
-    gps_serial.close()
 
 HOST: str = "0.0.0.0"
 PORT: int = 8000
 
+COMMAND_TOKEN_ENV = "ARCHER_COMMAND_TOKEN"
+COMMAND_TOKEN: Optional[str] = os.environ.get(COMMAND_TOKEN_ENV) or None
+"""Token other machines have to send (as `Authorization: Bearer <token>`)
+to POST to /api/command. Without one, only this machine can send commands."""
+
 class ApiServerEndpoints(StrEnum):
     Coords = "coords"
     FullPacket = "fullpacket"
     GroundInfo = "groundinfo"
     ExtraData = "extra"
+    RotatorStatus = "rotator"
+    Rotators = "rotators"
+    LinkStatus = "link"
+    Command = "command"
+    Targets = "targets"
 
 class HTTPRequestHandler(BaseHTTPRequestHandler):
-    # def do_POST(self):
-    #     if re.search('/api/post/*', self.path):
-    #         length = int(self.headers.get('content-length'))
-    #         data = self.rfile.read(length).decode('utf8')
+    # Clients may keep their connection open between requests, so every
+    # response says how long it is. Responses are buffered and sent in one
+    # piece, as the headers on their own would wait on the client's delayed
+    # ACK before the body could follow (Nagle's algorithm).
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+    timeout = 30
+    """Seconds a kept open connection may sit idle before it is closed, so
+    idle clients do not each hold a thread forever"""
+
+    def do_POST(self):
+        parsed_url = urlparse(self.path)
 
-    #         record_id = self.path.split('/')[-1]
-    #         LocalData.records[record_id] = data
+        # The body is read whatever the response, so that the next request
+        # on the connection starts where it should
+        try:
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        except ValueError as e:
+            self.close_connection = True
+            self.__respond_empty(400, f"Invalid Content-Length; {e}")
+            return
+
+        if parsed_url.path.rstrip("/") != f"/api/{ApiServerEndpoints.Command}":
+            self.__respond_empty(404, "Not Found: the endpoint is invalid")
+            return
+
+        # These go to the rocket, so they must not come from a web page (which
+        # cannot send JSON here without a CORS preflight, which is never
+        # answered) or from another machine without the token
+        if self.headers.get_content_type() != "application/json":
+            self.__respond_empty(415, "Commands must be sent as application/json")
+            return
+        if not self.__command_authorized():
+            self.__respond_empty(403, "Commands need the command token from here")
+            return
+
+        if TELEMETRY is None:
+            self.__respond_empty(503, "Telemetry is not running")
+            return
+
+        try:
+            body = json.loads(data.decode("utf-8"))
+            command = TELEMETRY.uplink.submit(int(body["command"]))
+        except UplinkFull as e:
+            self.__respond_empty(429, str(e))
+            return
+        except (KeyError, TypeError, ValueError) as e:
+            self.__respond_empty(400, f"Expected {{\"command\": <0-255>}}; {e}")
+            return
 
-    #         logging.info("add record %s: %s", record_id, data)
-    #         self.send_response(200)
-    #     else:
-    #         self.send_response(403)
-    #     self.end_headers()
+        output = json.dumps(command.status()).encode("utf-8")
+        self.__respond(202, "application/json", output)
 
     def do_GET(self):
         global ROCKET_PACKET_CONT
@@ -613,7 +1092,7 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
         parsed_url = urlparse(self.path)
 
         if re.search('/api/*', parsed_url.path):
-            endpoint = self.path.split('/')[-1]
+            endpoint = parsed_url.path.split('/')[-1]
                 
             match endpoint:
                 case ApiServerEndpoints.Coords:
@@ -622,8 +1101,7 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
                         gps_lon = ROCKET_PACKET_CONT["gps"]["longitude"]
                         gps_alt = ROCKET_PACKET_CONT["gps"]["altitude"]
                     except Exception as e:
-                        self.send_response(404, f"No packet data; {e}")
-                        self.end_headers()
+                        self.__respond_empty(404, f"No packet data; {e}")
                         return
 
                     gps_point = GPSPoint(gps_lat, gps_lon, gps_alt)
@@ -636,8 +1114,7 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
                     try:
                         ground_point = get_ground_point()
                     except Exception as e:
-                        self.send_response(404, f"No ground data; {e}")
-                        self.end_headers()
+                        self.__respond_empty(404, f"No ground data; {e}")
                         return
 
                     output = json.dumps(ground_point.__dict__).encode("utf-8")
@@ -648,44 +1125,80 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
                         gps_lon = ROCKET_PACKET_CONT["gps"]["longitude"]
                         gps_alt = ROCKET_PACKET_CONT["gps"]["altitude"]
                     except Exception as e:
-                        self.send_response(404, f"No packet data; {e}")
-                        self.end_headers()
+                        self.__respond_empty(404, f"No packet data; {e}")
                         return
                     
                     try:
                         ground_point = get_ground_point()
                     except Exception as e:
-                        self.send_response(404, f"No ground data; {e}")
-                        self.end_headers()
+                        self.__respond_empty(404, f"No ground data; {e}")
                         return
 
                     self.air_position = GPSPoint(gps_lat, gps_lon, gps_alt)
+                    angles = look_angles(ground_point, self.air_position)
 
-                    # Straight line distance between the ground positions
-                    distance = ground_point.distance_to(self.air_position)
-
-                    # Altitude above ground station position
-                    altitude = ground_point.altitude_to(self.air_position)
-                    if altitude is None:
-                        altitude = 0.0
-
-                    horiz = ground_point.bearing_mag_corrected_to(self.air_position)
-                    vert = ground_point.elevation_to(self.air_position)
+                    targets = TARGETS.status(target_name(ROCKET_PACKET_CONT))
 
                     output = json.dumps({
                         "angles": {
-                            "horizontal": horiz,
-                            "vertical": vert,
+                            "horizontal": angles["azimuth"],
+                            "vertical": angles["elevation"],
                         },
-                        "ground_altitude": altitude,
-                        "distance": distance,
+                        "ground_altitude": angles["ground_altitude"],
+                        "distance": angles["distance"],
+                        "range": angles["range"],
+                        "flight": targets[0]["flight"] if len(targets) > 0 else None,
                     }).encode("utf-8")
                     self.__respond(200, "application/json", output)
+                case ApiServerEndpoints.RotatorStatus:
+                    status = {"state": "disconnected"}
+                    for rotator in ROTATORS.status():
+                        if rotator["name"] == MAIN_ROTATOR:
+                            status = rotator
+
+                    output = json.dumps(status).encode("utf-8")
+                    self.__respond(200, "application/json", output)
+                case ApiServerEndpoints.Rotators:
+                    output = json.dumps(ROTATORS.status()).encode("utf-8")
+                    self.__respond(200, "application/json", output)
+                case ApiServerEndpoints.LinkStatus:
+                    if TELEMETRY is None:
+                        health = {"sources": []}
+                    else:
+                        health = TELEMETRY.health()
+
+                    output = json.dumps(health).encode("utf-8")
+                    self.__respond(200, "application/json", output)
+                case ApiServerEndpoints.Targets:
+                    output = json.dumps(TARGETS.status()).encode("utf-8")
+                    self.__respond(200, "application/json", output)
+                case ApiServerEndpoints.Command:
+                    if TELEMETRY is None:
+                        commands = []
+                    else:
+                        query = parse_qs(parsed_url.query)
+                        try:
+                            id = int(query["id"][0]) if "id" in query else None
+                        except ValueError:
+                            id = None
+                        commands = TELEMETRY.uplink.status(id)
+
+                    output = json.dumps(commands).encode("utf-8")
+                    self.__respond(200, "application/json", output)
                 case _:
-                    self.send_response(404, "Not Found: the endpoint is invalid")
+                    self.__respond_empty(404, "Not Found: the endpoint is invalid")
         else:
-            self.send_response(403)
-        self.end_headers()
+            self.__respond_empty(403)
+
+    def __command_authorized(self) -> bool:
+        """Whether a command came with the token, or from this machine if
+        there is no token."""
+        if COMMAND_TOKEN is None:
+            return ipaddress.ip_address(self.client_address[0]).is_loopback
+
+        return hmac.compare_digest(
+            self.headers.get("Authorization", ""), f"Bearer {COMMAND_TOKEN}"
+        )
 
     def __respond(self, status: int, type: str, data: bytes):
         """Send an HTTP response to a client"""
@@ -695,16 +1208,24 @@ class HTTPRequestHandler(BaseHTTPRequestHandler):
         self.send_response(status)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Content-Type', type)
+        self.send_header('Content-Length', str(len(data)))
         self.end_headers()
 
         # Respond with data
         self.wfile.write(data)
 
+    def __respond_empty(self, status: int, message: Optional[str] = None):
+        """Send an HTTP response without a body, e.g. an error"""
+        self.send_response(status, message)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
 def get_ground_point():
-    ground_pos_toml = tomlkit.load(
-        open("ground_location.toml", "r", encoding="utf-8")
-    )
-    
+    import tomlkit
+
+    with open(GROUND_LOCATION_PATH, "r", encoding="utf-8") as f:
+        ground_pos_toml = tomlkit.load(f)
+
     ground_point = GPSPoint(
         ground_pos_toml["latitude"], 
         ground_pos_toml["longitude"],
@@ -713,10 +1234,19 @@ def get_ground_point():
 
     return ground_point
 
+class APIServer(ThreadingHTTPServer):
+    """Serves the API, a thread per connection."""
+
+    request_queue_size = 1024
+    """Listen backlog, limited by the system's (`somaxconn` on Linux). The
+    default of 5 overflows as soon as a few clients connect at once, and each
+    connection turned away waits a second or more before it is tried again."""
+
+
 def run_server():
     print(f"Server starting on http://{HOST}:{PORT}")
 
-    server = ThreadingHTTPServer((HOST, PORT), HTTPRequestHandler)
+    server = APIServer((HOST, PORT), HTTPRequestHandler)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
@@ -725,6 +1255,48 @@ def run_server():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=App.APP_NAME)
+    parser.add_argument(
+        "--rfd",
+        action="append",
+        default=[],
+        help="RFD port to read telemetry from, can be given more than once",
+    )
+    parser.add_argument("--rotator", help="rotator port to connect to")
+    parser.add_argument(
+        "--rotators",
+        default=ROTATORS_PATH,
+        help="file listing the rotators away from the ground station",
+    )
+    parser.add_argument(
+        "--ingest-process",
+        action="store_true",
+        help="read the RFDs in child processes, away from the window's GIL",
+    )
+    parser.add_argument(
+        "--horizon-mask",
+        default=HORIZON_MASK_PATH,
+        help="file with the lowest elevation to point the rotator at, by azimuth",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=0.5,
+        help="seconds between reading back the rotator's position, 0 to not",
+    )
+    parser.add_argument(
+        "--resend-threshold",
+        type=float,
+        help="only send a new target once the rotator is this many degrees off",
+    )
+    parser.add_argument(
+        "--uplink-attempts",
+        type=int,
+        help="wait for the rocket to acknowledge each command, sending it up to "
+        "this many times (needs firmware which sends acks)",
+    )
+    arguments = parser.parse_args()
+
     app = App()
 
     t = Thread(
@@ -735,4 +1307,13 @@ if __name__ == "__main__":
     # Catch Ctl + C
     signal.signal(signal.SIGINT, app.on_closing)
 
-    app.start()
+    app.start(
+        rfd_ports=arguments.rfd,
+        rotator_port=arguments.rotator,
+        rotators_path=arguments.rotators,
+        ingest_process=arguments.ingest_process,
+        horizon_mask_path=arguments.horizon_mask,
+        poll_interval=arguments.poll_interval or None,
+        resend_threshold=arguments.resend_threshold,
+        uplink_attempts=arguments.uplink_attempts,
+    )
@@ -0,0 +1,383 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Fast post-flight queries on the packet log. The log only ever grows, one
+# `timestamp,json` line per packet across every session, so a sidecar index
+# of timestamp → byte offset is kept next to it (`packet_log.txt.idx`). With
+# that, the log is memory-mapped and only the lines in the requested time
+# range are read and decoded.
+#
+# Usage:
+#   uv run src/packet_log.py packet_log.txt
+#       List the sessions in the log
+#   uv run src/packet_log.py packet_log.txt --start 2025-06-20T10:00 --end ...
+#       Print the lines in a time range, `--session N` picks a whole session
+#
+# The output of a query is itself a packet log, so it can be saved and given
+# to `replay.py`.
+
+import argparse
+from array import array
+from bisect import bisect_left, bisect_right
+import datetime
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Iterator, Optional
+
+## LOCAL IMPORTS ##
+from telemetry import PACKET_LOG_PATH
+###################
+
+SESSION_GAP = 300.0
+"""Seconds without packets after which a new session is started. A new
+session is also started whenever the timestamps go backwards."""
+
+INDEX_MAGIC = b"PKTIDX2\0"
+INDEX_HEADER = struct.Struct("<8sQQQ16s")
+"""Magic, bytes of the log indexed, number of entries, number of sessions
+and the fingerprint of the log"""
+
+FINGERPRINT_BYTES = 4096
+"""How much of the start of the log its fingerprint covers. The first line
+is a timestamp down to the microsecond, so a different log never starts the
+same."""
+
+
+class Session:
+    """A run of packets with no long gaps in it, usually a single flight."""
+
+    def __init__(self, number: int, first: int, last: int, start: float, end: float):
+        self.number = number
+        self.first = first
+        """Index of the first entry in the session"""
+        self.last = last
+        """Index after the last entry in the session"""
+        self.start = start
+        self.end = end
+
+    def __len__(self) -> int:
+        return self.last - self.first
+
+    def start_time(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.start)
+
+    def end_time(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.end)
+
+
+class PacketLog:
+    """A packet log opened for queries. The index is built the first time,
+    and after that only the lines added since are indexed.
+
+    Use as a context manager, or call `close` when done."""
+
+    def __init__(
+        self,
+        path: str = PACKET_LOG_PATH,
+        index_path: Optional[str] = None,
+        session_gap: float = SESSION_GAP,
+    ):
+        self.path = path
+        self.index_path = index_path or f"{path}.idx"
+        self.session_gap = session_gap
+
+        self.timestamps = array("d")
+        """POSIX timestamp of each indexed line"""
+        self.offsets = array("Q")
+        """Byte offset of each indexed line"""
+        self.session_starts = array("Q")
+        """Index of the first entry of each session"""
+        self.indexed_bytes = 0
+        """How much of the log has been indexed, always a whole number of lines"""
+        self.fingerprint = b""
+        """`fingerprint` of the log when it was indexed"""
+
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+
+        self._load_index()
+        self.update()
+
+    def __enter__(self) -> "PacketLog":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def update(self) -> int:
+        """Index anything added to the log since it was last indexed, and
+        remap it. Returns the number of new entries."""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+
+        if self.indexed_bytes > 0 and (
+            size < self.indexed_bytes
+            or self._fingerprint(self.indexed_bytes) != self.fingerprint
+        ):
+            # The log was replaced or truncated, start over
+            print(f"{self.path} is not the log its index was built from, reindexing")
+            self._clear()
+
+        self.close()
+        if size > 0:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if size == self.indexed_bytes:
+            return 0
+
+        added = self._index_from(self.indexed_bytes)
+        self.fingerprint = self._fingerprint(self.indexed_bytes)
+        self._save_index()
+        return added
+
+    def session(self, number: int) -> Session:
+        """One session, raises `ValueError` if there is no such session."""
+        sessions = self.sessions()
+        if not 0 <= number < len(sessions):
+            raise ValueError(
+                f"There is no session {number}, {self.path} has {len(sessions)}"
+            )
+        return sessions[number]
+
+    def sessions(self) -> list[Session]:
+        sessions = []
+        for number, first in enumerate(self.session_starts):
+            if number + 1 < len(self.session_starts):
+                last = self.session_starts[number + 1]
+            else:
+                last = len(self.timestamps)
+
+            sessions.append(
+                Session(
+                    number,
+                    first,
+                    last,
+                    self.timestamps[first],
+                    self.timestamps[last - 1],
+                )
+            )
+        return sessions
+
+    def query_lines(
+        self,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+        session: Optional[int] = None,
+    ) -> Iterator[bytes]:
+        """Yields the raw log lines (without their newline) from `start` up
+        to and including `end`, optionally only from one session. Lines are
+        in log order. Raises `ValueError` if there is no such session."""
+        sessions = self.sessions()
+        if session is not None:
+            sessions = [self.session(session)]
+
+        if self._map is None:
+            return
+
+        low = -float("inf") if start is None else start.timestamp()
+        high = float("inf") if end is None else end.timestamp()
+
+        for current in sessions:
+            if current.end < low or current.start > high:
+                continue
+
+            # Timestamps only go forwards within a session
+            first = bisect_left(self.timestamps, low, current.first, current.last)
+            last = bisect_right(self.timestamps, high, first, current.last)
+
+            for i in range(first, last):
+                offset = self.offsets[i]
+                line_end = self._map.find(b"\n", offset, self.indexed_bytes)
+                yield self._map[offset:line_end].rstrip(b"\r")
+
+    def query(
+        self,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+        session: Optional[int] = None,
+    ) -> Iterator[tuple[datetime.datetime, dict]]:
+        """Like `query_lines`, but decodes each line as it is reached into
+        `(timestamp, packet)`. Lines which fail to decode are skipped."""
+        for line in self.query_lines(start, end, session):
+            try:
+                timestamp, received_json = line.decode("utf-8").split(",", maxsplit=1)
+                packet = json.loads(received_json)
+            except ValueError:
+                continue
+
+            yield datetime.datetime.fromisoformat(timestamp), packet
+
+    def _clear(self):
+        self.timestamps = array("d")
+        self.offsets = array("Q")
+        self.session_starts = array("Q")
+        self.indexed_bytes = 0
+        self.fingerprint = b""
+
+    def _fingerprint(self, size: int) -> bytes:
+        """A hash of the start of the log, up to `size` bytes of it."""
+        try:
+            with open(self.path, "rb") as packetlog:
+                start = packetlog.read(min(size, FINGERPRINT_BYTES))
+        except OSError:
+            start = b""
+
+        return hashlib.blake2b(start, digest_size=16).digest()
+
+    def _index_from(self, offset: int) -> int:
+        """Index whole lines from `offset` to the end of the log. A partly
+        written last line is left for next time."""
+        added = 0
+        previous = self.timestamps[-1] if len(self.timestamps) > 0 else None
+
+        with open(self.path, "rb") as packetlog:
+            packetlog.seek(offset)
+            for line in packetlog:
+                if not line.endswith(b"\n"):
+                    break
+
+                line_offset = offset
+                offset += len(line)
+
+                try:
+                    timestamp = datetime.datetime.fromisoformat(
+                        line[: line.index(b",")].decode("utf-8")
+                    ).timestamp()
+                except ValueError:
+                    # Not a packet line, the same as `read_packet_log` does
+                    continue
+
+                if (
+                    previous is None
+                    or timestamp < previous
+                    or timestamp - previous > self.session_gap
+                ):
+                    self.session_starts.append(len(self.timestamps))
+                previous = timestamp
+
+                self.timestamps.append(timestamp)
+                self.offsets.append(line_offset)
+                added += 1
+
+        self.indexed_bytes = offset
+        return added
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "rb") as index:
+                magic, indexed_bytes, entries, sessions, fingerprint = (
+                    INDEX_HEADER.unpack(index.read(INDEX_HEADER.size))
+                )
+                if magic != INDEX_MAGIC:
+                    raise ValueError("not a packet log index")
+
+                timestamps = array("d")
+                offsets = array("Q")
+                session_starts = array("Q")
+                timestamps.fromfile(index, entries)
+                offsets.fromfile(index, entries)
+                session_starts.fromfile(index, sessions)
+        except FileNotFoundError:
+            return
+        except (OSError, EOFError, ValueError, struct.error) as e:
+            print(f"Ignoring packet log index {self.index_path}: {e}")
+            return
+
+        if sys.byteorder != "little":
+            timestamps.byteswap()
+            offsets.byteswap()
+            session_starts.byteswap()
+
+        self.timestamps = timestamps
+        self.offsets = offsets
+        self.session_starts = session_starts
+        self.indexed_bytes = indexed_bytes
+        self.fingerprint = fingerprint
+
+    def _save_index(self):
+        timestamps = self.timestamps
+        offsets = self.offsets
+        session_starts = self.session_starts
+        if sys.byteorder != "little":
+            timestamps = array("d", timestamps)
+            offsets = array("Q", offsets)
+            session_starts = array("Q", session_starts)
+            for values in (timestamps, offsets, session_starts):
+                values.byteswap()
+
+        # Written to the side and moved into place, so a crash part way
+        # through never leaves a broken index
+        temporary_path = f"{self.index_path}.tmp"
+        try:
+            with open(temporary_path, "wb") as index:
+                index.write(
+                    INDEX_HEADER.pack(
+                        INDEX_MAGIC,
+                        self.indexed_bytes,
+                        len(timestamps),
+                        len(session_starts),
+                        self.fingerprint,
+                    )
+                )
+                timestamps.tofile(index)
+                offsets.tofile(index)
+                session_starts.tofile(index)
+            os.replace(temporary_path, self.index_path)
+        except OSError as e:
+            print(f"Failed to save packet log index: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a packet log")
+    parser.add_argument("log", nargs="?", default=PACKET_LOG_PATH)
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--session", type=int, help="only this session")
+    arguments = parser.parse_args()
+
+    with PacketLog(arguments.log) as packet_log:
+        if arguments.session is not None:
+            try:
+                packet_log.session(arguments.session)
+            except ValueError as e:
+                parser.error(str(e))
+
+        if (
+            arguments.start is None
+            and arguments.end is None
+            and arguments.session is None
+        ):
+            for session in packet_log.sessions():
+                print(
+                    f"{session.number}: {session.start_time()} to "
+                    f"{session.end_time()}, {len(session)} packets"
+                )
+            return
+
+        output = sys.stdout.buffer
+        for line in packet_log.query_lines(
+            arguments.start, arguments.end, arguments.session
+        ):
+            output.write(line + b"\n")
+
+
+if __name__ == "__main__":
+    main()
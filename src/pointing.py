@@ -0,0 +1,136 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Look angles on the WGS84 ellipsoid, from a local east, north, up (ENU)
+# frame at the ground station.
+#
+# `GPSPoint.elevation_to` works on a sphere and treats the ground as flat
+# between the two points, so its error grows with range. Here both points
+# are converted to Earth centered, Earth fixed (ECEF) coordinates and the
+# difference is rotated into the ground station's ENU frame, which is exact
+# at any range. Everything about the ground station is worked out once, so
+# each fix only costs its own conversion and a few multiplies.
+#
+# https://en.wikipedia.org/wiki/Geographic_coordinate_conversion
+
+import functools
+import math
+from typing import Any
+
+## LOCAL IMPORTS ##
+from utils import GPSPoint
+###################
+
+WGS84_A = 6378137.0
+"""Semi-major axis in meters"""
+WGS84_F = 1 / 298.257223563
+"""Flattening"""
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+"""First eccentricity squared"""
+
+
+def ecef(
+    latitude: float, longitude: float, altitude: float
+) -> tuple[float, float, float]:
+    """Geodetic position in degrees and meters to ECEF meters."""
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    sin_lat = math.sin(lat)
+    cos_lat = math.cos(lat)
+
+    # Radius of curvature in the prime vertical
+    n = WGS84_A / math.sqrt(1 - WGS84_E2 * sin_lat * sin_lat)
+
+    return (
+        (n + altitude) * cos_lat * math.cos(lon),
+        (n + altitude) * cos_lat * math.sin(lon),
+        (n * (1 - WGS84_E2) + altitude) * sin_lat,
+    )
+
+
+class PointingFrame:
+    """The ENU frame at a ground station. Angles are in degrees, with the
+    azimuth from true north in -180 to 180 like `GPSPoint.bearing_to`, and
+    distances in meters."""
+
+    def __init__(self, ground: GPSPoint):
+        self.ground = ground
+        self.origin = ecef(ground.lat, ground.lon, ground.alt or 0.0)
+
+        lat = math.radians(ground.lat)
+        lon = math.radians(ground.lon)
+        sin_lat, cos_lat = math.sin(lat), math.cos(lat)
+        sin_lon, cos_lon = math.sin(lon), math.cos(lon)
+
+        self.rotation = (
+            (-sin_lon, cos_lon, 0.0),
+            (-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat),
+            (cos_lat * cos_lon, cos_lat * sin_lon, sin_lat),
+        )
+        """ECEF to (east, north, up), one row each"""
+
+    def enu(
+        self, latitude: float, longitude: float, altitude: float
+    ) -> tuple[float, float, float]:
+        """Meters east, north and up of the ground station."""
+        x, y, z = ecef(latitude, longitude, altitude)
+        ox, oy, oz = self.origin
+        dx, dy, dz = x - ox, y - oy, z - oz
+        (ex, ey, _), (nx, ny, nz), (ux, uy, uz) = self.rotation
+
+        return (
+            ex * dx + ey * dy,
+            nx * dx + ny * dy + nz * dz,
+            ux * dx + uy * dy + uz * dz,
+        )
+
+    def look(
+        self, latitude: float, longitude: float, altitude: float
+    ) -> tuple[float, float, float]:
+        """Azimuth, elevation and slant range to a position."""
+        east, north, up = self.enu(latitude, longitude, altitude)
+        horizontal = math.hypot(east, north)
+
+        return (
+            math.degrees(math.atan2(east, north)),
+            math.degrees(math.atan2(up, horizontal)),
+            math.hypot(horizontal, up),
+        )
+
+    def look_batch(self, latitudes: Any, longitudes: Any, altitudes: Any) -> tuple:
+        """`look` for arrays of positions at once, returning an array each of
+        azimuths, elevations and slant ranges. NaN positions give NaN. Needs
+        NumPy (the `export` extra)."""
+        import numpy
+
+        lat = numpy.radians(numpy.asarray(latitudes, dtype=numpy.float64))
+        lon = numpy.radians(numpy.asarray(longitudes, dtype=numpy.float64))
+        alt = numpy.asarray(altitudes, dtype=numpy.float64)
+
+        sin_lat = numpy.sin(lat)
+        cos_lat = numpy.cos(lat)
+        n = WGS84_A / numpy.sqrt(1 - WGS84_E2 * sin_lat * sin_lat)
+
+        ox, oy, oz = self.origin
+        dx = (n + alt) * cos_lat * numpy.cos(lon) - ox
+        dy = (n + alt) * cos_lat * numpy.sin(lon) - oy
+        dz = (n * (1 - WGS84_E2) + alt) * sin_lat - oz
+
+        (ex, ey, _), (nx, ny, nz), (ux, uy, uz) = self.rotation
+        east = ex * dx + ey * dy
+        north = nx * dx + ny * dy + nz * dz
+        up = ux * dx + uy * dy + uz * dz
+        horizontal = numpy.hypot(east, north)
+
+        return (
+            numpy.degrees(numpy.arctan2(east, north)),
+            numpy.degrees(numpy.arctan2(up, horizontal)),
+            numpy.hypot(horizontal, up),
+        )
+
+
+@functools.lru_cache(maxsize=16)
+def pointing_frame(latitude: float, longitude: float, altitude: float) -> PointingFrame:
+    """The frame at a ground position, cached as the ground station hardly
+    ever moves."""
+    return PointingFrame(GPSPoint(latitude, longitude, altitude))
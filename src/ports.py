@@ -0,0 +1,222 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Background serial port monitoring, so ports can be plugged in and removed
+# while the application is running, and so that the rotator and RFD can be
+# told apart without having to guess which /dev/ttyUSB is which.
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import StrEnum
+from queue import Queue
+from threading import Event, Lock, Thread
+import time
+from typing import Optional
+
+## LOCAL IMPORTS ##
+from utils import FrameError, unframe
+###################
+
+ROTATOR_BAUD = 115200
+RFD_BAUD = 57600
+
+
+class PortKind(StrEnum):
+    PROBING = "probing"
+    ROTATOR = "rotator"
+    RFD = "RFD"
+    UNKNOWN = "unknown"
+
+
+def list_serial_ports() -> dict[str, str]:
+    """Lists the usable serial ports, skipping the built-in /dev/ttyS ones.
+    Returns a map of device path to a human readable description."""
+    import serial.tools.list_ports
+
+    return {
+        p.device: str(p)
+        for p in serial.tools.list_ports.comports()
+        if "/dev/ttyS" not in p.device
+    }
+
+
+def probe_rotator(device: str, timeout: float) -> bool:
+    """Check if a rotator is attached to a port by asking for its version."""
+    import serial
+
+    with serial.Serial(device, ROTATOR_BAUD, timeout=timeout) as port:
+        port.reset_input_buffer()
+        port.write(b"VERS\n")
+
+        # The rotator echoes the command back before responding
+        _echo = port.readline()
+        response = port.readline().decode("utf-8", errors="replace").split()
+
+    return len(response) == 2 and response[0] == "OK"
+
+
+def probe_rfd(device: str, timeout: float) -> bool:
+    """Check if an RFD is attached to a port by waiting for a telemetry line
+    with a valid CRC."""
+    import serial
+
+    deadline = time.monotonic() + timeout
+    with serial.Serial(device, RFD_BAUD, timeout=0.25) as port:
+        while time.monotonic() < deadline:
+            line = port.readline().decode("utf-8", errors="replace").strip()
+
+            try:
+                unframe(line)
+                return True
+            except FrameError:
+                continue
+
+    return False
+
+
+def probe_port(device: str, timeout: float) -> PortKind:
+    """Work out what is attached to a port. The port is listened to for an
+    RFD packet first, and only if none arrives is the rotator asked for its
+    version, as anything written to an RFD is sent over the air."""
+    try:
+        if probe_rfd(device, timeout * 2):
+            return PortKind.RFD
+        if probe_rotator(device, timeout):
+            return PortKind.ROTATOR
+    except (OSError, ValueError) as e:
+        print(f"Probing {device} failed: {e}")
+
+    return PortKind.UNKNOWN
+
+
+class PortMonitor:
+    """Watches for serial ports being added or removed, and probes new ports
+    concurrently to identify them.
+
+    Changes are posted to `changes` as `(device, kind)` pairs, where `kind`
+    is None if the port was removed. Nothing here touches Tk, so the GUI
+    drains `changes` from its own thread."""
+
+    def __init__(self, interval: float = 1.0, probe_timeout: float = 0.5):
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+
+        self.changes: Queue[tuple[str, PortKind | None]] = Queue()
+
+        self.descriptions: dict[str, str] = {}
+        """Device path → description, for every port currently present"""
+        self.kinds: dict[str, PortKind] = {}
+        """Device path → what is attached to it, for every port currently present"""
+
+        self.in_use: set[str] = set()
+        """Ports which are opened by the application and must not be probed"""
+
+        self._lock = Lock()
+        self._rescan = Event()
+        self._stop = Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=8, thread_name_prefix="port_probe"
+        )
+        self._thread = Thread(target=self._run, name="port_monitor", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Stop watching, and wait up to `timeout` for a scan in progress to
+        finish. Probes already running are left to finish on their own."""
+        self._stop.set()
+        self._rescan.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def rescan(self):
+        """Forget what is known about every port and probe them all again."""
+        with self._lock:
+            for device in self.descriptions:
+                self.changes.put((device, None))
+            self.descriptions.clear()
+            self.kinds.clear()
+
+        self._rescan.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except OSError as e:
+                print(f"Failed to list serial ports: {e}")
+
+            self._rescan.wait(self.interval)
+            self._rescan.clear()
+
+    def scan(self):
+        current = list_serial_ports()
+
+        with self._lock:
+            # Nothing can be probed once stopped. `stop` waits for this scan
+            # before shutting down the executor, so it is still there below
+            if self._stop.is_set():
+                return
+
+            removed = self.descriptions.keys() - current.keys()
+            added = current.keys() - self.descriptions.keys()
+            probe = []
+
+            for device in removed:
+                del self.descriptions[device]
+                del self.kinds[device]
+                self.changes.put((device, None))
+
+            for device in sorted(added):
+                self.descriptions[device] = current[device]
+
+                if device in self.in_use:
+                    self.kinds[device] = PortKind.UNKNOWN
+                    self.changes.put((device, PortKind.UNKNOWN))
+                    continue
+
+                self.kinds[device] = PortKind.PROBING
+                self.changes.put((device, PortKind.PROBING))
+                probe.append(device)
+
+        # Outside the lock, as a probe which is already done calls
+        # `_probe_done` straight away, and that takes the lock
+        for device in probe:
+            future = self._executor.submit(self._probe, device)
+            future.add_done_callback(
+                lambda f, device=device: self._probe_done(device, f)
+            )
+
+    def _probe(self, device: str) -> PortKind:
+        # The application may have opened the port since it was queued
+        if device in self.in_use:
+            return PortKind.UNKNOWN
+        return probe_port(device, self.probe_timeout)
+
+    def _probe_done(self, device: str, future: Future):
+        if future.cancelled():
+            return
+
+        kind = future.result()
+        with self._lock:
+            # The port may have been removed while it was being probed
+            if self.kinds.get(device) != PortKind.PROBING:
+                return
+            self.kinds[device] = kind
+
+        self.changes.put((device, kind))
+
+    def devices(self) -> list[str]:
+        with self._lock:
+            return sorted(self.descriptions)
+
+    def label(self, device: str) -> str:
+        """The text shown for a port in the port selection menus."""
+        with self._lock:
+            description = self.descriptions.get(device, device)
+            kind = self.kinds.get(device, PortKind.UNKNOWN)
+
+        if kind == PortKind.UNKNOWN:
+            return description
+        return f"{description} [{kind}]"
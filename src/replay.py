@@ -0,0 +1,247 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Replays a recorded packet log (`packet_log.txt`) as if it were coming from
+# an RFD, either over a pseudo-terminal which the application can connect to,
+# or in-process through the telemetry pipeline.
+#
+# Usage:
+#   uv run src/replay.py packet_log.txt --pty [--speed 10]
+#       Replay over a pseudo-terminal, start the application with the printed
+#       port as `--rfd` to watch it
+#   uv run src/replay.py packet_log.txt --bench
+#       Replay in-process as fast as possible and report the ingest throughput
+#
+# A speed of 1 is real time, N is N times real time and 0 is as fast as
+# possible.
+
+import argparse
+import datetime
+import os
+import time
+from threading import Event
+from typing import Callable, Iterator, Optional
+
+## LOCAL IMPORTS ##
+from clock import ReplayClock
+from telemetry import TelemetryMerger
+from utils import frame
+###################
+
+
+def read_packet_log(path: str) -> Iterator[tuple[datetime.datetime, str]]:
+    """Reads `timestamp,json` lines from a packet log, skipping any which are
+    not in that format."""
+    with open(path, "r", encoding="utf-8") as packetlog:
+        for line in packetlog:
+            try:
+                timestamp, received_json = line.rstrip("\n").split(",", maxsplit=1)
+                yield datetime.datetime.fromisoformat(timestamp), received_json
+            except ValueError:
+                continue
+
+
+def first_timestamp(path: str) -> datetime.datetime:
+    for timestamp, _ in read_packet_log(path):
+        return timestamp
+
+    raise ValueError(f"{path} has no packets in it")
+
+
+class ReplaySource:
+    """Plays a packet log back in place of a serial port, so it can be given
+    to an `IngestService` as its port (see `port_factory`).
+
+    Every packet is re-framed with its CRC, exactly as the radio sends it,
+    and released at its recorded time scaled by `speed`. If a `ReplayClock`
+    is given it is moved along with the recording."""
+
+    def __init__(
+        self,
+        path: str,
+        speed: float = 1.0,
+        clock: Optional[ReplayClock] = None,
+        timeout: float = 0.1,
+    ):
+        self.speed = speed
+        self.clock = clock
+        self.timeout = timeout
+
+        self.packets = 0
+        self.finished = Event()
+
+        self._log = read_packet_log(path)
+        self._first_recorded: Optional[datetime.datetime] = None
+        self._first_real: Optional[float] = None
+
+    def port_factory(self, port: str, baud: int) -> "ReplaySource":
+        return self
+
+    def readline(self) -> bytes:
+        try:
+            timestamp, received_json = next(self._log)
+        except StopIteration:
+            # Behave like a serial port with nothing to read
+            self.finished.set()
+            time.sleep(self.timeout)
+            return b""
+
+        self._wait_until(timestamp)
+        if self.clock is not None:
+            self.clock.set(timestamp)
+
+        self.packets += 1
+        return (frame(received_json) + "\n").encode("utf-8")
+
+    def write(self, data: bytes) -> int:
+        # Nothing is listening on the other end of a replay
+        return len(data)
+
+    def close(self):
+        pass
+
+    def _wait_until(self, timestamp: datetime.datetime):
+        if self.speed <= 0:
+            return
+
+        if self._first_recorded is None or self._first_real is None:
+            self._first_recorded = timestamp
+            self._first_real = time.monotonic()
+            return
+
+        recorded = (timestamp - self._first_recorded).total_seconds()
+        delay = self._first_real + recorded / self.speed - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def replay_in_process(
+    path: str,
+    on_packet: Callable[[dict, float], None],
+    speed: float = 0.0,
+) -> TelemetryMerger:
+    """Replay a log through the telemetry pipeline, calling `on_packet` with
+    every packet which makes it through. Blocks until the replay is done and
+    returns the merger, for its statistics."""
+    clock = ReplayClock(first_timestamp(path))
+    source = ReplaySource(path, speed, clock)
+
+    merger = TelemetryMerger(on_packet=on_packet, log_path=None, clock=clock)
+    merger.add_source("replay", source.port_factory)
+
+    source.finished.wait()
+    merger.stop()
+    merger.join()
+
+    return merger
+
+
+def replay_to_pty(path: str, speed: float, start_delay: float = 5.0):
+    """Replay a log over a pseudo-terminal until it is finished. The replay
+    starts after `start_delay`, to leave time to connect to the port."""
+    import tty
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    print(f"Replaying {path} on {os.ttyname(slave)} at {speed}x", flush=True)
+    time.sleep(start_delay)
+
+    source = ReplaySource(path, speed)
+    while True:
+        line = source.readline()
+        if source.finished.is_set():
+            break
+        os.write(master, line)
+
+    print(f"Replay finished, {source.packets} packets sent", flush=True)
+
+    # Give the other end a moment to read the last of it
+    time.sleep(1)
+    os.close(slave)
+    os.close(master)
+
+
+def benchmark(path: str, pointing: bool = True) -> dict:
+    """Measure the maximum rate the telemetry pipeline can take packets at.
+    With `pointing`, the look angles are worked out for every packet as well,
+    as they would be for the rotator."""
+    from utils import GPSPoint
+
+    ground_point = GPSPoint(0.0, 0.0, 0.0)
+    if pointing:
+        from main import get_ground_point
+
+        ground_point = get_ground_point()
+
+    def on_packet(packet: dict, age: float):
+        if not pointing or packet.get("gps") is None:
+            return
+
+        try:
+            air_point = GPSPoint(
+                packet["gps"]["latitude"],
+                packet["gps"]["longitude"],
+                packet["gps"]["altitude"],
+            )
+        except (KeyError, TypeError):
+            return
+
+        ground_point.distance_to(air_point)
+        ground_point.bearing_mag_corrected_to(air_point)
+        ground_point.elevation_to(air_point)
+
+    start = time.perf_counter()
+    merger = replay_in_process(path, on_packet)
+    elapsed = time.perf_counter() - start
+
+    recorded = merger.clock.now()
+    return {
+        "packets": merger.merged,
+        "seconds": elapsed,
+        "packets_per_second": merger.merged / elapsed if elapsed > 0 else 0.0,
+        "recorded_seconds": recorded,
+        "speedup": recorded / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded packet log")
+    parser.add_argument("log", help="path to the packet log")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="replay speed, 1 is real time and 0 is as fast as possible",
+    )
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--pty", action="store_true", help="replay over a pty")
+    mode.add_argument(
+        "--bench", action="store_true", help="measure the ingest throughput"
+    )
+    parser.add_argument(
+        "--start-delay",
+        type=float,
+        default=5.0,
+        help="seconds to wait before starting a pty replay",
+    )
+    parser.add_argument(
+        "--no-pointing",
+        action="store_true",
+        help="leave out the look angle math when benchmarking",
+    )
+    arguments = parser.parse_args()
+
+    if arguments.pty:
+        replay_to_pty(arguments.log, arguments.speed, arguments.start_delay)
+        return
+
+    result = benchmark(arguments.log, pointing=not arguments.no_pointing)
+    print(
+        f"{result['packets']} packets in {result['seconds']:.3f}s, "
+        f"{result['packets_per_second']:.0f} packets/s, "
+        f"{result['speedup']:.0f}x real time"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,6 @@
 
 from enum import Enum
 from typing import Optional
-import serial
 
 
 class RotatorException(BaseException):
@@ -14,6 +13,14 @@ class RotatorInvalidResponse(RotatorException):
     """A response from the rotator was invalid or did not meet expectations."""
 
 
+class RotatorErrorResponse(RotatorException):
+    """The rotator responded with ERR, the link itself is fine."""
+
+
+class RotatorTimeout(RotatorException):
+    """The rotator did not respond in time."""
+
+
 class MovementCommand(Enum):
     # Vertical
     UP = "UP"
@@ -31,6 +38,9 @@ class Rotator:
     https://github.com/unl-rocketry/tracker-embedded/blob/main-rust/PROTOCOL.md"""
 
     def __init__(self, port: str, baud: int = 115200):
+        # Imported here as it is slow, and not needed to draw the window
+        import serial
+
         # The default timeout here is 2 seconds, is that good?
         self.main_port = serial.Serial(port, baud, timeout=0.5)
 
@@ -83,11 +93,12 @@ class Rotator:
         self.__validate_parse()
 
     def position(self) -> tuple[float, float]:
-        """Gets the current position for both the vertical and horizontal axes."""
+        """Gets the current position for both the vertical and horizontal axes,
+        in the same direction as `set_position` takes them."""
         self.main_port.write(b"GETP\n")
         result = self.__validate_parse(2)
 
-        return (float(result[0]), float(result[1]))
+        return (float(result[0]), -float(result[1]))
 
     def calibrated(self) -> bool:
         """Gets the calibration status of the dish. This must be true to use
@@ -113,8 +124,10 @@ class Rotator:
 
         response_list = response.split()
 
-        if response_list[0] == "ERR":
-            raise RotatorException
+        if len(response_list) == 0:
+            raise RotatorTimeout
+        elif response_list[0] == "ERR":
+            raise RotatorErrorResponse
         elif response_list[0] == "OK":
             pass
         else:
@@ -127,5 +140,9 @@ class Rotator:
 
         return response_list
 
+    def close(self):
+        """Closes the serial port, the rotator cannot be used after this."""
+        self.main_port.close()
+
     def __dump_input(self):
         self.main_port.reset_input_buffer()
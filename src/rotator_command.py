@@ -3,12 +3,13 @@ import customtkinter
 
 
 ## LOCAL IMPORTS ##
-from rotator import MovementCommand as mvc, Rotator
+from rotator import MovementCommand as mvc
+from rotator_connection import RotatorConnection
 ###################
 
 
 class RotatorCommandWindow(customtkinter.CTkToplevel):
-    def __init__(self, rotator: Optional[Rotator]):
+    def __init__(self, rotator: Optional[RotatorConnection]):
         super().__init__()
 
         self.title("Rotator Commands")
@@ -33,7 +34,10 @@ class RotatorCommandWindow(customtkinter.CTkToplevel):
         )
         self.calv_button.grid(pady=10, padx=20, row=0, column=0, sticky="w")
         self.calv_set_button = customtkinter.CTkButton(
-            self.frame_top, text="Set", width=100, command=self.calibrate_vertical(True)
+            self.frame_top,
+            text="Set",
+            width=100,
+            command=lambda: self.calibrate_vertical(True),
         )
         self.calv_set_button.grid(pady=10, padx=20, row=0, column=1, sticky="w")
         self.calh_button = customtkinter.CTkButton(
@@ -102,15 +106,15 @@ class RotatorCommandWindow(customtkinter.CTkToplevel):
     def calibrate_vertical(self, Set: Optional[bool] = False):
         if self.rotator is not None:
             if Set:
-                self.rotator.calibrate_vertical(Set)
+                self.rotator.submit(lambda r: r.calibrate_vertical(Set))
             else:
-                self.rotator.calibrate_vertical()
+                self.rotator.submit(lambda r: r.calibrate_vertical())
 
     def calibrate_horizontal(self):
         if self.rotator is not None:
-            self.rotator.calibrate_horizontal()
+            self.rotator.submit(lambda r: r.calibrate_horizontal())
 
     def movc(self, commands: list[mvc]):
         if self.rotator is not None:
             for command in commands:
-                self.rotator.move(command)
+                self.rotator.submit(lambda r, command=command: r.move(command))
@@ -0,0 +1,333 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+
+from collections import deque
+import math
+from threading import Condition, Event, Thread
+import time
+from typing import Any, Callable, Optional
+
+## LOCAL IMPORTS ##
+from rotator import Rotator, RotatorErrorResponse, RotatorException
+from utils import ConnectionState
+###################
+
+
+class RotatorConnection:
+    """Owns a `Rotator` on a background thread, connecting to it without
+    blocking the caller and reconnecting with exponential backoff whenever the
+    serial link fails or the rotator stops responding.
+
+    Pointing is done with `set_target`, which only keeps the latest target, so
+    nothing piles up while the rotator is unreachable. The latest target is
+    sent again after every reconnect. Other commands are passed in with
+    `submit` and are dropped if there is no connection to send them on.
+
+    The latency reported by `status` is from `set_target` being called until
+    the rotator has accepted that target, so it includes any time spent
+    waiting behind earlier commands.
+
+    Every `poll_interval` seconds the actual position is read back (GETP)
+    between commands, to work out the tracking error against the target the
+    rotator was last sent. A poll only ever goes out after any pending
+    command and target, so it delays them by at most one round trip. With a
+    `resend_threshold` pointing is closed loop: a new target is only sent
+    once it, or the actual position, is further than that many degrees from
+    what the rotator was last sent."""
+
+    MAX_PENDING_COMMANDS = 16
+    LATENCY_SAMPLES = 64
+    """Targets the latency in `status` is worked out over"""
+    ERROR_SAMPLES = 64
+    """Polls the tracking error in `status` is worked out over"""
+
+    def __init__(
+        self,
+        port: str,
+        baud: int = 115200,
+        min_backoff: float = 0.5,
+        max_backoff: float = 10.0,
+        poll_interval: Optional[float] = 0.5,
+        resend_threshold: Optional[float] = None,
+    ):
+        self.port = port
+        self.baud = baud
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        """Seconds between reading back the position, None to never do so"""
+        self.resend_threshold = resend_threshold
+        """Degrees of error before a new target is sent, None to send all"""
+
+        self.state = ConnectionState.DISCONNECTED
+        self.protocol_version: Optional[str] = None
+        self.is_calibrated: Optional[bool] = None
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+
+        self._target: Optional[tuple[float, float]] = None
+        self._target_pending = False
+        self._target_time = 0.0
+        self._latencies: deque[float] = deque(maxlen=self.LATENCY_SAMPLES)
+        self._sent: Optional[tuple[float, float]] = None
+        """Target the rotator was last sent"""
+        self._position: Optional[tuple[float, float]] = None
+        """Actual position from the last poll"""
+        self._position_time = 0.0
+        self._error: Optional[tuple[float, float, float]] = None
+        """Vertical, horizontal and total error at the last poll"""
+        self._errors: deque[float] = deque(maxlen=self.ERROR_SAMPLES)
+        self._skipped = 0
+        """Targets not sent, as the rotator was already close enough"""
+        self._commands: deque[Callable[[Rotator], Any]] = deque(
+            maxlen=self.MAX_PENDING_COMMANDS
+        )
+
+        self._condition = Condition()
+        self._stop = Event()
+        self._thread = Thread(target=self._run, name=f"rotator_{port}", daemon=True)
+        self._previous: Optional[RotatorConnection] = None
+
+    def start(self, previous: Optional["RotatorConnection"] = None):
+        """Start connecting in the background. If this replaces another
+        connection, it is stopped and waited on first so that the two never
+        have the port open at the same time."""
+        if previous is not None:
+            previous.stop()
+            self._previous = previous
+
+        self._thread.start()
+
+    def stop(self):
+        """Ask the connection to shut down, this does not wait for it."""
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def join(self, timeout: Optional[float] = None):
+        self._thread.join(timeout)
+
+    def set_target(self, vertical: float, horizontal: float):
+        """Point at a position in degrees. Replaces any target which has not
+        been sent yet."""
+        with self._condition:
+            self._target = (vertical, horizontal)
+            self._target_pending = True
+            self._target_time = time.monotonic()
+            self._condition.notify_all()
+
+    def submit(self, command: Callable[[Rotator], Any]) -> bool:
+        """Run a command against the rotator on the connection thread. Returns
+        False, and drops the command, if the rotator is not connected."""
+        if self.state != ConnectionState.CONNECTED:
+            print(f"Rotator on {self.port} is {self.state}, command dropped")
+            return False
+
+        with self._condition:
+            self._commands.append(command)
+            self._condition.notify_all()
+
+        return True
+
+    def status(self) -> dict:
+        """The connection state, for display and the API."""
+        with self._condition:
+            target = self._target
+            latencies = list(self._latencies)
+            position = self._position
+            position_time = self._position_time
+            error = self._error
+            errors = list(self._errors)
+            skipped = self._skipped
+
+        latency = None
+        if len(latencies) > 0:
+            latency = {
+                "last": latencies[-1],
+                "mean": sum(latencies) / len(latencies),
+                "max": max(latencies),
+            }
+
+        tracking_error = None
+        if error is not None:
+            tracking_error = {
+                "vertical": error[0],
+                "horizontal": error[1],
+                "total": error[2],
+                "mean": sum(errors) / len(errors),
+                "max": max(errors),
+            }
+
+        return {
+            "port": self.port,
+            "state": str(self.state),
+            "protocol_version": self.protocol_version,
+            "calibrated": self.is_calibrated,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error,
+            "target": (
+                None
+                if target is None
+                else {"vertical": target[0], "horizontal": target[1]}
+            ),
+            "latency": latency,
+            "position": (
+                None
+                if position is None
+                else {
+                    "vertical": position[0],
+                    "horizontal": position[1],
+                    "age": time.monotonic() - position_time,
+                }
+            ),
+            "error": tracking_error,
+            "skipped_targets": skipped,
+        }
+
+    def _run(self):
+        if self._previous is not None:
+            self._previous.join()
+            self._previous = None
+
+        backoff = self.min_backoff
+        self.state = ConnectionState.CONNECTING
+
+        while not self._stop.is_set():
+            try:
+                rotator = Rotator(self.port, self.baud)
+            except (RotatorException, OSError, ValueError) as e:
+                self._failed(e, "connect")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            backoff = self.min_backoff
+            self.protocol_version = rotator.protocol_version
+            self.is_calibrated = rotator.is_calibrated
+            self.last_error = None
+            print(f"Rotator protocol v{self.protocol_version} on {self.port}")
+
+            with self._condition:
+                # Whatever was last asked for is where it should be pointing now
+                self._target_pending = self._target is not None
+                self._sent = None
+                self.state = ConnectionState.CONNECTED
+
+            try:
+                self._serve(rotator)
+            except (RotatorException, OSError, ValueError) as e:
+                self._failed(e, "connection lost")
+            finally:
+                rotator.close()
+
+            if not self._stop.is_set():
+                self.reconnects += 1
+                self.state = ConnectionState.RECONNECTING
+                with self._condition:
+                    self._commands.clear()
+
+        self.state = ConnectionState.DISCONNECTED
+
+    def _serve(self, rotator: Rotator):
+        """Send targets and commands, and poll the position, until the link
+        fails or we are stopped."""
+        next_poll = time.monotonic()
+
+        while not self._stop.is_set():
+            with self._condition:
+                while (
+                    not self._target_pending
+                    and len(self._commands) == 0
+                    and not self._stop.is_set()
+                ):
+                    if self.poll_interval is None:
+                        self._condition.wait()
+                        continue
+
+                    wait = next_poll - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+
+                command = self._commands.popleft() if len(self._commands) > 0 else None
+                target = self._target if self._target_pending else None
+                target_time = self._target_time
+                self._target_pending = False
+
+                if target is not None and self._close_enough(target):
+                    self._skipped += 1
+                    target = None
+
+            if command is not None:
+                self._send(lambda: command(rotator))
+            if target is not None and self._send(lambda: rotator.set_position(target)):
+                latency = time.monotonic() - target_time
+                with self._condition:
+                    self._sent = target
+                    self._latencies.append(latency)
+
+            if self.poll_interval is not None and time.monotonic() >= next_poll:
+                next_poll = time.monotonic() + self.poll_interval
+                self._poll(rotator)
+
+    def _poll(self, rotator: Rotator):
+        """Read back the actual position, and the error from the target it
+        was last sent."""
+        try:
+            position = rotator.position()
+        except RotatorErrorResponse:
+            self.last_error = "rotator responded to GETP with ERR"
+            return
+
+        with self._condition:
+            self._position = position
+            self._position_time = time.monotonic()
+            if self._sent is not None:
+                self._error = tracking_error(self._sent, position)
+                self._errors.append(self._error[2])
+
+    def _close_enough(self, target: tuple[float, float]) -> bool:
+        """Whether a target can be left unsent in closed loop pointing, under
+        the condition."""
+        if self.resend_threshold is None or self._sent is None or self._position is None:
+            return False
+
+        return (
+            tracking_error(self._sent, target)[2] <= self.resend_threshold
+            and tracking_error(self._position, target)[2] <= self.resend_threshold
+        )
+
+    def _send(self, action: Callable[[], Any]) -> bool:
+        """Returns False if the rotator refused the command."""
+        try:
+            action()
+        except RotatorErrorResponse:
+            # The rotator refused the command, but the link is still fine
+            self.last_error = "rotator responded with ERR"
+            print(f"Rotator on {self.port} responded with ERR")
+            return False
+
+        return True
+
+    def _failed(self, error: BaseException, action: str):
+        self.last_error = f"{action}: {type(error).__name__} {error}".strip()
+        if self.state == ConnectionState.CONNECTED:
+            self.state = ConnectionState.RECONNECTING
+        print(f"Rotator on {self.port} {self.last_error}")
+
+
+def tracking_error(
+    target: tuple[float, float], actual: tuple[float, float]
+) -> tuple[float, float, float]:
+    """Vertical and horizontal error from a (vertical, horizontal) target to
+    an actual position, in degrees, and the total angle between them."""
+    vertical = actual[0] - target[0]
+    horizontal = (actual[1] - target[1] + 180) % 360 - 180
+
+    el_target, el_actual = math.radians(target[0]), math.radians(actual[0])
+    cos_total = math.sin(el_target) * math.sin(el_actual) + math.cos(
+        el_target
+    ) * math.cos(el_actual) * math.cos(math.radians(horizontal))
+    total = math.degrees(math.acos(max(-1.0, min(1.0, cos_total))))
+
+    return vertical, horizontal, total
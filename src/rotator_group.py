@@ -0,0 +1,244 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Several rotators pointed from one telemetry stream, e.g. the tracking dish
+# and a video antenna set up somewhere else on the field.
+
+from collections import deque
+from threading import Lock
+from typing import Optional
+
+## LOCAL IMPORTS ##
+from clock import SYSTEM_CLOCK, Clock
+from horizon_mask import HorizonMask, MaskTable
+from rotator_connection import RotatorConnection
+from targets import look_angles
+from utils import GPSPoint
+###################
+
+MASKED_PERIODS = 16
+"""Masked periods remembered for each rotator"""
+
+
+class GroupRotator:
+    """One rotator in a `RotatorGroup`, with where it is and what it tracks."""
+
+    def __init__(
+        self,
+        name: str,
+        connection: RotatorConnection,
+        ground: GPSPoint,
+        target: Optional[str] = None,
+        mask: Optional[HorizonMask] = None,
+    ):
+        self.name = name
+        self.connection = connection
+        self.ground = ground
+        self.target = target
+        """Target to track, the group's tracked target if None"""
+        self.mask = mask
+        self.table: Optional[MaskTable] = None
+        """`mask` for the current ground position, rebuilt when it moves"""
+        self.masked_periods: deque[list] = deque(maxlen=MASKED_PERIODS)
+        """[wall start, start, end] of each time the target went below the
+        mask, the end is None while it still is"""
+
+        self.build_table()
+
+    def build_table(self):
+        self.table = None if self.mask is None else self.mask.table(self.ground)
+
+    @property
+    def masked(self) -> bool:
+        return len(self.masked_periods) > 0 and self.masked_periods[-1][2] is None
+
+
+class RotatorGroup:
+    """Points every rotator at its target as fixes come in, with the look
+    angles worked out from that rotator's own ground position.
+
+    Each rotator has its own `RotatorConnection`, so commands go out on a
+    worker thread per rotator and `point` never waits on any of them. A
+    rotator which is slow to respond only ever falls behind by skipping to
+    the newest target, it does not hold up the others.
+
+    Rotators with a `HorizonMask` are not pointed below it, or only report
+    it, depending on the mask's mode. Each time the target goes behind the
+    mask is kept, for the status."""
+
+    def __init__(self, tracked: Optional[str] = None, clock: Clock = SYSTEM_CLOCK):
+        self.tracked = tracked
+        """Target followed by rotators which were not given one"""
+        self.clock = clock
+
+        self._rotators: dict[str, GroupRotator] = {}
+        self._positions: dict[str, GPSPoint] = {}
+        """Last fix of every target, to point rotators added or moved later"""
+        self._lock = Lock()
+
+    def connect(
+        self,
+        name: str,
+        port: str,
+        ground: GPSPoint,
+        target: Optional[str] = None,
+        mask: Optional[HorizonMask] = None,
+        poll_interval: Optional[float] = 0.5,
+        resend_threshold: Optional[float] = None,
+    ) -> RotatorConnection:
+        """Start a rotator, replacing the one by the same name if there is
+        one. The new connection waits for the old one to close its port.
+        `poll_interval` and `resend_threshold` are passed on to the
+        `RotatorConnection`."""
+        connection = RotatorConnection(
+            port, poll_interval=poll_interval, resend_threshold=resend_threshold
+        )
+        rotator = GroupRotator(name, connection, ground, target, mask)
+
+        with self._lock:
+            previous = self._rotators.get(name)
+            self._rotators[name] = rotator
+            connection.start(None if previous is None else previous.connection)
+            self._point(rotator)
+
+        return connection
+
+    def remove(self, name: str):
+        with self._lock:
+            rotator = self._rotators.pop(name, None)
+
+        if rotator is not None:
+            rotator.connection.stop()
+
+    def connection(self, name: str) -> Optional[RotatorConnection]:
+        with self._lock:
+            rotator = self._rotators.get(name)
+            return None if rotator is None else rotator.connection
+
+    def names(self) -> list[str]:
+        with self._lock:
+            return list(self._rotators)
+
+    def ports(self) -> set[str]:
+        """The serial port of every rotator, which nothing else may open."""
+        with self._lock:
+            return {rotator.connection.port for rotator in self._rotators.values()}
+
+    def set_ground(self, name: str, ground: GPSPoint):
+        """Move a rotator's ground position, and repoint it from there."""
+        with self._lock:
+            rotator = self._rotators.get(name)
+            if rotator is not None:
+                rotator.ground = ground
+                rotator.build_table()
+                self._point(rotator)
+
+    def set_mask(self, name: str, mask: Optional[HorizonMask]):
+        """Change or remove (with None) a rotator's horizon mask."""
+        with self._lock:
+            rotator = self._rotators.get(name)
+            if rotator is not None:
+                rotator.mask = mask
+                rotator.build_table()
+                self._point(rotator)
+
+    def assign(self, name: str, target: Optional[str]):
+        """Change what one rotator tracks, None to follow `tracked`."""
+        with self._lock:
+            rotator = self._rotators.get(name)
+            if rotator is not None:
+                rotator.target = target
+                self._point(rotator)
+
+    def track(self, target: str):
+        """Change the target followed by rotators which were not given one."""
+        with self._lock:
+            self.tracked = target
+            for rotator in self._rotators.values():
+                if rotator.target is None:
+                    self._point(rotator)
+
+    def point(self, target: str, position: GPSPoint):
+        """Called with every new fix of a target, from the thread which
+        received it."""
+        with self._lock:
+            self._positions[target] = position
+            for rotator in self._rotators.values():
+                if self._target_of(rotator) == target:
+                    self._point(rotator)
+
+    def status(self) -> list[dict]:
+        """Every rotator's connection state, for display and the API."""
+        with self._lock:
+            rotators = list(self._rotators.values())
+            targets = [self._target_of(rotator) for rotator in rotators]
+            masks = [self._mask_status(rotator) for rotator in rotators]
+
+        statuses = []
+        for rotator, target, mask in zip(rotators, targets, masks):
+            status = rotator.connection.status()
+            status["name"] = rotator.name
+            status["tracking"] = target
+            status["ground"] = {
+                "latitude": rotator.ground.lat,
+                "longitude": rotator.ground.lon,
+                "altitude": rotator.ground.alt,
+            }
+            status["mask"] = mask
+            statuses.append(status)
+
+        return statuses
+
+    def stop(self):
+        with self._lock:
+            rotators = list(self._rotators.values())
+
+        for rotator in rotators:
+            rotator.connection.stop()
+
+    def join(self, timeout: Optional[float] = None):
+        """Wait for every rotator to close, `timeout` is for each of them."""
+        with self._lock:
+            rotators = list(self._rotators.values())
+
+        for rotator in rotators:
+            rotator.connection.join(timeout)
+
+    def _target_of(self, rotator: GroupRotator) -> Optional[str]:
+        return self.tracked if rotator.target is None else rotator.target
+
+    def _point(self, rotator: GroupRotator):
+        """Point a rotator at the last fix of its target, under the lock."""
+        target = self._target_of(rotator)
+        position = None if target is None else self._positions.get(target)
+        if position is None:
+            return
+
+        angles = look_angles(rotator.ground, position)
+        elevation, azimuth = angles["elevation"], angles["azimuth"]
+
+        if rotator.table is not None:
+            elevation, masked = rotator.table.apply(elevation, azimuth)
+            if masked and not rotator.masked:
+                rotator.masked_periods.append(
+                    [self.clock.wall().isoformat(), self.clock.now(), None]
+                )
+            elif not masked and rotator.masked:
+                rotator.masked_periods[-1][2] = self.clock.now()
+
+        rotator.connection.set_target(elevation, azimuth)
+
+    def _mask_status(self, rotator: GroupRotator) -> Optional[dict]:
+        """The mask part of a rotator's status, under the lock."""
+        if rotator.table is None:
+            return None
+
+        now = self.clock.now()
+        return {
+            "mode": str(rotator.table.mode),
+            "masked": rotator.masked,
+            "periods": [
+                {"start": wall, "seconds": (now if end is None else end) - start}
+                for wall, start, end in rotator.masked_periods
+            ],
+        }
@@ -0,0 +1,317 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# A simulator for the rotator firmware, speaking the protocol from
+# https://github.com/unl-rocketry/tracker-embedded/blob/main-rust/PROTOCOL.md
+# over a pseudo-terminal, so `Rotator` can be exercised without hardware.
+#
+# Usage: uv run src/rotator_sim.py [--delay 0.01] [--drop 0.01] ...
+# then start the application with `--rotator <printed port>`.
+
+import argparse
+import os
+import random
+from threading import Event, Lock, Thread
+import time
+from typing import Callable, Optional
+
+## LOCAL IMPORTS ##
+from rotator import MovementCommand
+###################
+
+
+class SimulatorConfig:
+    """How the simulated rotator behaves."""
+
+    def __init__(
+        self,
+        version: str = "0.0-sim",
+        vertical_rate: float = 30.0,
+        horizontal_rate: float = 60.0,
+        vertical_limits: tuple[float, float] = (-10.0, 90.0),
+        response_delay: float = 0.0,
+        response_jitter: float = 0.0,
+        drop_rate: float = 0.0,
+        garble_rate: float = 0.0,
+        error_rate: float = 0.0,
+        calibrated: bool = True,
+        time_scale: float = 1.0,
+        seed: Optional[int] = None,
+    ):
+        self.version = version
+        self.vertical_rate = vertical_rate
+        """Slew rate of the vertical axis in degrees per second"""
+        self.horizontal_rate = horizontal_rate
+        """Slew rate of the horizontal axis in degrees per second"""
+        self.vertical_limits = vertical_limits
+        """Vertical positions outside of these are refused with ERR"""
+        self.response_delay = response_delay
+        """Seconds before each response is sent"""
+        self.response_jitter = response_jitter
+        """Up to this many extra seconds are added to each response, at random"""
+        self.drop_rate = drop_rate
+        """Chance of a command getting no echo or response at all"""
+        self.garble_rate = garble_rate
+        """Chance of a response being corrupted"""
+        self.error_rate = error_rate
+        """Chance of a valid command being answered with ERR anyway"""
+        self.calibrated = calibrated
+        """Whether the axes start out calibrated"""
+        self.time_scale = time_scale
+        """How much faster than real time the motors move"""
+        self.seed = seed
+
+
+class Axis:
+    """One axis of the rotator, moving towards its target at a fixed rate."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.position = 0.0
+        self.target = 0.0
+        self.direction = 0
+        """For continuous movement, -1 or 1, or 0 when moving to `target`"""
+
+    def update(self, seconds: float):
+        step = self.rate * seconds
+
+        if self.direction != 0:
+            self.position += self.direction * step
+            self.target = self.position
+            return
+
+        delta = self.target - self.position
+        if abs(delta) <= step:
+            self.position = self.target
+        else:
+            self.position += step if delta > 0 else -step
+
+    def stop(self):
+        self.direction = 0
+        self.target = self.position
+
+
+class RotatorSimulator:
+    """A simulated rotator. Commands go in through `handle`, or over a
+    pseudo-terminal with `serve_pty`."""
+
+    def __init__(self, config: Optional[SimulatorConfig] = None):
+        self.config = config or SimulatorConfig()
+        self.random = random.Random(self.config.seed)
+
+        self.vertical = Axis(self.config.vertical_rate)
+        self.horizontal = Axis(self.config.horizontal_rate)
+        self.vertical_calibrated = self.config.calibrated
+        self.horizontal_calibrated = self.config.calibrated
+
+        self.commands = 0
+        self.dropped = 0
+        self.garbled = 0
+        self.errors = 0
+
+        self.on_command: Optional[Callable[[str], None]] = None
+        """Called with every command line as it arrives, before it is handled"""
+
+        self._lock = Lock()
+        self._last_update = time.monotonic()
+        self._stop = Event()
+
+    def position(self) -> tuple[float, float]:
+        """The actual (vertical, horizontal) position, in the rotator's own
+        frame, where horizontal is reversed from a compass bearing."""
+        with self._lock:
+            self._update()
+            return (self.vertical.position, self.horizontal.position)
+
+    def _update(self):
+        now = time.monotonic()
+        seconds = (now - self._last_update) * self.config.time_scale
+        self._last_update = now
+
+        self.vertical.update(seconds)
+        self.horizontal.update(seconds)
+
+    def handle(self, line: str) -> Optional[list[str]]:
+        """Handle one command line. Returns the lines to send back (the echo,
+        then the response), or None if the command is dropped."""
+        self.commands += 1
+        if self.on_command is not None:
+            self.on_command(line)
+
+        if self.random.random() < self.config.drop_rate:
+            self.dropped += 1
+            return None
+
+        with self._lock:
+            self._update()
+            response = self._respond(line.split())
+
+        if response.startswith("OK") and self.random.random() < self.config.error_rate:
+            response = "ERR simulated"
+        if response.startswith("ERR"):
+            self.errors += 1
+
+        if self.random.random() < self.config.garble_rate:
+            self.garbled += 1
+            response = self._garble(response)
+
+        return [line, response]
+
+    def _respond(self, words: list[str]) -> str:
+        if len(words) == 0:
+            return "ERR empty"
+
+        command, arguments = words[0], words[1:]
+        try:
+            match command:
+                case "VERS":
+                    return f"OK {self.config.version}"
+                case "GETC":
+                    calibrated = self.vertical_calibrated and self.horizontal_calibrated
+                    return f"OK {str(calibrated).lower()}"
+                case "GETP":
+                    return f"OK {self.vertical.position} {self.horizontal.position}"
+                case "DVER":
+                    position = float(arguments[0])
+                    low, high = self.config.vertical_limits
+                    if not self.vertical_calibrated or not low <= position <= high:
+                        return "ERR"
+                    self.vertical.direction = 0
+                    self.vertical.target = position
+                case "DHOR":
+                    if not self.horizontal_calibrated:
+                        return "ERR"
+                    self.horizontal.direction = 0
+                    self.horizontal.target = float(arguments[0])
+                case "MOVC":
+                    self._move(MovementCommand(arguments[0]))
+                case "MOVV":
+                    self.vertical.target = self.vertical.position + int(arguments[0])
+                case "MOVH":
+                    self.horizontal.target = self.horizontal.position + int(
+                        arguments[0]
+                    )
+                case "CALV":
+                    if len(arguments) > 0 and arguments[0] == "SET":
+                        self.vertical.position = self.vertical.target = 0.0
+                    self.vertical_calibrated = True
+                case "CALH":
+                    self.horizontal.position = self.horizontal.target = 0.0
+                    self.horizontal_calibrated = True
+                case "HALT":
+                    self.vertical.stop()
+                    self.horizontal.stop()
+                case _:
+                    return "ERR unknown command"
+        except (IndexError, ValueError):
+            return "ERR invalid arguments"
+
+        return "OK"
+
+    def _move(self, command: MovementCommand):
+        match command:
+            case MovementCommand.UP:
+                self.vertical.direction = 1
+            case MovementCommand.DOWN:
+                self.vertical.direction = -1
+            case MovementCommand.STOP_VERTICAL:
+                self.vertical.stop()
+            case MovementCommand.LEFT:
+                self.horizontal.direction = -1
+            case MovementCommand.RIGHT:
+                self.horizontal.direction = 1
+            case MovementCommand.STOP_HORIZONTAL:
+                self.horizontal.stop()
+
+    def _garble(self, response: str) -> str:
+        garbled = list(response)
+        for _ in range(max(1, len(garbled) // 3)):
+            garbled[self.random.randrange(len(garbled))] = self.random.choice("#~?x")
+        return "".join(garbled)
+
+    def serve_pty(self) -> str:
+        """Serve the protocol over a new pseudo-terminal on a background
+        thread. Returns the path to connect to."""
+        import tty
+
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        self._slave = slave
+
+        Thread(
+            target=self._serve, args=[master], name="rotator_sim", daemon=True
+        ).start()
+
+        return os.ttyname(slave)
+
+    def stop(self):
+        self._stop.set()
+
+    def _serve(self, master: int):
+        buffer = b""
+        while not self._stop.is_set():
+            try:
+                buffer += os.read(master, 1024)
+            except OSError:
+                return
+
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", maxsplit=1)
+                lines = self.handle(line.decode("utf-8", errors="replace").strip())
+                if lines is None:
+                    continue
+
+                delay = self.config.response_delay
+                if self.config.response_jitter > 0:
+                    delay += self.random.uniform(0, self.config.response_jitter)
+                if delay > 0:
+                    time.sleep(delay)
+
+                os.write(master, "".join(f"{line}\n" for line in lines).encode())
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--vertical-rate", type=float, default=30.0)
+    parser.add_argument("--horizontal-rate", type=float, default=60.0)
+    parser.add_argument("--delay", type=float, default=0.0, help="response delay")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra delay")
+    parser.add_argument("--drop", type=float, default=0.0, help="drop rate")
+    parser.add_argument("--garble", type=float, default=0.0, help="garble rate")
+    parser.add_argument("--error", type=float, default=0.0, help="ERR rate")
+    parser.add_argument(
+        "--uncalibrated", action="store_true", help="start uncalibrated"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_arguments(arguments: argparse.Namespace) -> SimulatorConfig:
+    return SimulatorConfig(
+        vertical_rate=arguments.vertical_rate,
+        horizontal_rate=arguments.horizontal_rate,
+        response_delay=arguments.delay,
+        response_jitter=arguments.jitter,
+        drop_rate=arguments.drop,
+        garble_rate=arguments.garble,
+        error_rate=arguments.error,
+        calibrated=not arguments.uncalibrated,
+        seed=arguments.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the rotator firmware")
+    add_config_arguments(parser)
+    arguments = parser.parse_args()
+
+    simulator = RotatorSimulator(config_from_arguments(arguments))
+    print(f"Simulated rotator on {simulator.serve_pty()}", flush=True)
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
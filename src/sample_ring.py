@@ -0,0 +1,44 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# A fixed size history of recent samples, for the strip charts.
+
+from array import array
+import math
+from typing import Optional
+
+
+class SampleRing:
+    """The last `capacity` samples of a few values, each with the time it
+    was taken. Storage is allocated once, so keeping it up to date costs the
+    same however long the flight runs. Not thread safe, `TargetTracker`
+    only uses it under its lock."""
+
+    def __init__(self, capacity: int, fields: int):
+        self.capacity = capacity
+        self.fields = fields
+        self.written = 0
+        """Samples added so far, also the sequence number of the next one"""
+
+        self._times = array("d", [math.nan]) * capacity
+        self._values = [array("d", [math.nan]) * capacity for _ in range(fields)]
+
+    def append(self, time: float, *values: Optional[float]):
+        """Add a sample, with None for any value which is not known."""
+        index = self.written % self.capacity
+        self._times[index] = time
+        for column, value in zip(self._values, values):
+            column[index] = math.nan if value is None else value
+        self.written += 1
+
+    def since(self, sequence: int) -> list[tuple[float, ...]]:
+        """`(time, *values)` of every sample from `sequence` on that is still
+        kept, oldest first. Missing values are NaN."""
+        start = max(sequence, self.written - self.capacity, 0)
+        rows = []
+        for n in range(start, self.written):
+            index = n % self.capacity
+            rows.append(
+                (self._times[index], *(column[index] for column in self._values))
+            )
+        return rows
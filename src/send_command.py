@@ -1,29 +1,89 @@
-import serial
-import sys
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Send a command up to the rocket through the running application, which
+# queues it on the RFD it is already reading telemetry from. If the
+# application was started with `--uplink-attempts`, this waits until the
+# rocket acknowledges the command or it runs out of attempts.
+#
+# Usage: uv run src/send_command.py <command value> [--api http://host:8000]
+#
+# Sending from another machine needs the application's command token, in
+# the `ARCHER_COMMAND_TOKEN` environment variable of both.
 
-import utils
+import argparse
+import json
+import os
+import time
+import urllib.error
+import urllib.request
 
+DEFAULT_API = "http://localhost:8000"
+COMMAND_TOKEN_ENV = "ARCHER_COMMAND_TOKEN"
 
-def main(arguments: list[str]):
-    if len(arguments) < 2:
-        print("Not enough arguments! Need: <serial port> <command value>")
-        return
+
+def submit(api: str, command: int) -> dict:
+    headers = {"Content-Type": "application/json"}
+    token = os.environ.get(COMMAND_TOKEN_ENV)
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+
+    request = urllib.request.Request(
+        f"{api}/api/command",
+        data=json.dumps({"command": command}).encode("utf-8"),
+        headers=headers,
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.load(response)
+
+
+def status(api: str, id: int) -> dict:
+    with urllib.request.urlopen(f"{api}/api/command?id={id}", timeout=5) as response:
+        commands = json.load(response)
+
+    if len(commands) == 0:
+        raise ValueError(f"Command {id} is no longer known to the application")
+    return commands[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a command to the rocket")
+    parser.add_argument("command", type=int, help="command value, 0 to 255")
+    parser.add_argument("--api", default=DEFAULT_API, help="application API address")
+    parser.add_argument(
+        "--no-wait", action="store_true", help="do not wait for the acknowledgement"
+    )
+    arguments = parser.parse_args()
 
     try:
-        gps_serial = serial.Serial(
-            arguments[0],
-            57600,
-            timeout=1
-        )
-    except IOError as e:
-        print(f"Failed to start GPS loop: {e}")
+        command = submit(arguments.api, arguments.command)
+        print(f"Command {arguments.command} queued as #{command['id']}")
+
+        while not arguments.no_wait and command["state"] in ("queued", "waiting"):
+            time.sleep(0.25)
+            command = status(arguments.api, command["id"])
+    except urllib.error.HTTPError as e:
+        print(f"Failed to send command: {e.code} {e.reason}")
+        raise SystemExit(1)
+    except (OSError, ValueError) as e:
+        print(f"Failed to send command: {e}")
+        raise SystemExit(1)
+
+    if arguments.no_wait:
         return
 
-    command: int = int(arguments[1])
-    calculated_crc = utils.crc8(bytes([command]))
+    if command["state"] == "sent":
+        print(f"Command {arguments.command} sent")
+        return
 
-    gps_serial.write(bytes([command, calculated_crc, 0x20]))
+    print(
+        f"Command {arguments.command} {command['state']} after "
+        f"{command['attempts']} attempt(s)"
+    )
+    if command["state"] != "acked":
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    main()
@@ -0,0 +1,198 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Strip charts of the tracked target's altitude and look angles over the
+# last couple of minutes.
+#
+# Charts are drawn incrementally: each sample adds one line segment, the
+# view is scrolled along to follow the newest sample rather than everything
+# being moved, and segments are deleted as they scroll off. So drawing costs
+# the same however long the flight has been running. Everything is only
+# redrawn when a value goes outside of the chart's range, which then
+# doubles, or when the chart is resized.
+
+from collections import deque
+import math
+import tkinter as tk
+from typing import Optional
+
+import customtkinter
+
+BACKGROUND = "#1d1e1e"
+GRID = "#474747"
+LINE = "#3a7ebf"
+TEXT = "#dce4ee"
+FONT = ("Noto Sans", 10)
+
+
+class StripChart(tk.Canvas):
+    """One value plotted against time, the newest on the right. The x axis
+    is time in seconds times `scale`, and the view shows the last `span`
+    seconds of it."""
+
+    def __init__(
+        self,
+        master,
+        title: str,
+        unit: str,
+        minimum: float,
+        maximum: float,
+        span: float = 120.0,
+        wrap: bool = False,
+        width: int = 240,
+        height: int = 110,
+    ):
+        super().__init__(
+            master, width=width, height=height, bg=BACKGROUND, highlightthickness=0
+        )
+        self.title = title
+        self.unit = unit
+        self.span = span
+        self.wrap = wrap
+        """Values wrap around from maximum to minimum, like an azimuth"""
+        self.initial_range = (minimum, maximum)
+        self.minimum, self.maximum = minimum, maximum
+
+        self.chart_width = width
+        self.chart_height = height
+        self.scale = width / span
+        """Pixels per second"""
+
+        self._points: deque[tuple[float, float]] = deque()
+        """(time, value) of every sample in view, NaN for a gap"""
+        self._segments: deque[tuple[int, float]] = deque()
+        """(canvas item, x of its right end) of every line segment drawn"""
+
+        self._title = self.create_text(4, 2, anchor="nw", fill=TEXT, font=FONT)
+        self._top = self.create_text(0, 2, anchor="ne", fill=GRID, font=FONT)
+        self._bottom = self.create_text(
+            0, height - 2, anchor="se", fill=GRID, font=FONT
+        )
+        self._show_text(None)
+
+        self.bind("<Configure>", self._resized)
+
+    def add(self, time: float, value: float):
+        """Plot a sample, NaN leaves a gap."""
+        previous = self._points[-1] if len(self._points) > 0 else None
+        self._points.append((time, value))
+
+        if not math.isnan(value):
+            if not self.wrap and not self.minimum <= value <= self.maximum:
+                self._grow(value)
+                self._redraw()
+            elif previous is not None:
+                self._segment(previous, (time, value))
+            self._show_text(value)
+
+        self._follow(time)
+
+    def clear(self):
+        for item, _x in self._segments:
+            self.delete(item)
+        self._segments.clear()
+        self._points.clear()
+        self.minimum, self.maximum = self.initial_range
+        self._show_text(None)
+
+    def _y(self, value: float) -> float:
+        fraction = (value - self.minimum) / (self.maximum - self.minimum)
+        return self.chart_height - 4 - fraction * (self.chart_height - 20)
+
+    def _segment(self, start: tuple[float, float], end: tuple[float, float]):
+        if math.isnan(start[1]):
+            return
+        # Across the wrap, a line would go right across the chart
+        if self.wrap and abs(end[1] - start[1]) > (self.maximum - self.minimum) / 2:
+            return
+
+        x = end[0] * self.scale
+        item = self.create_line(
+            start[0] * self.scale,
+            self._y(start[1]),
+            x,
+            self._y(end[1]),
+            fill=LINE,
+            width=2,
+        )
+        self._segments.append((item, x))
+
+    def _follow(self, time: float):
+        """Scroll the view to end at `time`, and forget what is out of it."""
+        right = time * self.scale
+        left = right - self.chart_width
+        self.configure(scrollregion=(left, 0, right, self.chart_height))
+        self.xview_moveto(0)
+
+        self.coords(self._title, left + 4, 2)
+        self.coords(self._top, right - 4, 2)
+        self.coords(self._bottom, right - 4, self.chart_height - 2)
+
+        while len(self._segments) > 0 and self._segments[0][1] < left:
+            self.delete(self._segments.popleft()[0])
+        # One point before the view is kept, for the segment into it
+        while len(self._points) > 1 and self._points[1][0] * self.scale < left:
+            self._points.popleft()
+
+    def _grow(self, value: float):
+        """Double the range towards `value` until it fits, so there are only
+        ever a few full redraws however far it goes."""
+        while value > self.maximum:
+            self.maximum += self.maximum - self.minimum
+        while value < self.minimum:
+            self.minimum -= self.maximum - self.minimum
+
+    def _redraw(self):
+        for item, _x in self._segments:
+            self.delete(item)
+        self._segments.clear()
+
+        points = list(self._points)
+        for start, end in zip(points, points[1:]):
+            if not math.isnan(end[1]):
+                self._segment(start, end)
+
+    def _show_text(self, value: Optional[float]):
+        text = self.title if value is None else f"{self.title} {value:.1f}{self.unit}"
+        self.itemconfigure(self._title, text=text)
+        self.itemconfigure(self._top, text=f"{self.maximum:.0f}")
+        self.itemconfigure(self._bottom, text=f"{self.minimum:.0f}")
+
+    def _resized(self, event):
+        if (event.width, event.height) == (self.chart_width, self.chart_height):
+            return
+
+        self.chart_width = event.width
+        self.chart_height = event.height
+        self.scale = event.width / self.span
+        self._redraw()
+        if len(self._points) > 0:
+            self._follow(self._points[-1][0])
+
+
+class StripCharts(customtkinter.CTkFrame):
+    """Altitude, elevation and azimuth charts side by side, fed with rows
+    from `TargetTracker.samples`."""
+
+    def __init__(self, master, span: float = 120.0, **kwargs):
+        super().__init__(master, corner_radius=0, fg_color=BACKGROUND, **kwargs)
+
+        self.charts = [
+            StripChart(self, "Altitude", "m", 0.0, 1000.0, span=span),
+            StripChart(self, "Elevation", "°", -10.0, 90.0, span=span),
+            StripChart(self, "Azimuth", "°", -180.0, 180.0, span=span, wrap=True),
+        ]
+        for column, chart in enumerate(self.charts):
+            self.grid_columnconfigure(column, weight=1)
+            chart.grid(row=0, column=column, sticky="nsew", padx=1)
+
+    def add(self, rows: list[tuple]):
+        altitude, elevation, azimuth = self.charts
+        for time, alt, el, az in rows:
+            altitude.add(time, alt)
+            elevation.add(time, el)
+            azimuth.add(time, (az + 180) % 360 - 180)
+
+    def clear(self):
+        for chart in self.charts:
+            chart.clear()
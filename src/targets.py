@@ -0,0 +1,220 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Tracking of everything that is flying at once, e.g. a booster and a
+# payload, each with its own position, trajectory and flight state.
+
+from collections import deque
+import math
+from threading import Lock
+from typing import Callable, Optional
+
+## LOCAL IMPORTS ##
+from clock import SYSTEM_CLOCK, Clock
+from flight_state import FlightStateEstimator
+from pointing import pointing_frame
+from sample_ring import SampleRing
+from telemetry import DEFAULT_TARGET, TARGET_FIELD
+from utils import GPSPoint
+###################
+
+TRAJECTORY_POINTS = 2000
+"""Most points kept in each target's trajectory, the oldest are dropped"""
+
+TRAJECTORY_SPACING = 5.0
+"""Meters a target has to move before another trajectory point is added"""
+
+SAMPLES = 4096
+"""Fixes kept in each target's sample history, for the strip charts"""
+
+
+def target_name(packet: dict) -> str:
+    name = packet.get(TARGET_FIELD)
+    return name if isinstance(name, str) else DEFAULT_TARGET
+
+
+def look_angles(ground: GPSPoint, air: GPSPoint) -> dict:
+    """Where to point from the ground to the air, with the bearing corrected
+    for magnetic north as the rotator expects. `distance` is along the
+    ground and `range` in a straight line. The ENU frame and declination are
+    cached per ground position, so this is cheap enough to do for every
+    packet."""
+    frame = pointing_frame(ground.lat, ground.lon, ground.alt or 0.0)
+    azimuth, elevation, slant_range = frame.look(air.lat, air.lon, air.alt or 0.0)
+    altitude = ground.altitude_to(air)
+
+    return {
+        "elevation": elevation,
+        "azimuth": azimuth + ground.declination(),
+        "distance": slant_range * math.cos(math.radians(elevation)),
+        "range": slant_range,
+        "ground_altitude": 0.0 if altitude is None else altitude,
+    }
+
+
+class Target:
+    """One thing being tracked. Only changed by `TargetTracker`, under its
+    lock."""
+
+    def __init__(self, name: str, clock: Clock):
+        self.name = name
+        self.packet: Optional[dict] = None
+        self.position: Optional[GPSPoint] = None
+        self.angles: Optional[dict] = None
+        """Look angles from the ground station, see `look_angles`"""
+        self.flight = FlightStateEstimator(clock=clock)
+        self.trajectory: deque[tuple[float, float, float]] = deque(
+            maxlen=TRAJECTORY_POINTS
+        )
+        self.trajectory_version = 0
+        """Goes up every time the trajectory changes, so it is only redrawn
+        when it needs to be"""
+        self.samples = SampleRing(SAMPLES, 3)
+        """Altitude, elevation and azimuth of recent fixes"""
+        self.packets = 0
+        self.last_packet_time: Optional[float] = None
+
+    def extend_trajectory(self, point: GPSPoint):
+        if len(self.trajectory) > 0:
+            lat, lon, alt = self.trajectory[-1]
+            last = GPSPoint(lat, lon, alt)
+            moved = max(
+                last.distance_to(point), abs(last.altitude_to(point) or 0.0)
+            )
+            if moved < TRAJECTORY_SPACING:
+                return
+
+        self.trajectory.append((point.lat, point.lon, point.alt or 0.0))
+        self.trajectory_version += 1
+
+
+class TargetTracker:
+    """Keeps track of every target, by the `target` field of its packets
+    (see `TelemetryMerger`). `on_update` is called with the target's name
+    and position after every packet with a fix, from the thread which
+    received it."""
+
+    def __init__(
+        self,
+        on_update: Optional[Callable[[str, GPSPoint], None]] = None,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        self.on_update = on_update
+        self.clock = clock
+        self.ground: Optional[GPSPoint] = None
+
+        self._targets: dict[str, Target] = {}
+        self._lock = Lock()
+
+    def set_ground(self, ground: Optional[GPSPoint]):
+        """Move the ground station, redoing every target's look angles."""
+        with self._lock:
+            self.ground = ground
+            for target in self._targets.values():
+                if target.position is not None and ground is not None:
+                    target.angles = look_angles(ground, target.position)
+                else:
+                    target.angles = None
+
+    def update(self, packet: dict, age: float = 0.0):
+        """A new packet, received `age` seconds ago."""
+        name = target_name(packet)
+
+        with self._lock:
+            target = self._targets.get(name)
+            if target is None:
+                target = self._targets[name] = Target(name, self.clock)
+
+            target.packet = packet
+            target.packets += 1
+            received = target.last_packet_time = self.clock.now() - age
+
+            try:
+                position = GPSPoint(
+                    float(packet["gps"]["latitude"]),
+                    float(packet["gps"]["longitude"]),
+                    float(packet["gps"]["altitude"]),
+                )
+            except (KeyError, TypeError, ValueError):
+                return
+
+            target.position = position
+            target.extend_trajectory(position)
+            elevation = azimuth = None
+            if self.ground is not None:
+                target.angles = look_angles(self.ground, position)
+                elevation = target.angles["elevation"]
+                azimuth = target.angles["azimuth"]
+
+            target.samples.append(received, position.alt, elevation, azimuth)
+
+        target.flight.update(packet, received)
+        if self.on_update is not None:
+            self.on_update(name, position)
+
+    def names(self) -> list[str]:
+        with self._lock:
+            return list(self._targets)
+
+    def angles(self, name: str) -> Optional[dict]:
+        with self._lock:
+            target = self._targets.get(name)
+            if target is None or target.angles is None:
+                return None
+            return dict(target.angles)
+
+    def trajectory(self, name: str) -> tuple[int, list[tuple[float, float, float]]]:
+        """The version of a target's trajectory and its points, oldest
+        first."""
+        with self._lock:
+            target = self._targets.get(name)
+            if target is None:
+                return 0, []
+            return target.trajectory_version, list(target.trajectory)
+
+    def samples(self, name: str, since: int = 0) -> tuple[int, list[tuple]]:
+        """A target's `(time, altitude, elevation, azimuth)` samples from
+        sequence number `since` on, and the sequence number to ask for
+        next time."""
+        with self._lock:
+            target = self._targets.get(name)
+            if target is None:
+                return 0, []
+            return target.samples.written, target.samples.since(since)
+
+    def status(self, name: Optional[str] = None) -> list[dict]:
+        """The state of one target, or every target, for display and the
+        API."""
+        with self._lock:
+            if name is not None:
+                targets = [self._targets[name]] if name in self._targets else []
+            else:
+                targets = list(self._targets.values())
+
+            now = self.clock.now()
+            statuses = []
+            for target in targets:
+                position = None
+                if target.position is not None:
+                    position = {
+                        "latitude": target.position.lat,
+                        "longitude": target.position.lon,
+                        "altitude": target.position.alt,
+                    }
+
+                last_packet_age = None
+                if target.last_packet_time is not None:
+                    last_packet_age = now - target.last_packet_time
+
+                statuses.append(
+                    {
+                        "name": target.name,
+                        "packets": target.packets,
+                        "last_packet_age": last_packet_age,
+                        "position": position,
+                        "angles": None if target.angles is None else dict(target.angles),
+                        "flight": target.flight.state(),
+                    }
+                )
+
+        return statuses
@@ -0,0 +1,514 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Telemetry ingest from the RFD radio.
+
+from collections import OrderedDict
+import datetime
+import json
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Optional
+
+## LOCAL IMPORTS ##
+from clock import SYSTEM_CLOCK, Clock
+from uplink import UplinkChannel
+from utils import ConnectionState, CRCError, FrameError, unframe
+###################
+
+RFD_BAUD = 57600
+PACKET_LOG_PATH = "packet_log.txt"
+
+PortFactory = Callable[[str, int], Any]
+"""Opens a port given its name and baud rate, returning something with
+`readline`, `write` and `close` like `serial.Serial`"""
+
+
+def open_serial_port(port: str, baud: int):
+    import serial
+
+    return serial.Serial(port, baud, timeout=1)
+
+
+PACKET_KEY_FIELDS = ("seq", "sequence", "packet_number", "timestamp", "time")
+"""Top level packet fields which identify a packet, in order of preference"""
+
+TARGET_FIELD = "target"
+"""Packet field naming what sent it, when more than one thing is flying"""
+
+DEFAULT_TARGET = "rocket"
+
+
+class IngestService:
+    """Reads telemetry packets from an RFD on a background thread.
+
+    The port is reopened with exponential backoff if it fails to open or is
+    lost (e.g. the radio is unplugged), and only one service reads from any
+    given port at a time: starting a new one stops the old one and waits for
+    it to close the port first. Every decoded packet is passed to
+    `on_packet`, with when it was received on `clock`, and then appended to
+    the packet log unless `on_packet` returns False to say it has already
+    been seen."""
+
+    _active: dict[str, "IngestService"] = {}
+    """Port → the service currently reading from it"""
+    _active_lock = Lock()
+
+    def __init__(
+        self,
+        port: str,
+        on_packet: Callable[[dict, float], Optional[bool]],
+        baud: int = RFD_BAUD,
+        min_backoff: float = 0.5,
+        max_backoff: float = 10.0,
+        log_path: Optional[str] = PACKET_LOG_PATH,
+        port_factory: PortFactory = open_serial_port,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        self.port = port
+        self.on_packet = on_packet
+        self.baud = baud
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.log_path = log_path
+        self.port_factory = port_factory
+        self.clock = clock
+
+        self.state = ConnectionState.DISCONNECTED
+        self.reconnects = 0
+        self.packets = 0
+        self.crc_errors = 0
+        self.frame_errors = 0
+        self.decode_errors = 0
+        self.handler_errors = 0
+        """Packets which `on_packet` raised an exception for"""
+        self.last_packet_time: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+        self._log_file = None
+        self._port = None
+        """The port while it is open, for `write`"""
+        self._port_lock = Lock()
+        self._stop = Event()
+        self._previous: Optional[IngestService] = None
+        self._thread = Thread(target=self._run, name=f"ingest_{port}", daemon=True)
+
+    def start(self):
+        with IngestService._active_lock:
+            previous = IngestService._active.get(self.port)
+            IngestService._active[self.port] = self
+
+        if previous is not None:
+            previous.stop()
+            self._previous = previous
+
+        self._thread.start()
+
+    def stop(self):
+        """Ask the service to shut down, this does not wait for it. It stays
+        the port's reader until its thread has closed the port, so a service
+        started on the port in the meantime still waits for it."""
+        self._stop.set()
+
+    def join(self, timeout: Optional[float] = None):
+        self._thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def write(self, data: bytes) -> bool:
+        """Send data up through the radio, alongside the reading. Returns
+        False if the port is not open or the write failed."""
+        with self._port_lock:
+            if self._port is None:
+                return False
+
+            try:
+                self._port.write(data)
+            except OSError as e:
+                print(f"Failed to write to {self.port}: {e}")
+                return False
+
+        return True
+
+    def health(self) -> dict:
+        """Link health, for display and the API."""
+        last_packet_age = None
+        if self.last_packet_time is not None:
+            last_packet_age = self.clock.now() - self.last_packet_time
+
+        return {
+            "port": self.port,
+            "state": str(self.state),
+            "last_packet_age": last_packet_age,
+            "reconnects": self.reconnects,
+            "packets": self.packets,
+            "crc_errors": self.crc_errors,
+            "frame_errors": self.frame_errors,
+            "decode_errors": self.decode_errors,
+            "handler_errors": self.handler_errors,
+            "last_error": self.last_error,
+        }
+
+    def _run(self):
+        if self._previous is not None:
+            self._previous.join()
+            self._previous = None
+
+        backoff = self.min_backoff
+        self.state = ConnectionState.CONNECTING
+
+        while not self._stop.is_set():
+            try:
+                rfd_serial = self.port_factory(self.port, self.baud)
+            except (OSError, ValueError) as e:
+                self._failed(e, "open")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            print(f"Started telemetry ingest on {self.port}")
+            with self._port_lock:
+                self._port = rfd_serial
+            backoff = self.min_backoff
+            self.state = ConnectionState.CONNECTED
+            self.last_error = None
+
+            try:
+                while not self._stop.is_set():
+                    self.process_line(rfd_serial.readline())
+            except OSError as e:
+                # Unplugging the radio ends up here, the port is reopened
+                self._failed(e, "port lost")
+            finally:
+                with self._port_lock:
+                    self._port = None
+                rfd_serial.close()
+
+            if not self._stop.is_set():
+                self.reconnects += 1
+
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+        self.state = ConnectionState.DISCONNECTED
+        self._release()
+
+    def _release(self):
+        """Stop being the port's reader, once the port is closed."""
+        with IngestService._active_lock:
+            if IngestService._active.get(self.port) is self:
+                del IngestService._active[self.port]
+
+    def process_line(self, line: bytes) -> Optional[dict]:
+        """Check, decode and log a single line from the radio. Returns the
+        decoded packet, or None if the line was not a valid packet."""
+        decoded = self.decode_line(line)
+        if decoded is None:
+            return None
+
+        received_json, decoded_data = decoded
+        self._deliver(received_json, decoded_data, self.clock.now())
+        return decoded_data
+
+    def decode_line(self, line: bytes) -> Optional[tuple[str, dict]]:
+        """Check and decode a single line from the radio, counting it in the
+        link health. Returns the packet's JSON and the decoded packet, or None
+        if the line was not a valid packet."""
+        try:
+            new_data = line.decode("utf-8").strip()
+        except UnicodeDecodeError as e:
+            self.frame_errors += 1
+            print(f"Failed to read telemetry: {e}")
+            return None
+
+        if len(new_data) == 0:
+            return None
+
+        try:
+            received_json = unframe(new_data)
+        except CRCError as e:
+            self.crc_errors += 1
+            print(e)
+            return None
+        except FrameError as e:
+            self.frame_errors += 1
+            print(e)
+            return None
+
+        try:
+            decoded_data = json.loads(received_json)
+        except ValueError as e:
+            self.decode_errors += 1
+            print(f"Failed to decode json: {e}")
+            return None
+
+        if not isinstance(decoded_data, dict):
+            self.decode_errors += 1
+            print(f"Telemetry is not a JSON object: {received_json[:40]}")
+            return None
+
+        self.packets += 1
+        self.last_packet_time = self.clock.now()
+        return received_json, decoded_data
+
+    def _deliver(self, received_json: str, packet: dict, received: float):
+        """Pass a packet received at `received` on, and log it unless
+        `on_packet` turned it down. Whatever goes wrong handling one packet,
+        the next is still read."""
+        try:
+            delivered = self.on_packet(packet, received)
+        except Exception as e:
+            self.handler_errors += 1
+            print(f"Failed to handle telemetry from {self.port}: {type(e).__name__} {e}")
+            delivered = None
+
+        if delivered is not False:
+            self._log(received_json, received)
+
+    def _log(self, received_json: str, received: float):
+        if self.log_path is None:
+            return
+
+        try:
+            if self._log_file is None:
+                self._log_file = open(self.log_path, "a", encoding="utf-8")
+
+            age = datetime.timedelta(seconds=self.clock.now() - received)
+            timestamp = (self.clock.wall() - age).isoformat()
+            self._log_file.write(f"{timestamp},{received_json}\n")
+            self._log_file.flush()
+        except OSError as e:
+            print(f"Saving to txt failed: {e}")
+
+    def _failed(self, error: BaseException, action: str):
+        self.last_error = f"{action}: {type(error).__name__} {error}".strip()
+        if self.state == ConnectionState.CONNECTED:
+            self.state = ConnectionState.RECONNECTING
+        print(f"Telemetry on {self.port} {self.last_error}")
+
+
+class SourceStats:
+    """Per-radio statistics kept by `TelemetryMerger`."""
+
+    def __init__(self):
+        self.received = 0
+        """Valid packets received by this radio"""
+        self.first = 0
+        """Packets this radio delivered before any other"""
+        self.duplicates = 0
+        """Packets another radio had already delivered"""
+        self.late = 0
+        """Packets older than one already passed on"""
+        self.merged_at_start = 0
+        """How many packets the merged stream had when this radio was added"""
+
+
+class TelemetryMerger:
+    """Merges telemetry from several redundant radios into one stream.
+
+    Each radio has its own `IngestService`. Packets are deduplicated by the
+    first of `PACKET_KEY_FIELDS` they contain (or by their contents if they
+    have none), and only packets newer than the last one passed on reach
+    `on_packet`, so whichever radio hears a packet first wins and a dropout
+    on one antenna does not hold up the others. `on_packet` is called with
+    each packet and how many seconds ago it was received."""
+
+    DEDUPLICATION_WINDOW = 1024
+
+    def __init__(
+        self,
+        on_packet: Callable[[dict, float], None],
+        log_path: Optional[str] = PACKET_LOG_PATH,
+        clock: Clock = SYSTEM_CLOCK,
+        ingest_process: bool = False,
+        uplink_attempts: Optional[int] = None,
+    ):
+        self.on_packet = on_packet
+        self.log_path = log_path
+        self.clock = clock
+        self.ingest_process = ingest_process
+        """Read each radio in a child process, see `ProcessIngestService`"""
+
+        self.sources: dict[str, IngestService] = {}
+        self.stats: dict[str, SourceStats] = {}
+        self.source_targets: dict[str, str] = {}
+        """Port → the target its packets are from, unless they say otherwise"""
+        self.merged = 0
+        """Unique packets passed on"""
+        self.last_packet_time: Optional[float] = None
+
+        self.uplink = UplinkChannel(self.send, attempts=uplink_attempts)
+        """Commands going up, sent through whichever radio is connected, see
+        `UplinkChannel` for `uplink_attempts`. It always runs in real time,
+        even when the telemetry is a replay."""
+
+        self._retired: list[IngestService] = []
+        self._seen: OrderedDict[Any, None] = OrderedDict()
+        self._newest_order: dict[str, float] = {}
+        """Target → the order of the newest packet passed on from it"""
+        self._lock = Lock()
+
+    def add_source(
+        self,
+        port: str,
+        port_factory: PortFactory = open_serial_port,
+        target: Optional[str] = None,
+    ) -> IngestService:
+        """Start reading from another radio, replacing it if already added.
+        Packets from it without a target of their own are given `target`, for
+        when each target has a radio of its own."""
+        self.remove_source(port)
+
+        service_type = IngestService
+        if self.ingest_process:
+            from ingest_process import ProcessIngestService
+
+            service_type = ProcessIngestService
+
+        service = service_type(
+            port,
+            on_packet=lambda packet, received, port=port: self.receive(
+                port, packet, received
+            ),
+            log_path=self.log_path,
+            port_factory=port_factory,
+            clock=self.clock,
+        )
+
+        with self._lock:
+            self.sources[port] = service
+            self.stats[port] = SourceStats()
+            self.stats[port].merged_at_start = self.merged
+            self.source_targets[port] = target or DEFAULT_TARGET
+
+        service.start()
+        return service
+
+    def remove_source(self, port: str):
+        with self._lock:
+            service = self.sources.pop(port, None)
+            self.stats.pop(port, None)
+            self.source_targets.pop(port, None)
+
+        if service is not None:
+            service.stop()
+            self._retired.append(service)
+
+    def stop(self):
+        self.uplink.stop()
+        for port in list(self.sources):
+            self.remove_source(port)
+
+    def join(self, timeout: Optional[float] = None):
+        """Wait for every radio which has been removed or stopped to close."""
+        self.uplink.join(timeout)
+        for service in self._retired:
+            service.join(timeout)
+        self._retired = [s for s in self._retired if s.is_alive()]
+
+    def send(self, data: bytes) -> bool:
+        """Send data up through the first radio which takes it."""
+        with self._lock:
+            services = list(self.sources.values())
+
+        return any(service.write(data) for service in services)
+
+    def receive(
+        self, source: str, packet: dict, received: Optional[float] = None
+    ) -> bool:
+        """Called by each radio's ingest thread with every valid packet, and
+        when it was received (now if not given). Returns False if another
+        radio had already delivered it. Packets are
+        tagged with their target (see `TARGET_FIELD`) before being passed on,
+        and packets from different targets are never duplicates."""
+        with self._lock:
+            stats = self.stats.get(source)
+            if stats is None:
+                return False
+            stats.received += 1
+
+            target = packet.get(TARGET_FIELD)
+            if not isinstance(target, str):
+                target = self.source_targets.get(source, DEFAULT_TARGET)
+                packet[TARGET_FIELD] = target
+
+            key, order = packet_key(packet)
+            key = (target, key)
+
+            if key in self._seen:
+                stats.duplicates += 1
+                return False
+
+            self._seen[key] = None
+            if len(self._seen) > self.DEDUPLICATION_WINDOW:
+                self._seen.popitem(last=False)
+
+            stats.first += 1
+
+            newest = self._newest_order.get(target)
+            if order is not None and newest is not None and order < newest:
+                # Still logged, but too old to track
+                stats.late += 1
+                return True
+
+            if order is not None:
+                self._newest_order[target] = order
+            now = self.clock.now()
+            if received is None:
+                received = now
+            self.merged += 1
+            self.last_packet_time = received
+
+        self.uplink.acknowledge(packet)
+        self.on_packet(packet, max(0.0, now - received))
+        return True
+
+    def health(self) -> dict:
+        """Link health of the merged stream and of every radio, for display
+        and the API."""
+        with self._lock:
+            last_packet_age = None
+            if self.last_packet_time is not None:
+                last_packet_age = self.clock.now() - self.last_packet_time
+
+            sources = []
+            for port, service in self.sources.items():
+                stats = self.stats[port]
+                health = service.health()
+
+                # Anything in the merged stream this radio did not hear
+                expected = self.merged - stats.merged_at_start
+                lost = max(0, expected - (stats.first + stats.duplicates))
+                health.update(
+                    {
+                        "first": stats.first,
+                        "duplicates": stats.duplicates,
+                        "late": stats.late,
+                        "lost": lost,
+                        "loss_rate": lost / expected if expected > 0 else 0.0,
+                    }
+                )
+                sources.append(health)
+
+            return {
+                "merged_packets": self.merged,
+                "last_packet_age": last_packet_age,
+                "sources": sources,
+            }
+
+
+def packet_key(packet: dict) -> tuple[Any, Optional[float]]:
+    """Identify a packet for deduplication. Returns the key, and a number to
+    order packets by if the key has one."""
+    for field in PACKET_KEY_FIELDS:
+        value = packet.get(field)
+        if value is None:
+            continue
+
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return (field, value), float(value)
+        return (field, str(value)), None
+
+    # Nothing to go by but the contents
+    return json.dumps(packet, sort_keys=True), None
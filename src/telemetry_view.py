@@ -0,0 +1,112 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# What the Telemetry panel shows, worked out apart from the widgets so that
+# only the labels whose text actually changed are touched. customtkinter
+# redraws a label on every `configure`, even to the same text.
+
+import time
+from typing import Callable, Optional
+
+
+def format_target(status: dict) -> dict[str, str]:
+    """The text of each Telemetry panel field for a target, from
+    `TargetTracker.status`. Fields which are not known yet are left out, so
+    they keep showing whatever they last did."""
+    fields = {}
+
+    position = status["position"]
+    if position is not None:
+        fields["lat"] = f"{position['latitude']:.8f}"
+        fields["lon"] = f"{position['longitude']:.8f}"
+        fields["alt"] = f"{position['altitude']:.2f}m"
+
+    angles = status["angles"]
+    if angles is not None:
+        fields["rot_az"] = f"{angles['azimuth']:.1f}°"
+        fields["rot_alt"] = f"{angles['elevation']:.1f}°"
+        fields["dist"] = f"{angles['distance']:.1f}"
+        fields["gr_alt"] = f"{angles['ground_altitude']:.1f}"
+
+    fields.update(format_flight(status["flight"]))
+    return fields
+
+
+def format_flight(state: dict) -> dict[str, str]:
+    """The flight state fields, from `FlightStateEstimator.state`."""
+    fields = {"phase": state["phase"]}
+
+    if state["ground_speed"] is not None:
+        fields["speed"] = f"{state['ground_speed']:.1f}m/s {state['course']:.0f}°"
+    if state["vertical_rate"] is not None:
+        fields["vert_rate"] = f"{state['vertical_rate']:.1f}m/s"
+    if state["apogee"] is not None:
+        fields["apogee"] = f"{state['apogee']['altitude']:.0f}m"
+
+    landing = state["landing"]
+    if landing is not None:
+        fields["landing"] = (
+            f"{landing['latitude']:.6f}, {landing['longitude']:.6f}"
+            f" in {landing['seconds']:.0f}s"
+        )
+
+    return fields
+
+
+def format_rotator(status: dict) -> dict[str, str]:
+    """The rotator fields, from its `RotatorConnection.status`: where it
+    actually points, and how far that is from where it was sent."""
+    fields = {}
+
+    position = status.get("position")
+    if position is not None:
+        fields["act_alt"] = f"{position['vertical']:.1f}°"
+        fields["act_az"] = f"{position['horizontal']:.1f}°"
+
+    error = status.get("error")
+    if error is not None:
+        fields["track_err"] = (
+            f"{error['total']:.2f}° (mean {error['mean']:.2f}°,"
+            f" max {error['max']:.2f}°)"
+        )
+
+    return fields
+
+
+class TelemetryViewModel:
+    """Remembers the text last put in each field, to hand out only what
+    changed."""
+
+    def __init__(self):
+        self._rendered: dict[str, str] = {}
+
+    def changes(self, fields: dict[str, str]) -> dict[str, str]:
+        """The fields whose text is different from what was last rendered,
+        which are then taken to be rendered."""
+        changed = {
+            name: text
+            for name, text in fields.items()
+            if self._rendered.get(name) != text
+        }
+        self._rendered.update(changed)
+        return changed
+
+
+class RateLimiter:
+    """Lets something happen at most once every `interval` seconds, per key,
+    e.g. redrawing each target's marker on the map."""
+
+    def __init__(self, interval: float, clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self._last: dict[object, float] = {}
+
+    def ready(self, key: Optional[object] = None) -> bool:
+        """True, and starts the next interval, if the last one is over."""
+        now = self.clock()
+        last = self._last.get(key)
+        if last is not None and now - last < self.interval:
+            return False
+
+        self._last[key] = now
+        return True
@@ -0,0 +1,247 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+#
+# Commands sent up to the rocket over the RFD, on the same port the
+# telemetry is read from.
+#
+# A command is a single byte, sent as `[command, crc8, 0x20]`, once. That is
+# all the rocket understands today.
+#
+# The rocket does not acknowledge commands yet. Once it does, commands can be
+# waited on (and resent, if asked for) with `attempts`: each command is then
+# given a nonce, sent as `[command, nonce, crc8, 0x20]` with the CRC over
+# both, and acknowledged by the rocket putting `[command, nonce]` in the
+# `ack` field of the next telemetry packet it sends. The nonce stays the same
+# when a command is resent, so the rocket can tell a resend from a new
+# command, and an ack left over from an earlier command with the same value
+# does not count for a new one. Only one command is in flight at a time.
+
+from collections import OrderedDict, deque
+from enum import StrEnum
+import itertools
+from threading import Condition, Thread
+from typing import Callable, Optional
+
+## LOCAL IMPORTS ##
+from clock import SYSTEM_CLOCK, Clock
+from utils import crc8
+###################
+
+ACK_FIELD = "ack"
+"""Downlink packet field which holds `[command, nonce]` of the command the
+rocket just received"""
+
+
+class CommandState(StrEnum):
+    QUEUED = "queued"
+    SENT = "sent"
+    """Sent, without waiting for an ack"""
+    WAITING = "waiting"
+    """Sent, and waiting for its ack"""
+    ACKED = "acked"
+    FAILED = "failed"
+    """Never acknowledged, after every attempt"""
+
+
+class UplinkFull(Exception):
+    """Too many commands are already waiting to be sent."""
+
+
+def command_frame(command: int, nonce: Optional[int] = None) -> bytes:
+    """Frame a command for the radio link, with a nonce if it is to be
+    acknowledged."""
+    if not 0 <= command <= 0xFF:
+        raise ValueError(f"Command {command} does not fit in a byte")
+
+    body = bytes([command]) if nonce is None else bytes([command, nonce])
+    return body + bytes([crc8(body), 0x20])
+
+
+class UplinkCommand:
+    """A command and how far it has got."""
+
+    def __init__(
+        self, id: int, command: int, created: float, nonce: Optional[int] = None
+    ):
+        self.id = id
+        self.command = command
+        self.nonce = nonce
+        """Sent with the command and echoed in its ack, None if it is not
+        waiting for one"""
+        self.state = CommandState.QUEUED
+        self.attempts = 0
+        self.created = created
+        self.last_sent: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def status(self) -> dict:
+        latency = None
+        if self.finished is not None:
+            latency = self.finished - self.created
+
+        return {
+            "id": self.id,
+            "command": self.command,
+            "nonce": self.nonce,
+            "state": str(self.state),
+            "attempts": self.attempts,
+            "latency": latency,
+        }
+
+
+class UplinkChannel:
+    """A queue of commands going up to the rocket, sent one at a time on a
+    background thread through `send`, which writes a frame to whichever
+    radio is connected and returns False if none are.
+
+    Frames are at least `min_interval` seconds apart so the radio is not
+    flooded. With `attempts` left as None each command is sent once, and
+    not waited on. Otherwise it is resent every `ack_timeout` seconds, up to
+    `attempts` times, until `acknowledge` sees its ack come back down. This
+    needs a rocket which sends acks, see the top of this file."""
+
+    MAX_QUEUED = 32
+    HISTORY = 64
+    """Finished commands kept around for `status`"""
+
+    def __init__(
+        self,
+        send: Callable[[bytes], bool],
+        min_interval: float = 0.25,
+        ack_timeout: float = 2.0,
+        attempts: Optional[int] = None,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        if attempts is not None and attempts < 1:
+            raise ValueError(f"A command needs at least one attempt, not {attempts}")
+
+        self.send = send
+        self.min_interval = min_interval
+        self.ack_timeout = ack_timeout
+        self.attempts = attempts
+        self.clock = clock
+
+        self._queue: deque[UplinkCommand] = deque()
+        self._current: Optional[UplinkCommand] = None
+        self._history: OrderedDict[int, UplinkCommand] = OrderedDict()
+        self._ids = itertools.count(1)
+        self._last_frame: Optional[float] = None
+
+        self._condition = Condition()
+        self._stopped = False
+        self._thread: Optional[Thread] = None
+
+    def submit(self, command: int) -> UplinkCommand:
+        """Queue a command to be sent. Raises `ValueError` if it is not a
+        valid command and `UplinkFull` if the queue is full."""
+        command_frame(command)
+
+        with self._condition:
+            if len(self._queue) >= self.MAX_QUEUED:
+                raise UplinkFull(f"{len(self._queue)} commands are already waiting")
+
+            id = next(self._ids)
+            nonce = None if self.attempts is None else id % 0x100
+            queued = UplinkCommand(id, command, self.clock.now(), nonce)
+            self._queue.append(queued)
+            self._history[queued.id] = queued
+
+            # Started with the first command, most sessions never send one
+            if self._thread is None and not self._stopped:
+                self._thread = Thread(target=self._run, name="uplink", daemon=True)
+                self._thread.start()
+
+            self._condition.notify_all()
+            return queued
+
+    def acknowledge(self, packet: dict):
+        """Called with every downlink packet, to look for acks."""
+        ack = packet.get(ACK_FIELD)
+        if not isinstance(ack, list):
+            return
+
+        with self._condition:
+            current = self._current
+            if (
+                current is not None
+                and current.state == CommandState.WAITING
+                and ack == [current.command, current.nonce]
+            ):
+                self._finish(current, CommandState.ACKED)
+
+    def status(self, id: Optional[int] = None) -> list[dict]:
+        """Status of one command, or of every recent one, oldest first."""
+        with self._condition:
+            if id is not None:
+                command = self._history.get(id)
+                return [] if command is None else [command.status()]
+            return [command.status() for command in self._history.values()]
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _finish(self, command: UplinkCommand, state: CommandState):
+        command.state = state
+        command.finished = self.clock.now()
+        self._current = None
+        while len(self._history) > self.HISTORY:
+            oldest = next(iter(self._history.values()))
+            if oldest.finished is None:
+                break
+            self._history.popitem(last=False)
+        self._condition.notify_all()
+
+    def _run(self):
+        with self._condition:
+            while not self._stopped:
+                if self._current is None and len(self._queue) > 0:
+                    self._current = self._queue.popleft()
+
+                current = self._current
+                if current is None:
+                    self._condition.wait()
+                    continue
+
+                now = self.clock.now()
+                due = now
+                if self._last_frame is not None:
+                    due = max(due, self._last_frame + self.min_interval)
+                if current.last_sent is not None:
+                    due = max(due, current.last_sent + self.ack_timeout)
+
+                if due > now:
+                    self._condition.wait(due - now)
+                    continue
+
+                if self.attempts is not None and current.attempts >= self.attempts:
+                    print(f"Uplink command {current.command} was never acknowledged")
+                    self._finish(current, CommandState.FAILED)
+                    continue
+
+                # The port write happens outside the lock so acks can still
+                # come in, `_current` is only changed by this thread and by
+                # an ack for this very command
+                self._condition.release()
+                try:
+                    sent = self.send(command_frame(current.command, current.nonce))
+                finally:
+                    self._condition.acquire()
+
+                if not sent:
+                    # No radio connected, try again shortly without using up
+                    # an attempt
+                    self._condition.wait(self.min_interval)
+                    continue
+
+                self._last_frame = current.last_sent = self.clock.now()
+                current.attempts += 1
+                if self.attempts is None:
+                    self._finish(current, CommandState.SENT)
+                else:
+                    current.state = CommandState.WAITING
@@ -1,13 +1,93 @@
 ## See `main.py` for more information
 
+from enum import StrEnum
 import math
+from threading import Lock
 from typing import Optional, Self
-from pygeomag import GeoMag
 import datetime
 
 EARTH_RADIUS_METERS = 6_378_137
 
 
+class ConnectionState(StrEnum):
+    """The state of a connection to a serial device which is reconnected
+    automatically."""
+
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    RECONNECTING = "reconnecting"
+
+
+class FrameError(ValueError):
+    """A line of telemetry was not framed as `<crc> <json>`."""
+
+
+class CRCError(FrameError):
+    """A line of telemetry did not match its CRC."""
+
+
+_GEO_MAG = None
+"""Cached `pygeomag.GeoMag` instance, created on first use by `geo_mag()`"""
+_GEO_MAG_LOCK = Lock()
+"""Held while loading or using `_GEO_MAG`. `GeoMag.calculate` keeps its
+working values on the instance, so two threads must never run it at once."""
+
+
+def geo_mag():
+    """Returns the shared `GeoMag` model, loading it on first use. Call this
+    with `_GEO_MAG_LOCK` held, use `declination_at` from outside.
+
+    Importing pygeomag and reading its coefficient file is slow, so this is
+    deferred until a magnetic correction is actually needed, and can be done
+    ahead of time in the background with `warm_up_geo_mag()`."""
+    global _GEO_MAG
+
+    if _GEO_MAG is None:
+        from pygeomag import GeoMag
+
+        _GEO_MAG = GeoMag(base_year=datetime.datetime.now(), high_resolution=True)
+
+    return _GEO_MAG
+
+
+def warm_up_geo_mag():
+    """Load the magnetic model and run one calculation so the first real
+    bearing does not pay for it."""
+    GPSPoint(0.0, 0.0, 0.0).bearing_mag_corrected_to(GPSPoint(0.0, 1.0, 0.0))
+
+
+DECLINATION_CACHE_SIZE = 64
+
+_DECLINATIONS: dict[tuple[float, float, float, float], float] = {}
+"""Declinations worked out so far, by place and time. Only read and filled
+with `_GEO_MAG_LOCK` held, so everything in it was calculated by one thread
+at a time."""
+
+
+def declination_at(
+    latitude: float, longitude: float, altitude: float, fractional_year: float
+) -> float:
+    """Magnetic declination in degrees. The model takes milliseconds to
+    evaluate, and the ground station hardly ever moves, so results are
+    cached."""
+    key = (latitude, longitude, altitude, fractional_year)
+
+    with _GEO_MAG_LOCK:
+        declination = _DECLINATIONS.get(key)
+        if declination is None:
+            declination = geo_mag().calculate(
+                glat=latitude, glon=longitude, alt=altitude, time=fractional_year
+            ).d
+
+            # Forget the oldest once full
+            if len(_DECLINATIONS) >= DECLINATION_CACHE_SIZE:
+                del _DECLINATIONS[next(iter(_DECLINATIONS))]
+            _DECLINATIONS[key] = declination
+
+    return declination
+
+
 class GPSPoint:
     """A single point on the Earth, including altitude."""
 
@@ -73,11 +153,9 @@ class GPSPoint:
 
         return bearing
 
-    def bearing_mag_corrected_to(self, other: Self, positive: bool = False) -> float:
-        """Find the absolute bearing (azimuth) to another point, to be used with a device basing its heading on magnetic north"""
-
-        bearing = self.bearing_to(other, False)
-
+    def declination(self) -> float:
+        """Magnetic declination in degrees at this point, today. Add it to a
+        true bearing to get a magnetic one."""
         current_datetime = datetime.datetime.now()
         fractional_year = (
             float(
@@ -88,12 +166,12 @@ class GPSPoint:
             / 365.2425
         ) + current_datetime.year
 
-        geo_mag = GeoMag(base_year=datetime.datetime.now(), high_resolution=True)
-        result = geo_mag.calculate(
-            glat=self.lat, glon=self.lon, alt=self.alt or 0.0, time=fractional_year
-        )
+        return declination_at(self.lat, self.lon, self.alt or 0.0, fractional_year)
 
-        bearing = bearing + result.d
+    def bearing_mag_corrected_to(self, other: Self, positive: bool = False) -> float:
+        """Find the absolute bearing (azimuth) to another point, to be used with a device basing its heading on magnetic north"""
+
+        bearing = self.bearing_to(other, False) + self.declination()
 
         if positive:
             bearing = (bearing + 360) % 360
@@ -143,3 +221,25 @@ def crc8(data: bytes) -> int:
             crc &= 0xFF
 
     return crc
+
+
+def frame(data: str) -> str:
+    """Frame some data for the radio link, as `<crc> <data>`."""
+    return f"{crc8(data.encode('utf-8'))} {data}"
+
+
+def unframe(line: str) -> str:
+    """Check the CRC of a framed line of telemetry and return the data part.
+    Raises `FrameError` if the line is malformed, or `CRCError` if the CRC
+    does not match."""
+    try:
+        received_crc, received_data = line.split(maxsplit=1)
+        received_crc = int(received_crc)
+    except ValueError as e:
+        raise FrameError(f"Splitting failed: {e}") from e
+
+    calculated_crc = crc8(received_data.encode("utf-8"))
+    if calculated_crc != received_crc:
+        raise CRCError(f"CRCs do not match ({calculated_crc} != {received_crc})")
+
+    return received_data
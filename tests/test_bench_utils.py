@@ -0,0 +1,23 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+
+import pytest
+
+from bench_utils import BENCH_GROUND, synthetic_flight
+
+
+@pytest.mark.parametrize("seconds", [1.0, 30.0, 300.0])
+def test_synthetic_flight(seconds):
+    flight = list(synthetic_flight(seconds=seconds, rate=10.0, apogee=1000.0))
+    altitudes = [packet["gps"]["altitude"] - BENCH_GROUND.alt for _t, packet in flight]
+
+    assert len(flight) == int(seconds * 10)
+    assert max(altitudes) == pytest.approx(1000.0, rel=0.05)
+    assert altitudes[0] == 0.0
+    # Back down, but for the last sample
+    assert altitudes[-1] < 200.0
+
+
+def test_synthetic_flight_needs_a_length():
+    with pytest.raises(ValueError):
+        list(synthetic_flight(seconds=0.0))
@@ -0,0 +1,89 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+
+import math
+
+import pytest
+
+from horizon_mask import HorizonMask, MaskMode, MaskTable, load_horizon_mask
+
+
+def test_interpolates_between_points():
+    mask = HorizonMask([(0, 2.0), (90, 4.0), (200, 12.0)])
+    assert mask.minimum(0) == 2.0
+    assert mask.minimum(45) == pytest.approx(3.0)
+    assert mask.minimum(90) == 4.0
+    assert mask.minimum(145) == pytest.approx(8.0)
+
+
+def test_wraps_around_north():
+    mask = HorizonMask([(350, 10.0), (10, 0.0)])
+    assert mask.minimum(0) == pytest.approx(5.0)
+    assert mask.minimum(360) == pytest.approx(5.0)
+    assert mask.minimum(-5) == pytest.approx(7.5)
+    assert mask.minimum(180) == pytest.approx(5.0)
+
+
+def test_single_point_is_flat():
+    mask = HorizonMask([(120, 3.0)])
+    assert mask.minimum(0) == 3.0
+    assert mask.minimum(300) == 3.0
+
+
+def test_needs_a_point():
+    with pytest.raises(ValueError):
+        HorizonMask([])
+
+
+def test_table_is_looked_up_by_magnetic_azimuth():
+    mask = HorizonMask([(0, 0.0), (90, 9.0), (180, 0.0)])
+    table = MaskTable(mask, declination=10.0)
+
+    # Magnetic 80 is true 70 with 10 degrees of declination
+    assert table.minimum(80) == pytest.approx(mask.minimum(70))
+    assert table.minimum(80 + 360) == pytest.approx(mask.minimum(70))
+    assert table.minimum(-280) == pytest.approx(mask.minimum(70))
+
+
+def test_clamp_raises_commands_below_the_mask():
+    table = MaskTable(HorizonMask([(0, 5.0)], MaskMode.CLAMP), declination=0.0)
+    assert table.apply(10.0, 0.0) == (10.0, False)
+    assert table.apply(1.0, 0.0) == (5.0, True)
+
+
+def test_flag_only_reports_commands_below_the_mask():
+    table = MaskTable(HorizonMask([(0, 5.0)], MaskMode.FLAG), declination=0.0)
+    assert table.apply(1.0, 0.0) == (1.0, True)
+
+
+def test_unknown_angles_pass_through():
+    table = MaskTable(HorizonMask([(0, 5.0)]), declination=0.0)
+
+    elevation, masked = table.apply(math.nan, 0.0)
+    assert math.isnan(elevation) and not masked
+    assert table.apply(1.0, math.nan) == (1.0, False)
+
+
+def test_load(tmp_path):
+    path = tmp_path / "horizon_mask.toml"
+    path.write_text('mode = "flag"\npoints = [[0, 2.0], [90, 4.5]]\n')
+
+    mask = load_horizon_mask(str(path))
+    assert mask.mode == MaskMode.FLAG
+    assert mask.points == [(0.0, 2.0), (90.0, 4.5)]
+
+
+@pytest.mark.parametrize(
+    "contents",
+    [
+        'points = [[0, "high"]]\n',
+        'mode = "clamp"\n',
+        'mode = "up"\npoints = [[0, 1]]\n',
+    ],
+)
+def test_load_invalid(tmp_path, contents):
+    path = tmp_path / "horizon_mask.toml"
+    path.write_text(contents)
+
+    with pytest.raises(ValueError):
+        load_horizon_mask(str(path))
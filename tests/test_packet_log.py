@@ -0,0 +1,115 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+
+import datetime
+import json
+
+import pytest
+
+from packet_log import PacketLog
+
+START = datetime.datetime(2025, 6, 20, 10, 0, 0)
+
+
+def lines(first: int, count: int, start: datetime.datetime = START) -> str:
+    """Packet log lines one second apart, with `seq` counting from `first`."""
+    return "".join(
+        f"{(start + datetime.timedelta(seconds=i)).isoformat()},"
+        f"{json.dumps({'seq': first + i})}\n"
+        for i in range(count)
+    )
+
+
+def sequences(packet_log: PacketLog, **kwargs) -> list[int]:
+    return [packet["seq"] for _timestamp, packet in packet_log.query(**kwargs)]
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = tmp_path / "packet_log.txt"
+    # Two flights an hour apart
+    path.write_text(
+        lines(0, 10)
+        + "not a packet\n"
+        + lines(10, 5, START + datetime.timedelta(hours=1))
+    )
+    return path
+
+
+def test_sessions(log_path):
+    with PacketLog(str(log_path)) as packet_log:
+        assert len(packet_log) == 15
+        sessions = packet_log.sessions()
+        assert [(session.first, session.last) for session in sessions] == [
+            (0, 10),
+            (10, 15),
+        ]
+        assert sessions[0].start_time() == START
+        assert sessions[1].end_time() == START + datetime.timedelta(hours=1, seconds=4)
+
+
+def test_query(log_path):
+    with PacketLog(str(log_path)) as packet_log:
+        assert sequences(packet_log) == list(range(15))
+        assert sequences(packet_log, session=1) == list(range(10, 15))
+        assert sequences(
+            packet_log,
+            start=START + datetime.timedelta(seconds=3),
+            end=START + datetime.timedelta(seconds=5),
+        ) == [3, 4, 5]
+        assert sequences(
+            packet_log, start=START + datetime.timedelta(seconds=8), session=0
+        ) == [8, 9]
+
+
+def test_unknown_session(log_path):
+    with PacketLog(str(log_path)) as packet_log:
+        with pytest.raises(ValueError):
+            packet_log.session(2)
+        with pytest.raises(ValueError):
+            list(packet_log.query_lines(session=-1))
+
+
+def test_index_is_reused_and_extended(log_path):
+    with PacketLog(str(log_path)):
+        pass
+
+    with open(log_path, "a", encoding="utf-8") as packetlog:
+        packetlog.write(lines(15, 3, START + datetime.timedelta(hours=1, seconds=5)))
+        # A line still being written is left for later
+        packetlog.write(START.isoformat())
+
+    with PacketLog(str(log_path)) as packet_log:
+        assert len(packet_log) == 18
+        assert len(packet_log.sessions()) == 2
+        assert sequences(packet_log, session=1) == list(range(10, 18))
+
+
+def test_replaced_log_is_reindexed(log_path):
+    with PacketLog(str(log_path)):
+        pass
+
+    # A different, longer log in the same place
+    later = START + datetime.timedelta(days=1)
+    log_path.write_text(lines(100, 30, later))
+
+    with PacketLog(str(log_path)) as packet_log:
+        assert len(packet_log) == 30
+        assert sequences(packet_log) == list(range(100, 130))
+
+
+def test_truncated_log_is_reindexed(log_path):
+    with PacketLog(str(log_path)):
+        pass
+
+    log_path.write_text(lines(0, 4))
+
+    with PacketLog(str(log_path)) as packet_log:
+        assert sequences(packet_log) == [0, 1, 2, 3]
+
+
+def test_missing_log(tmp_path):
+    with PacketLog(str(tmp_path / "packet_log.txt")) as packet_log:
+        assert len(packet_log) == 0
+        assert packet_log.sessions() == []
+        assert list(packet_log.query()) == []
@@ -0,0 +1,93 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+
+import math
+
+import pytest
+
+from pointing import PointingFrame, ecef
+from utils import EARTH_RADIUS_METERS, GPSPoint
+
+GROUND = GPSPoint(42.382736582735035, -96.95124955246622, 442.0)
+
+AZIMUTH_TOLERANCE = 0.2
+"""Largest difference in degrees allowed from `GPSPoint.bearing_to` within
+2km, where the spherical math should still agree with the ellipsoid"""
+ELEVATION_TOLERANCE = 0.1
+"""Same, from `GPSPoint.elevation_to`"""
+
+
+def offset(distance: float, bearing: float, height: float) -> GPSPoint:
+    """A point `distance` meters from `GROUND` along a true bearing, and
+    `height` meters above it."""
+    angle = distance / EARTH_RADIUS_METERS
+    return GPSPoint(
+        GROUND.lat + math.degrees(angle * math.cos(math.radians(bearing))),
+        GROUND.lon
+        + math.degrees(
+            angle * math.sin(math.radians(bearing)) / math.cos(GROUND.lat_rad())
+        ),
+        GROUND.alt + height,
+    )
+
+
+def angle_difference(a: float, b: float) -> float:
+    return abs((a - b + 180) % 360 - 180)
+
+
+def test_ecef_on_the_axes():
+    assert ecef(0, 0, 0) == pytest.approx((6378137.0, 0, 0))
+    assert ecef(0, 90, 0) == pytest.approx((0, 6378137.0, 0), abs=1e-6)
+    assert ecef(90, 0, 0) == pytest.approx((0, 0, 6356752.314245), abs=1e-6)
+
+
+def test_straight_up():
+    frame = PointingFrame(GROUND)
+    _azimuth, elevation, distance = frame.look(
+        GROUND.lat, GROUND.lon, GROUND.alt + 1000
+    )
+    assert elevation == pytest.approx(90)
+    assert distance == pytest.approx(1000)
+
+
+@pytest.mark.parametrize("bearing", [0, 45, 90, 135, 180, -135, -90, -45])
+def test_compass_directions(bearing):
+    point = offset(1000, bearing, 0)
+    azimuth, elevation, _distance = PointingFrame(GROUND).look(
+        point.lat, point.lon, point.alt
+    )
+    assert angle_difference(azimuth, bearing) < AZIMUTH_TOLERANCE
+    # The ground curves away, so a point at the same height is just below
+    assert -0.1 < elevation < 0
+
+
+@pytest.mark.parametrize("distance", [100.0, 500.0, 2000.0])
+@pytest.mark.parametrize("height", [10.0, 300.0, 1000.0])
+def test_agrees_with_gps_point_at_short_range(distance, height):
+    frame = PointingFrame(GROUND)
+    for bearing in range(0, 360, 15):
+        point = offset(distance, bearing, height)
+        azimuth, elevation, _distance = frame.look(point.lat, point.lon, point.alt)
+
+        assert angle_difference(azimuth, GROUND.bearing_to(point)) < AZIMUTH_TOLERANCE
+        assert abs(elevation - GROUND.elevation_to(point)) < ELEVATION_TOLERANCE
+
+
+def test_batch_matches_look():
+    numpy = pytest.importorskip("numpy")
+
+    frame = PointingFrame(GROUND)
+    points = [offset(5000, bearing, 3000) for bearing in range(0, 360, 30)]
+    azimuths, elevations, distances = frame.look_batch(
+        [point.lat for point in points],
+        [point.lon for point in points],
+        [point.alt for point in points],
+    )
+
+    for i, point in enumerate(points):
+        assert (azimuths[i], elevations[i], distances[i]) == pytest.approx(
+            frame.look(point.lat, point.lon, point.alt)
+        )
+
+    azimuths, elevations, distances = frame.look_batch([math.nan], [0.0], [0.0])
+    assert numpy.isnan(azimuths[0]) and numpy.isnan(elevations[0])
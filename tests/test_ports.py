@@ -0,0 +1,58 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+
+import threading
+import time
+
+import ports
+from ports import PortKind, PortMonitor
+
+
+def test_stop_during_a_scan(monkeypatch):
+    listing = threading.Event()
+    probed = []
+    errors = []
+
+    def list_serial_ports():
+        listing.set()
+        time.sleep(0.2)
+        return {"/dev/ttyFAKE0": "fake"}
+
+    monkeypatch.setattr(ports, "list_serial_ports", list_serial_ports)
+    monkeypatch.setattr(
+        ports, "probe_port", lambda device, timeout: probed.append(device)
+    )
+    monkeypatch.setattr(threading, "excepthook", errors.append)
+
+    monitor = PortMonitor()
+    monitor.start()
+    assert listing.wait(5)
+    monitor.stop()
+
+    assert not monitor._thread.is_alive()
+    assert errors == []
+    assert probed == []
+
+
+def test_ports_in_use_are_not_probed(monkeypatch):
+    probed = []
+    monkeypatch.setattr(
+        ports, "list_serial_ports", lambda: {"/dev/ttyFAKE0": "", "/dev/ttyFAKE1": ""}
+    )
+    monkeypatch.setattr(
+        ports,
+        "probe_port",
+        lambda device, timeout: probed.append(device) or PortKind.RFD,
+    )
+
+    monitor = PortMonitor()
+    monitor.in_use = {"/dev/ttyFAKE0"}
+    monitor.scan()
+    monitor.stop()
+    monitor._executor.shutdown(wait=True)
+
+    assert probed == ["/dev/ttyFAKE1"]
+    assert monitor.kinds == {
+        "/dev/ttyFAKE0": PortKind.UNKNOWN,
+        "/dev/ttyFAKE1": PortKind.RFD,
+    }
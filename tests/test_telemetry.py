@@ -0,0 +1,172 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+
+import datetime
+from threading import Lock
+import time
+
+import pytest
+
+from clock import ReplayClock
+from telemetry import TelemetryMerger
+
+START = datetime.datetime(2025, 6, 20, 10, 0, 0)
+
+
+class FakePorts:
+    """A port factory whose ports return nothing, slowly, like a quiet radio.
+    Keeps track of how many of them are open at once."""
+
+    def __init__(self):
+        self.open = 0
+        self.most_open = 0
+        self._lock = Lock()
+
+    def __call__(self, port: str, baud: int) -> "FakePort":
+        with self._lock:
+            self.open += 1
+            self.most_open = max(self.most_open, self.open)
+        return FakePort(self)
+
+
+class FakePort:
+    def __init__(self, ports: FakePorts):
+        self.ports = ports
+
+    def readline(self) -> bytes:
+        time.sleep(0.2)
+        return b""
+
+    def write(self, data: bytes):
+        pass
+
+    def close(self):
+        with self.ports._lock:
+            self.ports.open -= 1
+
+
+@pytest.fixture
+def merged():
+    """Packets passed on by `merger`, whose radios "a" and "b" never hear
+    anything themselves, packets are handed to `receive` instead."""
+    return []
+
+
+@pytest.fixture
+def merger(merged):
+    merger = TelemetryMerger(lambda packet, age: merged.append(packet), log_path=None)
+    merger.add_source("a", port_factory=FakePorts())
+    merger.add_source("b", port_factory=FakePorts())
+    yield merger
+    merger.stop()
+    merger.join(timeout=5)
+
+
+def sources(merger: TelemetryMerger) -> dict[str, dict]:
+    return {health["port"]: health for health in merger.health()["sources"]}
+
+
+def test_first_radio_wins(merger, merged):
+    assert merger.receive("a", {"seq": 1})
+    assert not merger.receive("b", {"seq": 1})
+    assert not merger.receive("a", {"seq": 1})
+    assert merger.receive("b", {"seq": 2})
+
+    assert [packet["seq"] for packet in merged] == [1, 2]
+    assert merger.merged == 2
+    health = sources(merger)
+    assert (health["a"]["first"], health["a"]["duplicates"]) == (1, 1)
+    assert (health["b"]["first"], health["b"]["duplicates"]) == (1, 1)
+
+
+def test_packets_without_a_key_are_compared_whole(merger, merged):
+    assert merger.receive("a", {"gps": {"altitude": 1.0}})
+    assert not merger.receive("b", {"gps": {"altitude": 1.0}})
+    assert merger.receive("b", {"gps": {"altitude": 2.0}})
+    assert len(merged) == 2
+
+
+def test_targets_are_deduplicated_separately(merger, merged):
+    merger.add_source("c", port_factory=FakePorts(), target="payload")
+
+    assert merger.receive("a", {"seq": 1})
+    assert merger.receive("c", {"seq": 1})
+    assert not merger.receive("a", {"seq": 1, "target": "payload"})
+
+    assert [packet["target"] for packet in merged] == ["rocket", "payload"]
+
+
+def test_late_packets_are_not_passed_on(merger, merged):
+    assert merger.receive("a", {"seq": 5})
+    # Still logged, as no radio had it yet
+    assert merger.receive("b", {"seq": 3})
+
+    assert [packet["seq"] for packet in merged] == [5]
+    assert sources(merger)["b"]["late"] == 1
+
+
+def test_loss_rate(merger):
+    for seq in range(4):
+        merger.receive("a", {"seq": seq})
+        if seq % 2 == 0:
+            merger.receive("b", {"seq": seq})
+
+    health = sources(merger)
+    assert (health["a"]["lost"], health["a"]["loss_rate"]) == (0, 0.0)
+    assert (health["b"]["lost"], health["b"]["loss_rate"]) == (2, 0.5)
+
+
+def test_replaced_source_starts_its_counts_over(merger):
+    for seq in range(4):
+        merger.receive("a", {"seq": seq})
+
+    merger.add_source("b", port_factory=FakePorts())
+    merger.receive("a", {"seq": 4})
+    merger.receive("b", {"seq": 4})
+
+    health = sources(merger)
+    assert health["b"]["duplicates"] == 1
+    assert (health["b"]["lost"], health["b"]["loss_rate"]) == (0, 0.0)
+
+
+def test_removed_source_is_ignored(merger, merged):
+    merger.remove_source("b")
+    assert not merger.receive("b", {"seq": 1})
+    assert merged == []
+
+
+def test_replacing_a_source_waits_for_the_old_reader():
+    ports = FakePorts()
+    merger = TelemetryMerger(lambda packet, age: None, log_path=None)
+
+    merger.add_source("fake", port_factory=ports)
+    time.sleep(0.1)
+    # As the window does when the same RFD port is set again, while the
+    # first reader is still in `readline`
+    merger.add_source("fake", port_factory=ports)
+    merger.add_source("fake", port_factory=ports)
+    time.sleep(0.5)
+
+    merger.stop()
+    merger.join(timeout=5)
+
+    assert ports.most_open == 1
+    assert ports.open == 0
+
+
+def test_packets_keep_their_receive_time():
+    clock = ReplayClock(START)
+    ages = []
+    merger = TelemetryMerger(
+        lambda packet, age: ages.append(age), log_path=None, clock=clock
+    )
+    merger.add_source("radio", port_factory=FakePorts())
+
+    clock.set(START + datetime.timedelta(seconds=10))
+    merger.receive("radio", {"seq": 1}, received=6.0)
+    merger.receive("radio", {"seq": 2})
+    merger.stop()
+    merger.join(timeout=5)
+
+    assert ages == [4.0, 0.0]
+    assert merger.last_packet_time == 10.0
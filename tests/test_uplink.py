@@ -0,0 +1,92 @@
+## 2025, UNL Aerospace Club
+## Licensed under the GNU General Public License version 3
+
+import time
+
+import pytest
+
+from uplink import CommandState, UplinkChannel, command_frame
+from utils import crc8
+
+
+class Radio:
+    """A `send` which keeps every frame."""
+
+    def __init__(self):
+        self.frames: list[bytes] = []
+
+    def __call__(self, data: bytes) -> bool:
+        self.frames.append(data)
+        return True
+
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_frames():
+    assert command_frame(7) == bytes([7, crc8(bytes([7])), 0x20])
+    assert command_frame(7, 3) == bytes([7, 3, crc8(bytes([7, 3])), 0x20])
+    with pytest.raises(ValueError):
+        command_frame(256)
+
+
+def test_sent_once_without_acks():
+    radio = Radio()
+    uplink = UplinkChannel(radio, min_interval=0.01, ack_timeout=0.05)
+
+    command = uplink.submit(7)
+    wait_for(lambda: command.state == CommandState.SENT)
+    time.sleep(0.2)
+    uplink.stop()
+
+    assert radio.frames == [command_frame(7)]
+    assert command.nonce is None
+
+
+def test_resent_until_acknowledged():
+    radio = Radio()
+    uplink = UplinkChannel(radio, min_interval=0.01, ack_timeout=0.05, attempts=5)
+
+    command = uplink.submit(7)
+    wait_for(lambda: len(radio.frames) >= 2)
+    uplink.acknowledge({"ack": [7, command.nonce]})
+    wait_for(lambda: command.state == CommandState.ACKED)
+    sent = len(radio.frames)
+    time.sleep(0.2)
+    uplink.stop()
+
+    assert len(radio.frames) == sent
+    assert set(radio.frames) == {command_frame(7, command.nonce)}
+
+
+def test_fails_after_every_attempt():
+    radio = Radio()
+    uplink = UplinkChannel(radio, min_interval=0.01, ack_timeout=0.02, attempts=3)
+
+    command = uplink.submit(7)
+    wait_for(lambda: command.state == CommandState.FAILED)
+    uplink.stop()
+
+    assert len(radio.frames) == 3
+
+
+def test_ack_for_an_earlier_command_does_not_count():
+    radio = Radio()
+    uplink = UplinkChannel(radio, min_interval=0.01, ack_timeout=0.05, attempts=2)
+
+    first = uplink.submit(7)
+    wait_for(lambda: first.state == CommandState.FAILED)
+    second = uplink.submit(7)
+    wait_for(lambda: second.state == CommandState.WAITING)
+
+    uplink.acknowledge({"ack": [7, first.nonce]})
+    uplink.acknowledge({"ack": 7})
+    assert second.state == CommandState.WAITING
+
+    uplink.acknowledge({"ack": [7, second.nonce]})
+    assert second.state == CommandState.ACKED
+    uplink.stop()